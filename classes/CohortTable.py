@@ -0,0 +1,99 @@
+import numpy as np
+
+
+def _code_dtype(n: int):
+    # The smallest integer type that can hold every code
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint64
+
+
+class CohortTable:
+    """The applicants as columns rather than Students. Text columns are dictionary encoded, each row holds an integer
+    code into the column's categories, so a long answer repeated by every applicant is stored once. Number columns are
+    float arrays. Checks which only depend on the text can be run once per distinct value with map_distinct"""
+
+    def __init__(self, codes: dict, categories: dict, numbers: dict):
+        self._codes = codes  # column -> integer code of each row
+        self._categories = categories  # column -> the distinct values, as an object array indexed by code
+        self._numbers = numbers  # column -> float array
+
+    @classmethod
+    def from_records(cls, records, categorical: list, numeric: list) -> 'CohortTable':
+        """Encodes an iterable of dicts, e.g. the rows of a csv.DictReader, in one pass
+
+        Parameters
+        ----------
+        records : iterable
+            One dict per applicant, with every column in categorical and numeric
+        categorical : list
+            The columns to dictionary encode
+        numeric : list
+            The columns which are numbers
+
+        Returns
+        -------
+        table : CohortTable
+        """
+        encoders = {column: {} for column in categorical}
+        codes = {column: [] for column in categorical}
+        numbers = {column: [] for column in numeric}
+        for record in records:
+            for column, encoder in encoders.items():
+                value = record[column]
+                code = encoder.get(value)
+                if code is None:
+                    code = encoder[value] = len(encoder)
+                codes[column].append(code)
+            for column, values in numbers.items():
+                values.append(record[column])
+
+        categories = {}
+        for column, encoder in encoders.items():
+            categories[column] = np.empty(len(encoder), dtype=object)
+            categories[column][:] = list(encoder)
+            codes[column] = np.array(codes[column], dtype=_code_dtype(len(encoder)))
+        numbers = {column: np.array(values, dtype=float) for column, values in numbers.items()}
+        return cls(codes, categories, numbers)
+
+    @classmethod
+    def from_students(cls, student_list: list, categorical: list, numeric: list = ()) -> 'CohortTable':
+        """Encodes the given attributes of a list of Students"""
+        columns = list(categorical) + list(numeric)
+        records = ({column: getattr(s, column) for column in columns} for s in student_list)
+        return cls.from_records(records, list(categorical), list(numeric))
+
+    def __len__(self) -> int:
+        if self._codes:
+            return len(next(iter(self._codes.values())))
+        return len(next(iter(self._numbers.values()), ()))
+
+    def values(self, column: str) -> np.ndarray:
+        """The decoded values of any column"""
+        if column in self._numbers:
+            return self._numbers[column]
+        return self._categories[column][self._codes[column]]
+
+    def map_distinct(self, columns: list, function) -> np.ndarray:
+        """Calls function once per distinct combination of the text columns and returns its result for every row
+
+        Parameters
+        ----------
+        columns : list
+            The text columns, their values are passed to function in this order
+        function : function
+            Takes one value of each column
+
+        Returns
+        -------
+        results : np.ndarray
+            The result of function for each row
+        """
+        if len(self) == 0:
+            return np.empty(0, dtype=object)
+        stacked = np.stack([self._codes[column].astype(np.int64) for column in columns], axis=1)
+        distinct, inverse = np.unique(stacked, axis=0, return_inverse=True)
+        results = [function(*(self._categories[column][code] for column, code in zip(columns, row)))
+                   for row in distinct]
+        return np.asarray(results)[inverse.reshape(-1)]
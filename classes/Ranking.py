@@ -0,0 +1,94 @@
+from bisect import bisect_left, insort
+
+from utils import normalize
+
+
+class Ranking:
+    """Keeps the applicants ordered by total score. Ties are broken by reviewer score, then GPA score, then name so the
+    order is the same on every run. Changing one applicant's score moves only that applicant rather than re-sorting.
+    Applicants are told apart by name and applicant_id (StudentId or Email). Two applicants who still can not be told
+    apart are both kept, reported and listed in duplicates, rather than one silently replacing the other"""
+
+    def __init__(self, students: list = ()):
+        self._order = []  # (sort key, applicant key), best applicant first
+        self._students = {}  # applicant key -> (sort key, Student)
+        self._keys = {}  # id(Student) -> applicant key
+        self.duplicates = []  # The applicant keys which were given a suffix to tell them apart
+        for s in students:
+            if id(s) not in self._keys:
+                self._students[self._new_key(s)] = (self.sort_key(s), s)
+        self._order = sorted((key, unique) for unique, (key, _) in self._students.items())
+
+    def _new_key(self, s) -> str:
+        key = self.student_key(s) + '|' + str(s.applicant_id).strip().upper()
+        if key in self._students:
+            print(f'WARNING: Two applicants are named {s.lastName}, {s.firstName} with the same StudentId/Email '
+                  f'"{s.applicant_id}", check the answers file and their reviews')
+            self.duplicates.append(key)
+            n = 2
+            while f'{key}#{n}' in self._students:
+                n += 1
+            key = f'{key}#{n}'
+        self._keys[id(s)] = key
+        return key
+
+    @staticmethod
+    def student_key(s) -> str:
+        """The applicant key reviews are matched by, LastName concatenated with FirstName"""
+        return normalize.person_key(s.lastName, s.firstName)
+
+    @staticmethod
+    def sort_key(s) -> tuple:
+        return (-s.total_score, -s.reviewer_score, -s.GPA_Score, s.lastName.strip().upper(),
+                s.firstName.strip().upper())
+
+    def key_of(self, s) -> str:
+        """The key telling a Student in the ranking apart from every other applicant"""
+        return self._keys[id(s)]
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __iter__(self):
+        """Iterates over the Students, best applicant first"""
+        for _, unique in self._order:
+            yield self._students[unique][1]
+
+    def top(self, n: int) -> list:
+        """Returns the n best ranked Students"""
+        return [self._students[unique][1] for _, unique in self._order[:n]]
+
+    def rank_of(self, s) -> int:
+        """Returns the 1 based rank of a Student"""
+        unique = self.key_of(s)
+        return bisect_left(self._order, (self._students[unique][0], unique)) + 1
+
+    def add(self, s) -> None:
+        if id(s) in self._keys:
+            self.update(s)
+            return
+        key = self.sort_key(s)
+        unique = self._new_key(s)
+        self._students[unique] = (key, s)
+        insort(self._order, (key, unique))
+
+    def update(self, s) -> int:
+        """Re-ranks a Student after their scores changed, returns their new rank
+
+        Parameters
+        ----------
+        s : Student
+            A member of the Student class already in the ranking, with total_score recomputed
+
+        Returns
+        -------
+        rank : int
+            The 1 based rank of the Student
+        """
+        unique = self.key_of(s)
+        old_key, _ = self._students[unique]
+        del self._order[bisect_left(self._order, (old_key, unique))]
+        new_key = self.sort_key(s)
+        self._students[unique] = (new_key, s)
+        insort(self._order, (new_key, unique))
+        return self.rank_of(s)
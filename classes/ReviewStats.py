@@ -0,0 +1,54 @@
+class ReviewStats:
+    """Running statistics of the reviewer scores for one applicant, updated one review at a time (Welford's method)"""
+
+    # A review export can have hundreds of thousands of rows, so keep the per applicant footprint small and fixed
+    __slots__ = ('count', 'mean', 'M2', 'min_score', 'max_score', 'min_reviewer', 'max_reviewer')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.M2 = 0.0
+        self.min_score = None
+        self.max_score = None
+        self.min_reviewer = ''
+        self.max_reviewer = ''
+
+    def add(self, score: float, reviewer: str = '') -> None:
+        """Adds one review to the running statistics
+
+        Parameters
+        ----------
+        score : float
+            The score the reviewer gave
+        reviewer : str
+            The reviewer's id, LastName concatenated with FirstName
+        """
+        self.count += 1
+        delta = score - self.mean
+        self.mean += delta / self.count
+        self.M2 += delta * (score - self.mean)
+
+        if self.min_score is None or score < self.min_score:
+            self.min_score = score
+            self.min_reviewer = reviewer
+        if self.max_score is None or score > self.max_score:
+            self.max_score = score
+            self.max_reviewer = reviewer
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the scores, to match np.std used elsewhere"""
+        if self.count == 0:
+            return 0.0
+        return self.M2 / self.count
+
+    @property
+    def std(self) -> float:
+        return self.variance ** 0.5
+
+    @property
+    def spread(self) -> float:
+        """Difference between the highest and lowest score given"""
+        if self.count == 0:
+            return 0.0
+        return self.max_score - self.min_score
@@ -1,14 +1,40 @@
+from classes.ValidationFlags import Check, ValidationFlags
+
+
 class Student:
     """A student class to track values and validation failures"""
 
+    # Validation checks, True unless the applicant fails the check
+    valid_address = Check()
+    ChicagoHome = Check()
+    ChicagoSchool = Check()
+    school_found = Check()
+    distance_warn = Check()
+    reviewer_spread_warn = Check()
+    accredited = Check()
+    valid_major = Check()
+    past_recipient = Check()
+    ACT_SAT_conversion = Check()
+    ACT_SAT_decimal = Check()
+    ACT_SAT_low = Check()
+    ACT_SAT_high = Check()
+    GPA_C_Under = Check()
+    GPA_C_Warn = Check()
+    C_Major_Warn = Check()
+    C_College_change = Check()
+    other_error = Check()
+    unique_essay = Check()
+
     def __init__(self, firstName, lastName):
         self.lastName = lastName
         self.firstName = firstName
+        self.applicant_id = ''  # StudentId or Email, tells applicants with the same name apart
         self.GPA_Value = 0.0
         self.ACT_SAT_value = 0.0
         self.ACTM_SATM_value = 0.0
         self.ACT_value = 0.0
         self.ACTM_value = 0.0
+        self.ACT_imputed = False  # ACT_value was estimated by act_imputation, the applicant gave none
         self.COMMS_value = 0.0
         self.NON_ENG_value = ''
         self.student_type = ''
@@ -20,6 +46,7 @@ class Student:
         self.high_school_partial = ''
         self.high_school_full = ''
         self.high_school_other = ''
+        self.high_school_city = ''
         self.address1 = ''
         self.address2 = ''
         self.city = ''
@@ -33,41 +60,30 @@ class Student:
         self.address_footnotes = ''
         self.address_type = ''
         self.submitted = ''
+        self.answers = {}  # The applicant's row of the answers file
         self.home_latitude = 0
         self.home_longitude = 0
         self.home_to_school_dist = 0.0
         self.home_to_school_time_pt = 0.0  # public transit
         self.home_to_school_time_car = 0.0  # car
+        self.school_features = {}
 
         # Score fields
         self.GPA_Score = 0.0
         self.ACT_SAT_Score = 0.0
         self.ACTM_SATM_Score = 0.0
         self.STEM_Score = 0.0
+        self.STEM_raw = 0.0
         self.reviewer_score = 0.0
         self.comm_score = 0.0
         self.essay_score = 0.0
         self.career_score = 0.0
         self.bonus_score = 0.0
         self.notes = ''
+        self.total_score = 0.0
 
-        # Validation Errors
+        # Validation Errors, each check is one bit of validation_flags, see the Checks above
         self.validationError = False
-        self.valid_address = True
-        self.ChicagoHome = True
-        self.ChicagoSchool = True
-        self.school_found = True
-        self.distance_warn = True
-        self.accredited = True
-        self.valid_major = True
-        self.past_recipient = True
-        self.ACT_SAT_conversion = True
-        self.ACT_SAT_decimal = True
-        self.ACT_SAT_low = True
-        self.ACT_SAT_high = True
-        self.GPA_C_Under = True
-        self.GPA_C_Warn = True
-        self.C_Major_Warn = True
-        self.C_College_change = True
-        self.other_error = True
+        self.validation_flags = ValidationFlags(0)
         self.other_error_message = ''
+        self.similar_answers = []  # (question, other applicant, year, their question, similarity), see text_similarity
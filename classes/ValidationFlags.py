@@ -0,0 +1,76 @@
+from enum import IntFlag
+
+
+class ValidationFlags(IntFlag):
+    """One bit per validation check, set when the applicant fails the check. The names match the Student attributes"""
+    valid_address = 1 << 0
+    ChicagoHome = 1 << 1
+    ChicagoSchool = 1 << 2
+    school_found = 1 << 3
+    distance_warn = 1 << 4
+    reviewer_spread_warn = 1 << 5
+    accredited = 1 << 6
+    valid_major = 1 << 7
+    past_recipient = 1 << 8
+    ACT_SAT_conversion = 1 << 9
+    ACT_SAT_decimal = 1 << 10
+    ACT_SAT_low = 1 << 11
+    ACT_SAT_high = 1 << 12
+    GPA_C_Under = 1 << 13
+    GPA_C_Warn = 1 << 14
+    C_Major_Warn = 1 << 15
+    C_College_change = 1 << 16
+    other_error = 1 << 17
+    unique_essay = 1 << 18
+
+
+# The checks which only ask the committee to look at the applicant, e.g. a school name the fuzzy match could not find.
+# Failing them does not stop the applicant being ranked or receiving an award. Living outside Chicago is one, only
+# neither living nor going to high school there (ChicagoSchool) is not allowed
+warnings = (ValidationFlags.ChicagoHome | ValidationFlags.school_found | ValidationFlags.distance_warn |
+            ValidationFlags.reviewer_spread_warn | ValidationFlags.ACT_SAT_decimal | ValidationFlags.GPA_C_Warn |
+            ValidationFlags.unique_essay)
+
+# The checks an applicant has to pass to be ranked and receive an award, every check which is not a warning
+hard_failures = ValidationFlags(sum(flag.value for flag in ValidationFlags)) & ~warnings
+
+
+# The warning printed for each failed check
+messages = {ValidationFlags.valid_address       : 'Applicant has entered an invalid or non-residential address',
+            ValidationFlags.ChicagoHome         : 'Applicant does not live in Chicago',
+            ValidationFlags.ChicagoSchool       : 'Applicant neither lives nor goes to high school in Chicago',
+            ValidationFlags.school_found        : 'Could not find matching school in system',
+            ValidationFlags.distance_warn       : 'Applicant lives far from their school',
+            ValidationFlags.reviewer_spread_warn: "Applicant's reviewer scores are too far apart",
+            ValidationFlags.accredited          : 'College or major is not ABET accredited',
+            ValidationFlags.valid_major         : 'Major is not an engineering major',
+            ValidationFlags.past_recipient      : 'Student did not receive award last year',
+            ValidationFlags.ACT_SAT_conversion  : 'No ACT/SAT conversion exists for this score',
+            ValidationFlags.ACT_SAT_decimal     : 'ACT/SAT score is a decimal, check if correct',
+            ValidationFlags.ACT_SAT_low         : 'ACT/SAT score is too low for the SAT and too high for the ACT',
+            ValidationFlags.ACT_SAT_high        : 'ACT/SAT score is too high for the SAT',
+            ValidationFlags.GPA_C_Under         : 'College GPA is under the minimum',
+            ValidationFlags.GPA_C_Warn          : 'College GPA is close to the minimum',
+            ValidationFlags.C_Major_Warn        : 'Student has changed to a non-engineering major',
+            ValidationFlags.C_College_change    : 'Student has changed college',
+            ValidationFlags.other_error         : 'Other error, see the error message',
+            ValidationFlags.unique_essay        : "A written answer is nearly the same as another applicant's"}
+
+
+class Check:
+    """A Student validation attribute stored as one bit of Student.validation_flags. Reads True until the check fails,
+    so code can keep setting e.g. s.ChicagoHome = False"""
+
+    def __set_name__(self, owner, name):
+        self.flag = ValidationFlags[name]
+
+    def __get__(self, s, owner=None):
+        if s is None:
+            return self
+        return not s.validation_flags & self.flag
+
+    def __set__(self, s, passed: bool):
+        if passed:
+            s.validation_flags &= ~self.flag
+        else:
+            s.validation_flags |= self.flag
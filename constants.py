@@ -176,6 +176,8 @@ questions = {2024: [{'lastName'           : 'LastName [Profile]',
                      }]}
 
 uni_not_listed = 'My university is not listed'
+# The columns which tell two applicants with the same name apart, the first one the answers file has is used
+applicant_id_columns = ['StudentId [Profile]', 'StudentId', 'Email [Profile]', 'Email']
 
 # Values for some sanity checks
 min_SAT = 400
@@ -189,6 +191,46 @@ ACTM_Score = 15
 GPA_Score = 10
 STEM_Score = 20
 reviewer_multiplier = 0.5
+# GPA points start above this GPA, ACT percentiles only consider scores above this cutoff
+GPA_floor = 2.9
+ACT_histogram_cutoff = 21
+# 'cohort' takes the ACT percentiles from the whole cohort, 'streaming' from the applicants so far blended with earlier
+# years, see utils/streaming_percentiles.py. The expected number of applicants defaults to last year's when None
+percentile_mode = 'cohort'
+percentile_expected_applicants = None
+
+# Missing ACT estimates, see utils/act_imputation.py. Fitted on the output files of these years, when they have at
+# least act_imputation_min_rows applicants with an ACT score, with the given school features and ridge penalty. Off
+# until the committee decides estimated scores should earn ACT points
+impute_missing_ACT = False
+act_imputation_years = [2022, 2023]
+act_imputation_school_features = ['sat_composite', 'college_ready_pct', 'low_income_pct']
+act_imputation_min_rows = 50
+act_imputation_alpha = 1.0
+# The summed coursework points are divided by this before capping at STEM_Score
+STEM_divisor = 3.5
+
+# Award tiers, best award first. Awards are given in rank order until each tier's count runs out
+award_tiers = [{'name': 'CEF Award', 'amount': 5000, 'count': 10}]
+# The total that can be awarded in a year, None to only limit by the tier counts
+award_budget = None
+
+# API calls, only made when CALL_APIS is set. 'live' calls the APIs, 'record' also saves each response to
+# api_fixture_dir, 'replay' uses the saved responses instead with the simulated latency (seconds) and error rate
+api_mode = 'live'
+api_fixture_dir = 'util_data/api_fixtures'
+api_latency = 0.0
+api_error_rate = 0.0
+# Most calls per second and how many times a failed call is retried
+api_rate_limit = 10
+api_retries = 3
+
+# The warnings raised about each applicant are collected and written to diagnostics_folder at the end of each stage as
+# 'jsonl' or 'csv', see utils/diagnostics.py. Events below diagnostics_level are dropped: 'DEBUG', 'INFO' (adds each
+# applicant's scores), 'WARNING', 'ERROR' or 'OFF'
+diagnostics_level = 'WARNING'
+diagnostics_folder = 'Diagnostics'
+diagnostics_format = 'jsonl'
 
 # Various functions check for student types
 high_schooler = 'HIGH SCHOOL SENIOR'
@@ -206,6 +248,23 @@ StudentFirstName = 'StudentFirstName'
 GivenScore = 'GivenScore'
 ReviewStatus = 'ReviewStatus'
 
+# Flag a student when their lowest and highest reviewer scores are further apart than this
+reviewer_spread_limit = 20
+
+# Reviewer assignment planning, how many reviewers each applicant gets and the most applicants one reviewer can get.
+# None for the reviewer load gives each reviewer an even share, rounded up, plus one
+reviews_per_applicant = 3
+reviewer_max_load = None
+
+# Rank stability, how many times each applicant's reviews are resampled and the share of resampled ranks inside the
+# reported rank interval
+bootstrap_resamples = 10000
+rank_interval = 0.9
+
+# Reviewer agreement, how many bootstrap resamples of the applicants and the share of them inside the reported interval
+agreement_resamples = 2000
+agreement_interval = 0.9
+
 # Normalized students, LastName concatenated with FirstName
 normalizing_students = {2024: ['User 1Test',
                                'User 2Test',
@@ -215,9 +274,74 @@ normalizing_students = {2024: ['User 1Test',
                                'User 3Test'],
                         }
 
+# Near duplicate written answers, see utils/text_similarity.py. The questions compared, by the start of their header
+# so rewordings in other years still match. Answers shorter than similarity_min_words are not compared, and a pair is
+# flagged when about similarity_threshold of their similarity_shingle word phrases are shared
+similarity_questions = ['Use this space to write your essay',
+                        'Why do you want to be an engineer',
+                        'Describe your community service activities',
+                        'Tell us the highlights of your engineering education']
+similarity_shingle = 3
+similarity_min_words = 20
+similarity_threshold = 0.7
+# 128 MinHash values per answer split into 32 bands of 4, pairs sharing any band are checked
+similarity_hashes = 128
+similarity_bands = 32
+
+# The lowest fuzzy match score, 0-100, for an export header to be used for a question it does not match exactly, see
+# utils/schema_registry.py
+schema_match_threshold = 85
+
 # Website Constants
 AS_URL = 'https://chicagoengineersfoundation.awardspring.com/'
 
 # GPA Reqs for College
 minimum_gpa = 2.75
 warning_gpa = 2.9
+
+# Eligibility rules checked over the whole cohort at once by utils/rules.py. An applicant fails a rule when every
+# condition in 'all' is true, which sets the Student flag named in 'flag'. 'student_type' limits the rule to one type of
+# applicant. A condition compares a Student attribute ('column') to a value with one of the operators in rules.py,
+# a value of 'cs.<name>' is the constant of that name. 'transform' cleans text first, 'upper' or 'alnum'. The validators
+# and scorers only work out the values, the flags named here are only set by the rules
+validation_rules = [
+    {'name' : 'College GPA under the minimum', 'flag': 'GPA_C_Under', 'student_type': college_student,
+     'all'  : [{'column': 'past_recipient', 'op': '==', 'value': True},
+               {'column': 'GPA_Value', 'op': '>', 'value': 0},
+               {'column': 'GPA_Value', 'op': '<', 'value': 'cs.minimum_gpa'}]},
+    {'name' : 'College GPA close to the minimum', 'flag': 'GPA_C_Warn', 'student_type': college_student,
+     'all'  : [{'column': 'past_recipient', 'op': '==', 'value': True},
+               {'column': 'GPA_Value', 'op': '>=', 'value': 'cs.minimum_gpa'},
+               {'column': 'GPA_Value', 'op': '<', 'value': 'cs.warning_gpa'}]},
+    {'name': 'College major or school changed', 'flag': 'C_College_change', 'student_type': college_student,
+     'all' : [{'column': 'past_recipient', 'op': '==', 'value': True},
+              {'column': 'major_school_change', 'op': '!=', 'value': ''},
+              {'column': 'major_school_change', 'op': 'not in', 'value': ['NO', 'NA'], 'transform': 'alnum'}]},
+    {'name': 'College major not listed', 'flag': 'C_Major_Warn', 'student_type': college_student,
+     'all' : [{'column': 'past_recipient', 'op': '==', 'value': True},
+              {'column': 'major', 'op': '==', 'value': 'Not listed'},
+              {'column': 'NON_ENG_value', 'op': '!=', 'value': ''}]},
+    {'name': 'High school major not listed', 'flag': 'valid_major', 'student_type': high_schooler,
+     'all' : [{'column': 'accredited', 'op': '==', 'value': False},
+              {'column': 'major', 'op': '==', 'value': 'Not Listed'}]},
+    {'name': 'Neither home nor high school in Chicago', 'flag': 'ChicagoSchool', 'student_type': high_schooler,
+     'all' : [{'column': 'address_type', 'op': '==', 'value': 'Residential'},
+              {'column': 'city', 'op': '!=', 'value': 'CHICAGO', 'transform': 'upper'},
+              {'column': 'high_school_city', 'op': 'not in', 'value': ['', 'CHICAGO'], 'transform': 'upper'}]},
+    {'name': 'ACT/SAT too low for the SAT', 'flag': 'ACT_SAT_low', 'student_type': high_schooler,
+     'all' : [{'column': 'ACT_SAT_value', 'op': 'between', 'value': [36, 'cs.min_SAT']}]},
+    {'name': 'ACT/SAT Math too low for the SAT', 'flag': 'ACT_SAT_low', 'student_type': high_schooler,
+     'all' : [{'column': 'ACTM_SATM_value', 'op': 'between', 'value': [36, 'cs.min_SAT']}]},
+    {'name': 'ACT/SAT too high for the SAT', 'flag': 'ACT_SAT_high', 'student_type': high_schooler,
+     'all' : [{'column': 'ACT_SAT_value', 'op': '>', 'value': 'cs.max_SAT'}]},
+    {'name': 'ACT/SAT Math too high for the SAT', 'flag': 'ACT_SAT_high', 'student_type': high_schooler,
+     'all' : [{'column': 'ACTM_SATM_value', 'op': '>', 'value': 'cs.max_SAT'}]},
+    {'name': 'ACT/SAT is a decimal', 'flag': 'ACT_SAT_decimal', 'student_type': high_schooler,
+     'all' : [{'column': 'ACT_SAT_value', 'op': 'decimal'},
+              {'column': 'ACT_SAT_value', 'op': 'outside', 'value': [36, 'cs.min_SAT']},
+              {'column': 'ACT_SAT_value', 'op': '<=', 'value': 'cs.max_SAT'}]},
+    {'name': 'ACT/SAT Math is a decimal', 'flag': 'ACT_SAT_decimal', 'student_type': high_schooler,
+     'all' : [{'column': 'ACTM_SATM_value', 'op': 'decimal'},
+              {'column': 'ACTM_SATM_value', 'op': 'outside', 'value': [36, 'cs.min_SAT']},
+              {'column': 'ACTM_SATM_value', 'op': '<=', 'value': 'cs.max_SAT'}]},
+]
@@ -4,6 +4,7 @@ It also generates a score for each applicant based on predefined criteria.
 """
 
 import csv
+import os
 import time
 from datetime import datetime
 from typing import Tuple
@@ -11,13 +12,16 @@ from typing import Tuple
 import pandas as pd
 
 import constants as cs
-from classes import Student
-from utils import validations as vali, scoring_util as sutil, util, unittests
+from classes import CohortTable, Ranking, Student
+from classes.ValidationFlags import hard_failures
+from utils import validations as vali, scoring_util as sutil, util, unittests, award_allocation, school_features, \
+    match_cache, normalize, api_transport, reference_data, differential, rules, text_similarity, \
+    rank_stability, reviewer_agreement, streaming_percentiles, act_imputation, \
+    transcript_parser, schema_registry, diagnostics
 
 
 # First ones to work on
 # TODO: Add school address to spreadsheet
-# TODO: Detect wide reviewer spread (lowest and highest is greater than 20? 25? points)
 # TODO: If record doesn't write, throw up error
 # TODO: Replace file logic with pandas
 
@@ -37,253 +41,349 @@ from utils import validations as vali, scoring_util as sutil, util, unittests
 # TODO: Store several variables as class variables https://realpython.com/inheritance-composition-python/
 # TODO: Host this on an AWS server ? https://realpython.com/python-sql-libraries/
 # TODO: Verify ACT/SAT from pdf https://pypi.org/project/pdftotext/
-# TODO: Extract coursework from pdf https://pypi.org/project/pdftotext/
-# TODO: Figure out how to handle the questions changing
 # TODO: Add gitignore with emails and passwords, better secure them
 # TODO: Package numpy, scipy
 # TODO: Ask for SAT II test scores?
 # TODO: batchgeo autogen?
 
 
-def compute_HS_scores(year: int, verbose: bool = False, DEBUG: bool = False, CALL_APIS: bool = False):
+def compute_HS_scores(year: int, verbose: bool = False, DEBUG: bool = False, CALL_APIS: bool = False,
+                      students: list = None, headers: list = None, reference=None,
+                      events: diagnostics.Diagnostics = None):
     """The main function that computes the high school student's scores and validates their application
 
     Parameters
     ----------
-    file : str
-        The file with all of the student's answers
+    year : int
+        The year of the awards
+    students : list
+        The high school applicants from generate_student_data, the answers file is read if not given
+    headers : list
+        The columns of the answers file, from generate_student_data
+    reference : ReferenceData
+        The reference_data.ReferenceData, shared with compute_C_scores. Loaded if not given
+    events : Diagnostics
+        Collects the warnings about each applicant, written to Diagnostics/{year}_HS_scoring
 
     Returns
     -------
+    student_list : list
+        The scored applicants
 
     """
-    file = f'Student Answers for {str(year)} Incentive Awards.csv'
-    with open(f'Student_Data/{file}', 'r', encoding="utf-8-sig") as csvinput:
-        # get fieldnames from DictReader object and store in list
-        d_reader = csv.DictReader(csvinput)
-        headers = d_reader.fieldnames
-        # Check if the questions exist in the file, most often a change in the year
-        if not vali.questions_check(headers, year):
+    if students is None:
+        students, _, headers = generate_student_data(year, verbose, DEBUG)
+        if headers is None:
             return
-
-        # Adding leading columns for the scores the students recieved
-        headers = ['Total', 'GPA', 'ACTSAT', 'ACTMSATM', 'STEM', 'Reviewer', 'CommServ', 'Essay', 'Career', 'Bonus',
-                   'Notes', 'home_to_school_dist', 'home_to_school_time_pt', 'home_to_school_time_car', 'ACT_value',
-                   'ACTM_value'] + d_reader.fieldnames
-
-        writer = csv.DictWriter(open(f'{year}_output.csv', 'w', newline='', encoding='utf-8-sig'), fieldnames=headers)
-
-        writer.writeheader()
-        # Load the conversions and lists into variables for reuse
-        SAT_to_ACT_dict = util.conversion_dict('SAT_to_ACT.csv', 'int')
-        SAT_to_ACT_Math_dict = util.conversion_dict('SAT_to_ACT_Math.csv', 'int')
-        course_scores = util.conversion_dict('Course_scoring.csv', 'str')
-        school_list, chicago_schools = vali.get_school_list('Illinois_Schools_Fix.csv')
-
-        if year >= 2022:  # Only started getting this in 2022
-            reviewer_feedback_df = util.get_review_feedback(f'{year} CEF Reviewer Detailed Feedback.xlsx')
-
-        # Iterate through file once to get data for histograms
-        ACT_Overall, ACTM_Overall = sutil.generate_histo_arrays(file, SAT_to_ACT_dict, SAT_to_ACT_Math_dict, year)
-
-        if year in cs.normalizing_students:
-            reviewer_scores = sutil.get_reviewer_scores_normalized(
-                    f'Reviewer Scores by Applicant for {str(year)} Incentive Awards.csv', year)
-        else:
-            reviewer_scores = sutil.get_reviewer_scores(f'Reviewer Scores by Applicant for {year} Incentive Awards.csv')
-        student_list = []
-        cnt = 0
-        for line in d_reader:
-            cnt += 1
-            # if cnt > 2:
-            #    break
-            lastName = line[cs.questions[year][0]['lastName']].strip()
-            firstName = line[cs.questions[year][0]['firstName']].strip()
-
-            s = Student.Student(firstName, lastName)
-
-            s.GPA_Value = util.get_num(line[cs.questions[year][0]['GPA_Value']])
-            s.ACT_SAT_value = util.get_num(line[cs.questions[year][0]['ACT_SAT_value']])
-            s.ACTM_SATM_value = util.get_num(line[cs.questions[year][0]['ACTM_SATM_value']])
-
-            s.COMMS_value = util.get_num(line[cs.questions[year][0]['COMMS_value']])
-            s.NON_ENG_value = line[cs.questions[year][0]['NON_ENG_value']]
-            s.student_type = line[cs.questions[year][0]['student_type']]
-
-            s.major = line['Major']
-            s.other_major = line[cs.questions[year][0]['other_major']]
-            s.STEM_Classes = line[cs.questions[year][0]['STEM_Classes']]
-
-            s.College = line[cs.questions[year][0]['College']]
-            s.Other_College = line[cs.questions[year][0]['Other_College']]
-            s.high_school_full = line[cs.questions[year][0]['high_school']]
-            s.high_school_other = line[cs.questions[year][0]['high_school_other']]
-
-            if year >= 2021:
-                s.submitted = line['Submit Application Complete']
-            else:
-                s.submitted = 'Yes'
-
-            s.address1 = line[cs.questions[year][0]['address1']]
-            s.address2 = line[cs.questions[year][0]['address2']]
-            s.city = line[cs.questions[year][0]['city']]
-            s.state = line[cs.questions[year][0]['state']]
-            s.zip_code = line[cs.questions[year][0]['zip']]
+    if reference is None:
+        reference = load_reference_data(verbose)
+    if events is None:
+        events = diagnostics.Diagnostics(year, verbose=verbose)
+
+    # Adding leading columns for the scores the students recieved
+    headers = ['Total', 'GPA', 'ACTSAT', 'ACTMSATM', 'STEM', 'Reviewer', 'CommServ', 'Essay', 'Career', 'Bonus',
+               'Notes', 'home_to_school_dist', 'home_to_school_time_pt', 'home_to_school_time_car', 'ACT_value',
+               'ACTM_value', 'ACT_imputed'] + headers
+
+    writer = csv.DictWriter(open(f'{year}_output.csv', 'w', newline='', encoding='utf-8-sig'), fieldnames=headers)
+
+    writer.writeheader()
+    # Load the conversions and lists into variables for reuse
+    SAT_to_ACT_dict = util.conversion_dict('SAT_to_ACT.csv', 'int')
+    SAT_to_ACT_Math_dict = util.conversion_dict('SAT_to_ACT_Math.csv', 'int')
+    course_scores = reference.course_scores()
+    school_list = reference.school_list()
+    chicago_schools = set(reference.chicago_schools.tolist())
+    transport = None
+    if CALL_APIS:
+        transport = api_transport.ApiTransport(cs.api_mode, cs.api_fixture_dir, cs.api_latency, cs.api_error_rate,
+                                               cs.api_rate_limit, cs.api_retries, verbose=verbose)
+    # Built once with school_features.build_school_features()
+    schools_by_key, schools_by_id = {}, {}
+    if os.path.exists(f'School_Data/{school_features.school_features_file}'):
+        schools_by_key, schools_by_id = school_features.load_school_features(verbose=verbose)
+
+    if year >= 2022:  # Only started getting this in 2022
+        reviewer_feedback_df = util.get_review_feedback(f'{year} CEF Reviewer Detailed Feedback.xlsx')
+
+    # The histograms are of every high school applicant's scores
+    if cs.percentile_mode == 'streaming':
+        # While applications are still coming in, blended with earlier years and saved between runs
+        ACT_Overall, ACTM_Overall = streaming_percentiles.interim_histograms(year, students, SAT_to_ACT_dict,
+                                                                             SAT_to_ACT_Math_dict, verbose=verbose)
+    else:
+        ACT_Overall, ACTM_Overall = sutil.histo_arrays([s.ACT_SAT_value for s in students],
+                                                       [s.ACTM_SATM_value for s in students], SAT_to_ACT_dict,
+                                                       SAT_to_ACT_Math_dict)
+
+    # The reviews file is read once, the normalized scores and the rank stability reuse the reviews read for the stats
+    reviews = []
+    reviewer_stats, wide_spread = sutil.get_reviewer_score_stats(
+            f'Reviewer Scores by Applicant for {year} Incentive Awards.csv', verbose=verbose, reviews=reviews)
+    if year in cs.normalizing_students:
+        review_scores = sutil.normalized_reviews(
+                f'Reviewer Scores by Applicant for {str(year)} Incentive Awards.csv', year, reviews=reviews)
+        review_aggregate = sutil.normalized_mean
+        reviewer_scores = {student: sutil.normalized_mean(scores) for student, scores in review_scores.items()}
+    else:
+        review_scores = {}
+        for student, _, score in reviews:
+            review_scores.setdefault(student, []).append(score)
+        review_aggregate = None  # The mean
+        reviewer_scores = {student: stats.mean for student, stats in reviewer_stats.items()}
+    school_cache = match_cache.MatchCache('Illinois_Schools', school_list.keys(), verbose=verbose)
+    student_list = []
+    try:
+        for s in students:
             if CALL_APIS is False:
-                s.cleaned_address1 = line[cs.questions[year][0]['address1']]
-                s.cleaned_address2 = line[cs.questions[year][0]['address2']]
-                s.cleaned_city = line[cs.questions[year][0]['city']]
+                s.cleaned_address1 = s.address1
+                s.cleaned_address2 = s.address2
+                s.cleaned_city = s.city
                 if s.cleaned_city != 'Chicago' and s.firstName == 'ChicagoSchoolNoCHome':
                     s.ChicagoHome = False
                     s.validationError = True
-                s.cleaned_state = line[cs.questions[year][0]['state']]
-                s.cleaned_zip_code = line[cs.questions[year][0]['zip']]
+                s.cleaned_state = s.state
+                s.cleaned_zip_code = s.zip_code
 
             # A basic sanity check that if the GPA and ACT values are populated, then the applicant is probably applying
-            if 1 == 1 and cs.high_schooler in s.student_type.upper() and s.GPA_Value and s.firstName != 'Test' and s.submitted == 'Yes':
+            if 1 == 1 and s.GPA_Value and s.firstName != 'Test' and s.submitted == 'Yes':
                 # print(s.lastName, s.firstName)
                 # Validate the applicant's address is residential and that they live or go to high school in Chicago
-                vali.address_validation(s, chicago_schools, school_list, verbose, DEBUG, CALL_APIS)
-
-                # Validate the applicant is accepted into an ABET engineering program
-                vali.accred_check(s, verbose, DEBUG)
+                vali.address_validation(s, chicago_schools, school_list, verbose, DEBUG, CALL_APIS, school_cache,
+                                        transport, events)
+                s.school_features = school_features.lookup_school(schools_by_key, schools_by_id, s.high_school_full,
+                                                                  city=s.high_school_city)
 
                 # Validate the applicants ACT/SAT scores and score their GPA and ACT/SAT
                 sutil.GPA_Calc(s, True)
                 sutil.ACT_SAT_Calc(s, SAT_to_ACT_dict, ACT_Overall, 'C', verbose, DEBUG)
                 sutil.ACT_SAT_Calc(s, SAT_to_ACT_Math_dict, ACTM_Overall, 'M', verbose, DEBUG)
 
-                # Score the applicant's verbose
-                sutil.score_coursework(s, course_scores, True)
+                # Score the applicant's coursework
+                sutil.score_coursework(s, course_scores, verbose, DEBUG, events)
 
                 # Determine the reviewer scores for the applicant
-                if lastName.strip().upper() + firstName.strip().upper() in reviewer_scores:
-                    s.reviewer_score = cs.reviewer_multiplier * round(
-                            reviewer_scores[lastName.strip().upper() + firstName.strip().upper()])
+                student_key = normalize.person_key(s.lastName, s.firstName)
+                if student_key in reviewer_scores:
+                    s.reviewer_score = cs.reviewer_multiplier * round(reviewer_scores[student_key])
                 else:
                     s.reviewer_score = 0
+                if student_key in wide_spread:
+                    # A warning for the committee, the applicant is not at fault for the reviewers disagreeing
+                    s.reviewer_spread_warn = False
                 if year >= 2022:
                     try:
-                        s.comm_score = round(
-                                reviewer_feedback_df[reviewer_feedback_df['Applicant_'] == f'{lastName}, {firstName}'][
-                                    'Community Service / Work_mean'].values[0], 2)
-                        s.essay_score = round(
-                                reviewer_feedback_df[reviewer_feedback_df['Applicant_'] == f'{lastName}, {firstName}'][
-                                    'Short Essay_mean'].values[0], 2)
-                        # s.career_score = round(                                reviewer_feedback_df[reviewer_feedback_df['Applicant_'] == f'{lastName}, {firstName}'][                                    'Career Goals_mean'].values[0], 2)
-                        s.bonus_score = round(
-                                reviewer_feedback_df[reviewer_feedback_df['Applicant_'] == f'{lastName}, {firstName}'][
-                                    'Bonus/Discretionary Points_mean'].values[0], 2)
-                        s.notes = \
-                            reviewer_feedback_df[reviewer_feedback_df['Applicant_'] == f'{lastName}, {firstName}'][
-                                'Notes_join'].values[0]
+                        feedback = reviewer_feedback_df[
+                            reviewer_feedback_df['Applicant_'] == f'{s.lastName}, {s.firstName}']
+                        s.comm_score = round(feedback['Community Service / Work_mean'].values[0], 2)
+                        s.essay_score = round(feedback['Short Essay_mean'].values[0], 2)
+                        # s.career_score = round(feedback['Career Goals_mean'].values[0], 2)
+                        s.bonus_score = round(feedback['Bonus/Discretionary Points_mean'].values[0], 2)
+                        s.notes = feedback['Notes_join'].values[0]
                     except Exception as e:
-                        print(lastName, e)
+                        events.emit('missing_feedback', diagnostics.Level.WARNING, s, error=repr(e))
                         s.comm_score = 0
                         s.essay_score = 0
                         s.career_score = 0
                         s.bonus_score = 0
                         s.notes = ''
-                if verbose:
-                    print(
-                        f'{lastName}, {firstName}: {s.GPA_Score} {s.ACT_SAT_Score} {s.ACTM_SATM_Score} {s.reviewer_score} {s.comm_score} {s.essay_score} {s.career_score} {s.bonus_score}')
-                    pass
+                if events.enabled(diagnostics.Level.INFO):
+                    events.emit('scores', diagnostics.Level.INFO, s, GPA=s.GPA_Score, ACTSAT=s.ACT_SAT_Score,
+                                ACTMSATM=s.ACTM_SATM_Score, Reviewer=s.reviewer_score, CommServ=s.comm_score,
+                                Essay=s.essay_score, Career=s.career_score, Bonus=s.bonus_score)
 
 
                 # TODO: Send email with new students and warnings https://automatetheboringstuff.com/2e/chapter18/
 
-                # Write back to output csv file
-                total = s.GPA_Score + s.ACT_SAT_Score + s.ACTM_SATM_Score + s.reviewer_score + s.STEM_Score
-
-                writer.writerow(dict(line,
-                                     Total=total,
-                                     GPA=s.GPA_Score,
-                                     ACTSAT=s.ACT_SAT_Score,
-                                     ACTMSATM=s.ACTM_SATM_Score,
-                                     STEM=s.STEM_Score,
-                                     Reviewer=s.reviewer_score,
-                                     CommServ=s.comm_score,
-                                     Essay=s.essay_score,
-                                     Career=s.career_score,
-                                     Bonus=s.bonus_score,
-                                     Notes=s.notes,
-                                     home_to_school_dist=s.home_to_school_dist,
-                                     home_to_school_time_pt=s.home_to_school_time_pt,
-                                     home_to_school_time_car=s.home_to_school_time_car,
-                                     ACT_value=s.ACT_value,
-                                     ACTM_value=s.ACTM_value
-                                     ))
                 student_list.append(s)
+    finally:
+        school_cache.close()
+    # Validate the applicants are accepted into an ABET engineering program, once per distinct college and major
+    colleges = CohortTable.CohortTable.from_students(student_list, ['College', 'Other_College', 'major'])
+    for s, accredited in zip(student_list, vali.accred_check_cohort(colleges, reference)):
+        s.accredited = bool(accredited)
+    # The eligibility rules, before the totals are written so the applicants failing one are not ranked
+    rules.apply_rules(student_list, verbose=verbose, events=events)
+    events.flush('HS_scoring')
+    if transport is not None and verbose:
+        print(f'API calls: {transport.stats()}')
+
+    # Estimate the ACT of the applicants who gave none, for the whole cohort at once
+    if cs.impute_missing_ACT:
+        act_model = act_imputation.load_model(cs.act_imputation_years, schools_by_key, schools_by_id, verbose)
+        act_imputation.impute_missing(student_list, act_model, ACT_Overall, verbose)
+
+    for s in student_list:
+        # Write back to output csv file
+        s.total_score = sutil.total_score(s)
+
+        writer.writerow(dict(s.answers,
+                             Total=s.total_score,
+                             GPA=s.GPA_Score,
+                             ACTSAT=s.ACT_SAT_Score,
+                             ACTMSATM=s.ACTM_SATM_Score,
+                             STEM=s.STEM_Score,
+                             Reviewer=s.reviewer_score,
+                             CommServ=s.comm_score,
+                             Essay=s.essay_score,
+                             Career=s.career_score,
+                             Bonus=s.bonus_score,
+                             Notes=s.notes,
+                             home_to_school_dist=s.home_to_school_dist,
+                             home_to_school_time_pt=s.home_to_school_time_pt,
+                             home_to_school_time_car=s.home_to_school_time_car,
+                             ACT_value=s.ACT_value,
+                             ACTM_value=s.ACTM_value,
+                             ACT_imputed=s.ACT_imputed
+                             ))
+
+    # Rank the applicants who passed every check which is not only a warning and decide who receives which award
+    eligible = [s for s in student_list if not s.validation_flags & hard_failures]
+    ranking = Ranking.Ranking(eligible)
+    allocation = award_allocation.allocate_awards(ranking, cs.award_tiers, cs.award_budget, verbose=verbose)
+    award_allocation.write_allocation(ranking, allocation, f'{year}_awards.csv')
+    if cs.percentile_mode == 'streaming':
+        # How far each applicant's ACT points could still move before the applications close
+        streaming_percentiles.score_ranges(year, student_list).to_csv(f'{year}_interim_ranges.csv', index=False)
+
+    # How much each rank depends on which reviewers the applicant drew, resampling the scores the ranking used
+    rank_stability.rank_intervals(eligible, review_scores, aggregate=review_aggregate,
+                                  verbose=verbose).to_csv(f'{year}_rank_stability.csv', index=False)
+
+    # How well the reviewers agree, overall and on each scorecard criteria
+    all_reviews = reviewer_agreement.read_reviews(year, verbose)
+    reviewer_agreement.agreement(all_reviews, verbose=verbose).to_csv(f'{year}_reviewer_agreement.csv', index=False)
+    reviewer_agreement.reviewer_report(all_reviews).to_csv(f'{year}_reviewer_report.csv', index=False)
+    vali.list_failures(student_list, cs.high_schooler, verbose, DEBUG)
     return student_list
 
 
-def compute_C_scores(file: str, year: int, verbose: bool = False, DEBUG: bool = False, CALL_APIS: bool = False):
+def compute_C_scores(year: int, verbose: bool = False, DEBUG: bool = False, CALL_APIS: bool = False,
+                     students: list = None, events: diagnostics.Diagnostics = None):
     """The main function that checks college student's eligibility for the award
 
     Parameters
     ----------
-    file : str
-        The file with all of the student's answers
-
+    year : int
+        The year of the awards
+    students : list
+        The college applicants from generate_student_data, the answers file is read if not given
+    events : Diagnostics
+        Collects the warnings about each applicant, written to Diagnostics/{year}_C_validation
 
     Returns
     -------
+    college_students : list
+        The validated applicants
 
     """
+    if students is None:
+        _, students, headers = generate_student_data(year, verbose, DEBUG)
+        if headers is None:
+            return
 
-    with open('Student_Data/' + str(file), 'r', encoding="utf-8-sig") as f:
-        # get fieldnames from DictReader object and store in list
-        d_reader = csv.DictReader(f)
-        headers = d_reader.fieldnames
+    recipient_list = vali.get_past_recipients('2019 Recipients.csv', year)
+    recipient_cache = match_cache.MatchCache('Recipients', recipient_list, verbose=verbose)
+    if events is None:
+        events = diagnostics.Diagnostics(year, verbose=verbose)
+    college_students = []
 
-        # Check if the questions exist in the file, most often a change in the year
-        if not vali.questions_check(headers):
-            return
+    try:
+        for s in students:
+            # Validate if the student is a past recipient, the GPA, college and major rules only check past recipients
+            vali.past_recipient(s, recipient_list, verbose, DEBUG, recipient_cache, events)
+            college_students.append(s)
+    finally:
+        recipient_cache.close()
+    rules.apply_rules(college_students, verbose=verbose, events=events)
+    events.flush('C_validation')
+    vali.list_failures(college_students, cs.college_student, verbose, DEBUG)
+    return college_students
 
-        recipient_list = vali.get_past_recipients('2019 Recipients.csv', year)
-        college_students = []
 
-        for line in d_reader:
-            lastName = line[cs.questions['lastName']]
-            firstName = line[cs.questions['firstName']]
+def read_student(line: dict, year: int, questions: dict = None) -> Student:
+    """Builds a Student from one row of the answers file
 
-            s = Student.Student(firstName, lastName)
+    Parameters
+    ----------
+    line : dict
+        The row, from a csv.DictReader
+    year : int
+        The year of the questions in cs.questions the file uses
+    questions : dict
+        The header of each question in the file, defaults to cs.questions[year], see schema_registry.detect_schema
 
-            s.student_type = line[cs.questions['student_type']]
-            s.GPA_Value = line[cs.questions['GPA_Value']]
-            s.major_school_change = line[cs.questions['major_school_change']]
-            s.major = line['Major']
-            s.NON_ENG_value = line[cs.questions['NON_ENG_value']]
+    Returns
+    -------
+    s : Student
+        The applicant, with the row kept as s.answers
+    """
+    if questions is None:
+        questions = cs.questions[year][0]
 
-            if cs.college_student in s.student_type.upper():
+    def answer(key: str) -> str:
+        # The early years did not ask every question
+        return line[questions[key]] if key in questions else ''
 
-                # Validate if the student is a past recipient, if not no point in other checks
-                if vali.past_recipient(s, recipient_list, verbose, DEBUG):
-                    # Validate GPA
-                    vali.college_gpa(s, verbose, DEBUG)
+    s = Student.Student(answer('firstName').strip(), answer('lastName').strip())
+    s.answers = line
+    s.applicant_id = next((line[column].strip() for column in cs.applicant_id_columns if line.get(column)), '')
 
-                    # Validate that the recipient's college and major are still valid
-                    vali.college_school_major(s, verbose, DEBUG)
-                college_students.append(s)
-    return college_students
+    s.GPA_Value = util.get_num(answer('GPA_Value'))
+    s.ACT_SAT_value = util.get_num(answer('ACT_SAT_value'))
+    s.ACTM_SATM_value = util.get_num(answer('ACTM_SATM_value'))
+
+    s.COMMS_value = util.get_num(answer('COMMS_value'))
+    s.NON_ENG_value = answer('NON_ENG_value')
+    s.student_type = answer('student_type')
+
+    s.major = line.get('Major', '')
+    s.other_major = answer('other_major')
+    s.major_school_change = answer('major_school_change')
+    s.STEM_Classes = answer('STEM_Classes')
+
+    s.College = answer('College')
+    s.Other_College = answer('Other_College')
+    s.high_school_full = answer('high_school')
+    s.high_school_other = answer('high_school_other')
+
+    if year >= 2021:
+        s.submitted = line['Submit Application Complete']
+    else:
+        s.submitted = 'Yes'
+
+    s.address1 = answer('address1')
+    s.address2 = answer('address2')
+    s.city = answer('city')
+    s.state = answer('state')
+    s.zip_code = answer('zip')
+    return s
 
 
-def generate_student_data(file: str, verbose: bool = False, DEBUG: bool = False) -> Tuple[list, list]:
-    """Run through the student file to generate a list of the students with their class variable set
+def generate_student_data(year: int, verbose: bool = False, DEBUG: bool = False, file: str = None) -> Tuple[
+    list, list, list]:
+    """Run through the student file once to generate a list of the students with their class variable set, split by
+    the award they are applying for
 
     Parameters
     ----------
+    year : int
+        The year of the awards
     file : str
-        The file with all of the student's answers
+        The file with all of the student's answers, defaults to the year's Student Answers file
 
     Returns
     -------
     high_school_students : list
         A list containing instances of the Student class of all the high school students
     college_students : list
-        A list containing instances of the Student class of all the high school students
+        A list containing instances of the Student class of all the college students
+    headers : list
+        The columns of the file, None if some of the questions could not be found, see schema_registry.detect_schema
 
     """
+    if file is None:
+        file = f'Student Answers for {str(year)} Incentive Awards.csv'
 
     high_school_students = []
     college_students = []
@@ -292,20 +392,38 @@ def generate_student_data(file: str, verbose: bool = False, DEBUG: bool = False)
         d_reader = csv.DictReader(f)
         headers = d_reader.fieldnames
 
-        # Check if the questions exist in the file, most often a change in the year
-        if not vali.questions_check(headers):
-            return high_school_students, college_students
+        # Find which year's questions the file asks and their headers, the questions often change a little each year
+        schema_year, questions, _ = schema_registry.detect_schema(headers, year, verbose=verbose)
+        if schema_year is None:
+            return high_school_students, college_students, None
+
+        for line in d_reader:
+            s = read_student(line, schema_year, questions)
+            student_type = s.student_type.upper()
+            if cs.high_schooler in student_type:
+                high_school_students.append(s)
+            elif cs.college_student in student_type:
+                college_students.append(s)
+
+    if verbose:
+        print(f'Read {len(high_school_students)} high school and {len(college_students)} college applicants')
+    return high_school_students, college_students, headers
 
-    return high_school_students, college_students
+
+def load_reference_data(verbose: bool = False):
+    """The school lists, ABET programs, course scores and concordances, each read when first used, see
+    utils/reference_data.py"""
+    return reference_data.attach(school_file='Illinois_Schools_Fix.csv', course_file='Course_scoring.csv',
+                                 verbose=verbose)
 
 
 def main():
-    # TODO: Remember to do the XGBoost on the missing ACTs
     """
     The main function which runs the program
     """
-    # TODO: Iterate through the students here once and pass student class to the two functions
     run_test_data = False
+    run_differential = False
+    run_transcripts = False
     run_all_data = True
     create_copy = False
 
@@ -319,13 +437,24 @@ def main():
     if run_test_data:
         filename = 'Validation_Students.csv'
         student_data_time = time.time()
-        validation_HS = compute_HS_scores(filename, verbose, DEBUG, CALL_APIS)
+        # The validation students answer the 2020 questions
+        validation_hs, validation_c, headers = generate_student_data(2020, verbose, DEBUG, filename)
+        validation_HS = compute_HS_scores(2020, verbose, DEBUG, CALL_APIS, validation_hs, headers)
         HS_Run = time.time()
         print('Runtime of HS Validation: ' + str(HS_Run - student_data_time))
         unittests.unit_tests(validation_HS, CALL_APIS)
-        validation_C = compute_C_scores(filename, verbose, DEBUG, CALL_APIS)
+        validation_C = compute_C_scores(2020, verbose, DEBUG, CALL_APIS, validation_c)
         print('Runtime of College Validation: ' + str(time.time() - HS_Run))
         unittests.unit_tests(validation_C, CALL_APIS)
+        unittests.reviewer_assignment_tests()
+        unittests.scorecard_parser_tests()
+        unittests.transcript_parser_tests()
+        print('--------------')
+
+    if run_differential:
+        # Checks the faster engines still give the same results as the original code
+        report = differential.compare_all(differential.generate_cohort(1000), verbose=verbose)
+        report.to_csv('differential_report.csv', index=False)
         print('--------------')
 
     if run_all_data:
@@ -337,15 +466,34 @@ def main():
             df.to_csv('Student_Data/' + 'copy_of_' + filename)
 
         start = time.time()
-        # generate_student_data(filename)
+        # Read the answers once and load the reference data once for both awards
+        high_school_students, college_students, headers = generate_student_data(year, verbose, DEBUG)
+        reference = load_reference_data(verbose)
         student_data_time = time.time()
         print('Runtime of student data split: ' + str(student_data_time - start))
-        high_school_students = compute_HS_scores(year, verbose, DEBUG, CALL_APIS)
+        if headers is None:
+            return
+        # Flags copied or templated answers before the failures are listed by each pipeline, only between the submitted
+        # applications
+        submitted = [s for s in high_school_students + college_students
+                     if s.firstName != 'Test' and s.submitted == 'Yes']
+        text_similarity.check_answers(submitted, year, verbose=verbose, DEBUG=DEBUG)
+        high_school_students = compute_HS_scores(year, verbose, DEBUG, CALL_APIS, high_school_students, headers,
+                                                 reference)
 
         HS_Run = time.time()
         print('Runtime of HS: ' + str(HS_Run - student_data_time))
-        # college_students = compute_C_scores(filename, verbose, DEBUG, CALL_APIS)
-        # print('Runtime of College: ' + str(time.time() - HS_Run))
+        college_students = compute_C_scores(year, verbose, DEBUG, CALL_APIS, college_students)
+        print('Runtime of College: ' + str(time.time() - HS_Run))
+
+        if run_transcripts:
+            # Compares the STEM classes the applicants listed with the ones on their uploaded transcripts
+            transcript_events = diagnostics.Diagnostics(year, verbose=verbose)
+            transcripts_df = transcript_parser.parse_transcripts(f'Transcripts/{year}', verbose=verbose,
+                                                                 events=transcript_events)
+            transcript_events.flush('transcripts')
+            transcript_parser.cross_check(high_school_students, transcripts_df, reference.course_scores()).to_csv(
+                    f'{year}_transcript_check.csv', index=False)
 
 
 main()
@@ -0,0 +1,210 @@
+"""
+Estimates the ACT score of applicants who entered 0 for their ACT/SAT, who would otherwise get no ACT points. A ridge
+regression is fitted on earlier years' scored applicants, from the {year}_output.csv files compute_HS_scores writes,
+using the applicant's GPA, ACT Math, coursework points and their high school's features. The fit is saved in
+model_folder under the hash of its training data, so it is only refitted when that data changes. Applicants given an
+estimate have ACT_imputed set and it is written to the output.
+
+training_data - the features and ACT scores of earlier years' applicants
+fit_model - fits the ridge regression, or loads the saved fit for the same training data
+load_model - fit_model over the output files of cs.act_imputation_years
+impute_missing - estimates the ACT of every applicant without one in one batch and scores them
+"""
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+import constants as cs
+from classes import Student
+from utils import school_features, scoring_util as sutil, util
+
+model_folder = 'util_data/act_model'
+
+
+def feature_matrix(gpa: np.ndarray, actm: np.ndarray, stem: np.ndarray, schools: list) -> np.ndarray:
+    """The model inputs of each applicant. A missing ACT Math score or school feature is NaN, filled in by the model
+
+    Parameters
+    ----------
+    gpa : np.ndarray
+        The GPA on a 4.0 scale
+    actm : np.ndarray
+        The converted ACT Math score, 0 if none was given
+    stem : np.ndarray
+        The coursework points
+    schools : list
+        The school features dict of each applicant, see school_features.lookup_school
+
+    Returns
+    -------
+    features : np.ndarray
+        One row per applicant, with the columns gpa, actm, stem and then cs.act_imputation_school_features
+    """
+    actm = np.where(np.asarray(actm, dtype=float) > 0, actm, np.nan)
+    columns = [np.asarray(gpa, dtype=float), actm, np.asarray(stem, dtype=float)]
+    for feature in cs.act_imputation_school_features:
+        columns.append(np.array([pd.to_numeric(school.get(feature), errors='coerce') if school else np.nan
+                                 for school in schools], dtype=float))
+    return np.column_stack(columns) if len(columns[0]) else np.empty((0, len(columns)))
+
+
+def training_data(years: list, schools_by_key: dict = None, schools_by_id: dict = None) -> tuple:
+    """The features and ACT scores of earlier years' applicants who gave a valid ACT score, applicants whose ACT was
+    estimated by impute_missing are left out
+
+    Parameters
+    ----------
+    years : list
+        The years whose {year}_output.csv to train on, years without one are skipped
+    schools_by_key, schools_by_id : dict
+        The school features, see school_features.load_school_features
+
+    Returns
+    -------
+    features : np.ndarray
+        See feature_matrix
+    act : np.ndarray
+        The ACT score of each row
+    """
+    features, act = [], []
+    for year in years:
+        if not os.path.exists(f'{year}_output.csv'):
+            continue
+        output = pd.read_csv(f'{year}_output.csv', encoding='utf-8-sig', dtype=str).fillna('')
+        output = output[pd.to_numeric(output['ACT_value'], errors='coerce') > cs.ACT_histogram_cutoff]
+        if 'ACT_imputed' in output:
+            # Estimates from earlier runs are not ACT scores, training on them would feed the model its own output
+            output = output[output['ACT_imputed'].str.strip().str.upper() != 'TRUE']
+
+        gpa = []
+        for value in output[cs.questions[year][0]['GPA_Value']]:
+            # GPA_Calc puts the GPA on a 4.0 scale
+            s = Student.Student('', '')
+            s.GPA_Value = util.get_num(value)
+            sutil.GPA_Calc(s)
+            gpa.append(s.GPA_Value)
+        schools = [school_features.lookup_school(schools_by_key, schools_by_id, school) if schools_by_key else {}
+                   for school in output[cs.questions[year][0]['high_school']]]
+        features.append(feature_matrix(np.array(gpa), pd.to_numeric(output['ACTM_value'], errors='coerce').fillna(0),
+                                       pd.to_numeric(output['STEM'], errors='coerce').fillna(0), schools))
+        act.append(pd.to_numeric(output['ACT_value']).to_numpy(dtype=float))
+
+    if not features:
+        return np.empty((0, 3 + len(cs.act_imputation_school_features))), np.empty(0)
+    return np.concatenate(features), np.concatenate(act)
+
+
+class RidgeModel:
+    """A ridge regression over standardized features. Missing values are filled with the training mean and a column
+    per feature records that it was missing"""
+
+    def __init__(self, fill: np.ndarray, mean: np.ndarray, scale: np.ndarray, coef: np.ndarray, intercept: float):
+        self.fill, self.mean, self.scale, self.coef, self.intercept = fill, mean, scale, coef, float(intercept)
+
+    @staticmethod
+    def design(features: np.ndarray, fill: np.ndarray) -> np.ndarray:
+        missing = np.isnan(features)
+        return np.hstack([np.where(missing, fill, features), missing.astype(float)])
+
+    @classmethod
+    def fit(cls, features: np.ndarray, act: np.ndarray, alpha: float) -> 'RidgeModel':
+        known = ~np.isnan(features)
+        fill = np.where(known.any(axis=0), np.nansum(features, axis=0) / np.maximum(known.sum(axis=0), 1), 0)
+        x = cls.design(features, fill)
+        mean, scale = x.mean(axis=0), x.std(axis=0)
+        scale[scale == 0] = 1
+        z = (x - mean) / scale
+        coef = np.linalg.solve(z.T @ z + alpha * np.eye(z.shape[1]), z.T @ (act - act.mean()))
+        return cls(fill, mean, scale, coef, act.mean())
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """The estimated ACT of each row, rounded and kept within 1-36"""
+        z = (self.design(features, self.fill) - self.mean) / self.scale
+        return np.clip(np.round(z @ self.coef + self.intercept), 1, 36).astype(int)
+
+
+def fit_model(features: np.ndarray, act: np.ndarray, alpha: float = cs.act_imputation_alpha,
+              folder: str = model_folder, verbose: bool = False) -> RidgeModel:
+    """Fits the ridge regression, or loads the fit saved for the same training data and settings
+
+    Parameters
+    ----------
+    features : np.ndarray
+        See training_data
+    act : np.ndarray
+        The ACT score of each row
+    alpha : float
+        The ridge penalty
+
+    Returns
+    -------
+    model : RidgeModel
+        The fitted model
+    """
+    key = hashlib.sha256()
+    for part in (features.tobytes(), act.tobytes(), repr((features.shape, alpha,
+                                                          cs.act_imputation_school_features)).encode()):
+        key.update(part)
+    file = os.path.join(folder, key.hexdigest()[:16] + '.npz')
+
+    if os.path.exists(file):
+        saved = np.load(file)
+        return RidgeModel(saved['fill'], saved['mean'], saved['scale'], saved['coef'], saved['intercept'])
+
+    model = RidgeModel.fit(features, act, alpha)
+    os.makedirs(folder, exist_ok=True)
+    np.savez(file, fill=model.fill, mean=model.mean, scale=model.scale, coef=model.coef, intercept=model.intercept)
+    if verbose:
+        error = np.abs(model.predict(features) - act).mean()
+        print(f'Fitted the ACT model on {len(act)} applicants, mean absolute error {error:.2f}')
+    return model
+
+
+def load_model(years: list = cs.act_imputation_years, schools_by_key: dict = None, schools_by_id: dict = None,
+               verbose: bool = False, DEBUG: bool = False):
+    """The ACT model fitted on the given years' output files, None if they have fewer than
+    cs.act_imputation_min_rows applicants with an ACT score"""
+    features, act = training_data(years, schools_by_key, schools_by_id)
+    if len(act) < cs.act_imputation_min_rows:
+        if verbose:
+            print(f'Not estimating missing ACT scores, only {len(act)} earlier applicants to train on')
+        return None
+    return fit_model(features, act, verbose=verbose)
+
+
+def impute_missing(student_list: list, model: RidgeModel, histogram: dict, verbose: bool = False,
+                   DEBUG: bool = False) -> int:
+    """Estimates the ACT of every applicant who entered 0 and scores it as ACT_SAT_Calc would, in one batch
+
+    Parameters
+    ----------
+    student_list : list
+        A list containing all the students as the student class, with GPA, ACT Math and coursework scored
+    model : RidgeModel
+        See load_model
+    histogram : dict
+        The ACT score to its percentile, see histo_arrays
+
+    Returns
+    -------
+    imputed : int
+        The number of applicants given an estimate
+    """
+    missing = [s for s in student_list if s.ACT_SAT_value == 0]
+    if model is None or not missing:
+        return 0
+
+    features = feature_matrix(np.array([s.GPA_Value for s in missing]), np.array([s.ACTM_value for s in missing]),
+                              np.array([s.STEM_Score for s in missing]), [s.school_features for s in missing])
+    for s, act in zip(missing, model.predict(features).tolist()):
+        multiplier = 1 if act == 36 else round(histogram[act] / 100, 2)
+        s.ACT_value = act
+        s.ACT_SAT_Score = round(multiplier * cs.ACT_Score, 2)
+        s.ACT_imputed = True
+
+    if verbose:
+        print(f'Estimated the ACT score of {len(missing)} applicants who did not give one')
+    return len(missing)
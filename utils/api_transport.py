@@ -0,0 +1,161 @@
+"""
+A transport layer for the SmartyStreets and Google Maps calls. It can call the APIs live, record their responses to
+fixture files, or replay the fixtures with simulated latency and errors, so the CALL_APIS code paths can be run and
+timed without keys or a network. In every mode calls are rate limited, and calls failing with a network, timeout or
+rate limit error are retried client side. Any other error is raised straight away.
+
+ApiError - raised when a call fails after all retries, or a replayed call has no fixture
+TransientApiError - an ApiError worth retrying, e.g. a simulated error
+ApiTransport - makes the calls, see call()
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+
+class ApiError(Exception):
+    pass
+
+
+class TransientApiError(ApiError):
+    pass
+
+
+# Network errors and timeouts are OSErrors, including requests' exceptions. Services add their rate limit errors per call
+retryable_errors = (TransientApiError, OSError)
+
+
+class ApiTransport:
+    """Makes API calls in one of three modes
+
+    'live' : call the API
+    'record' : call the API and save each response as a fixture
+    'replay' : return the saved fixture instead of calling the API
+    """
+
+    def __init__(self, mode: str = 'live', fixture_dir: str = 'util_data/api_fixtures', latency: float = 0.0,
+                 error_rate: float = 0.0, rate_limit: float = None, retries: int = 3, backoff: float = 0.5,
+                 seed: int = None, verbose: bool = False):
+        """
+        Parameters
+        ----------
+        mode : str
+            'live', 'record' or 'replay'
+        fixture_dir : str
+            The folder the fixtures are saved in, one sub folder per service
+        latency : float
+            Seconds each replayed call takes
+        error_rate : float
+            The chance, from 0 to 1, that a replayed call fails as if the API had
+        rate_limit : float
+            The most calls per second, None for no limit
+        retries : int
+            How many times a failed call is retried
+        backoff : float
+            Seconds to wait before the first retry, doubled for each retry after
+        seed : int
+            Seeds the simulated errors so a replay is repeatable
+        """
+        if mode not in ('live', 'record', 'replay'):
+            raise ValueError(f'Unknown API mode {mode}, use live, record or replay')
+        self.mode = mode
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.retries = retries
+        self.backoff = backoff
+        self.verbose = verbose
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_call = 0.0
+
+        self.calls = 0
+        self.failures = 0
+        self.retried = 0
+        self.call_time = 0.0
+
+    def _fixture_path(self, service: str, request: dict) -> str:
+        key = hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:24]
+        return os.path.join(self.fixture_dir, service, f'{key}.json')
+
+    def _wait_for_rate_limit(self) -> None:
+        if not self.rate_limit:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_call)
+            self._next_call = start + 1.0 / self.rate_limit
+        if start > now:
+            time.sleep(start - now)
+
+    def _replay(self, path: str):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise TransientApiError('Simulated API error')
+        if not os.path.exists(path):
+            raise ApiError(f'No recorded response at {path}')
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['response']
+
+    def call(self, service: str, request: dict, send, retry_on: tuple = ()):
+        """Makes one API call
+
+        Parameters
+        ----------
+        service : str
+            The name of the API, e.g. 'smartystreets' or 'google_directions'
+        request : dict
+            Everything the response depends on, used to name the fixture. Must not contain keys or passwords
+        send : function
+            Takes no arguments, calls the API and returns the response as plain dicts, lists and values
+        retry_on : tuple
+            The service's own exceptions worth retrying, e.g. its rate limit error, on top of retryable_errors
+
+        Returns
+        -------
+        response : object
+            The response from send, or the recorded response
+        """
+        path = self._fixture_path(service, request)
+        for attempt in range(self.retries + 1):
+            self._wait_for_rate_limit()
+            start = time.perf_counter()
+            try:
+                if self.mode == 'replay':
+                    response = self._replay(path)
+                else:
+                    response = send()
+                    if self.mode == 'record':
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        with open(path, 'w', encoding='utf-8') as f:
+                            json.dump({'request': request, 'response': response}, f, indent=1, default=str)
+                with self._lock:
+                    self.calls += 1
+                    self.call_time += time.perf_counter() - start
+                return response
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                if not isinstance(e, retryable_errors + tuple(retry_on)):
+                    raise
+                if attempt == self.retries:
+                    raise ApiError(f'{service} call failed: {e}') from e
+                with self._lock:
+                    self.retried += 1
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def stats(self) -> dict:
+        """Returns the number of successful calls, failed attempts, retries and the average call time"""
+        return {'calls'        : self.calls,
+                'failures'     : self.failures,
+                'retries'      : self.retried,
+                'avg_call_time': self.call_time / self.calls if self.calls else 0.0}
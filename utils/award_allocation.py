@@ -0,0 +1,127 @@
+"""
+Decides which applicants receive awards once all the applicants have been scored
+
+select_top - returns the k best applicants without sorting the whole cohort
+allocate_awards - assigns award tiers in rank order under award counts and an optional total budget
+update_reviewer_score - changes one applicant's reviewer score, re-ranks them and re-allocates the awards
+write_allocation - writes the ranked applicants and their awards to a csv
+"""
+
+import csv
+import heapq
+
+import constants as cs
+from classes import Ranking
+from classes import Student
+from utils import scoring_util as sutil
+
+
+def select_top(student_list: list, k: int) -> list:
+    """Returns the k best applicants in rank order, in O(n log k) rather than sorting all n applicants
+
+    Parameters
+    ----------
+    student_list : list
+        A list containing all the students as the student class, with total_score set
+    k : int
+        The number of applicants to return
+
+    Returns
+    -------
+    top : list
+        The k best applicants, best first
+    """
+    return heapq.nsmallest(k, student_list, key=Ranking.Ranking.sort_key)
+
+
+def allocate_awards(ranking: Ranking, award_tiers: list = cs.award_tiers, budget: float = None,
+                    eligible=None, verbose: bool = False, DEBUG: bool = False) -> dict:
+    """Assigns award tiers to applicants in rank order. Each tier is given to the next best applicants until its count
+    runs out. If there is a budget, a tier whose amount no longer fits is skipped and the next, smaller, tier is tried
+
+    Parameters
+    ----------
+    ranking : Ranking
+        The ranked applicants
+    award_tiers : list
+        Dicts with the 'name', 'amount' and 'count' of each award, best award first
+    budget : float
+        The total amount that can be awarded, None for no limit
+    eligible : function
+        Takes a Student and returns if they can receive an award, None for all applicants
+
+    Returns
+    -------
+    allocation : dict
+        Ranking.key_of each applicant to the name of the award tier they receive
+    """
+    allocation = {}
+    remaining = [tier['count'] for tier in award_tiers]
+    tier = 0
+    spent = 0.0
+
+    for s in ranking:
+        # Skip over tiers that have been handed out or no longer fit in the budget
+        while tier < len(award_tiers) and (remaining[tier] == 0 or (
+                budget is not None and spent + award_tiers[tier]['amount'] > budget)):
+            tier += 1
+        if tier == len(award_tiers):
+            break
+        if eligible is not None and not eligible(s):
+            continue
+
+        allocation[ranking.key_of(s)] = award_tiers[tier]['name']
+        remaining[tier] -= 1
+        spent += award_tiers[tier]['amount']
+
+    if verbose:
+        print(f'Allocated {len(allocation)} awards totalling {spent}')
+
+    return allocation
+
+
+def update_reviewer_score(ranking: Ranking, s: Student, reviewer_score: float, award_tiers: list = cs.award_tiers,
+                          budget: float = None, eligible=None, verbose: bool = False) -> dict:
+    """Changes one applicant's reviewer score, moves only that applicant in the ranking and re-allocates the awards
+
+    Parameters
+    ----------
+    ranking : Ranking
+        The ranked applicants
+    s : Student
+        The applicant whose reviewer score changed
+    reviewer_score : float
+        The new reviewer score, already multiplied by the reviewer_multiplier
+
+    Returns
+    -------
+    allocation : dict
+        See allocate_awards
+    """
+    s.reviewer_score = reviewer_score
+    s.total_score = sutil.total_score(s)
+    rank = ranking.update(s)
+    if verbose:
+        print(f'{s.lastName}, {s.firstName} is now ranked {rank} with {s.total_score}')
+
+    return allocate_awards(ranking, award_tiers, budget, eligible, verbose)
+
+
+def write_allocation(ranking: Ranking, allocation: dict, file: str) -> None:
+    """Writes the ranked applicants and their awards to a csv
+
+    Parameters
+    ----------
+    ranking : Ranking
+        The ranked applicants
+    allocation : dict
+        The output of allocate_awards
+    file : str
+        The csv to write to
+    """
+    with open(file, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Rank', 'LastName', 'FirstName', 'ApplicantId', 'Total', 'Reviewer', 'GPA', 'Award'])
+        for rank, s in enumerate(ranking, start=1):
+            writer.writerow([rank, s.lastName, s.firstName, s.applicant_id, s.total_score, s.reviewer_score,
+                             s.GPA_Score, allocation.get(ranking.key_of(s), '')])
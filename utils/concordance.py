@@ -0,0 +1,162 @@
+"""
+SAT to ACT concordance tables compiled into dense NumPy arrays indexed by SAT score, so a whole column of scores is
+converted with one gather rather than a dict lookup per applicant.
+Source: https://www.act.org/content/dam/act/unsecured/documents/ACT-SAT-Concordance-Tables.pdf
+
+load_concordance - compiles one concordance csv into a lookup array
+load_concordances - compiles the Composite, Math and English (EBRW) tables
+from_dict - compiles a conversion dict from util.conversion_dict into a lookup array
+convert_scores - converts a column of ACT/SAT scores to ACT scores with the same checks as ACT_SAT_Conv
+"""
+
+import csv
+
+import numpy as np
+
+import constants as cs
+
+concordance_files = {'C': 'SAT_to_ACT.csv',
+                     'M': 'SAT_to_ACT_Math.csv',
+                     'E': 'SAT_to_ACT_English.csv'}
+
+# Status codes returned by convert_scores, 0 means the score converted cleanly
+CONV_OK = 0
+CONV_LOW = 1
+CONV_HIGH = 2
+CONV_DECIMAL = 4
+CONV_MISSING = 8
+
+
+def _compile(table: dict, rule: str) -> np.ndarray:
+    """Builds the dense array from a dict of SAT score to ACT score. SAT scores between table entries are filled in by
+    rule, scores outside the table are NaN
+
+    'exact' : only the SAT scores in the table convert, the same as a dict lookup
+    'floor' : a score takes the ACT score of the closest table entry below it
+    'nearest' : a score takes the ACT score of the closest table entry, ties go to the entry below
+    'linear' : the ACT score is linearly interpolated between the table entries and rounded down
+    """
+    sat = np.array(sorted(table), dtype=int)
+    act = np.array([table[x] for x in sat], dtype=float)
+    lookup = np.full(max(cs.max_SAT, sat[-1]) + 1, np.nan)
+
+    if rule == 'exact':
+        lookup[sat] = act
+        return lookup
+
+    scores = np.arange(sat[0], sat[-1] + 1)
+    if rule == 'floor':
+        lookup[scores] = act[np.searchsorted(sat, scores, side='right') - 1]
+    elif rule == 'nearest':
+        above = np.searchsorted(sat, scores, side='left')
+        below = np.maximum(above - 1, 0)
+        above = np.minimum(above, len(sat) - 1)
+        use_above = (sat[above] - scores) < (scores - sat[below])
+        lookup[scores] = np.where(use_above, act[above], act[below])
+    elif rule == 'linear':
+        lookup[scores] = np.floor(np.interp(scores, sat, act))
+    else:
+        raise ValueError(f'Unknown interpolation rule {rule}, use exact, floor, nearest or linear')
+    return lookup
+
+
+def load_concordance(file_name: str, rule: str = 'floor') -> np.ndarray:
+    """Compiles a concordance csv from the dict_Data folder into a lookup array. The first column is the SAT score and
+    the second the ACT score, rows which are not a pair of numbers (e.g. notes at the end of the file) are skipped
+
+    Parameters
+    ----------
+    file_name : str
+        The concordance csv
+    rule : str
+        How SAT scores between the table entries convert, see _compile
+
+    Returns
+    -------
+    lookup : np.ndarray
+        The ACT score at the index of each SAT score, NaN where the score does not convert
+    """
+    table = {}
+    with open('dict_Data/' + str(file_name), 'r', encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        next(reader)
+        for line in reader:
+            try:
+                table[int(line[0])] = float(line[1])
+            except (ValueError, IndexError):
+                continue
+    return _compile(table, rule)
+
+
+def load_concordances(rule: str = 'floor') -> dict:
+    """Compiles the Composite ('C'), Math ('M') and English/EBRW ('E') concordance tables
+
+    Parameters
+    ----------
+    rule : str
+        How SAT scores between the table entries convert, see _compile
+
+    Returns
+    -------
+    concordances : dict
+        The test type to its lookup array
+    """
+    return {test_type: load_concordance(file_name, rule) for test_type, file_name in concordance_files.items()}
+
+
+def from_dict(conv_dict: dict, rule: str = 'exact') -> np.ndarray:
+    """Compiles a conversion dict from util.conversion_dict into a lookup array
+
+    Parameters
+    ----------
+    conv_dict : dict
+        SAT score to ACT score
+    rule : str
+        How SAT scores between the table entries convert, see _compile
+
+    Returns
+    -------
+    lookup : np.ndarray
+        The ACT score at the index of each SAT score, NaN where the score does not convert
+    """
+    return _compile(conv_dict, rule)
+
+
+def convert_scores(scores, lookup: np.ndarray, min_score: int = cs.min_SAT,
+                   max_score: int = cs.max_SAT) -> tuple:
+    """Converts a column of ACT/SAT scores to ACT scores. Scores of 36 or less are taken to already be ACT scores. Like
+    ACT_SAT_Conv, scores between 36 and min_score, above max_score, with a decimal, or with no conversion become 0
+
+    Parameters
+    ----------
+    scores : np.ndarray
+        The ACT or SAT score of each applicant
+    lookup : np.ndarray
+        The lookup array for the test type
+    min_score : int
+        The lowest valid SAT score
+    max_score : int
+        The highest valid SAT score
+
+    Returns
+    -------
+    act : np.ndarray
+        The ACT score of each applicant
+    status : np.ndarray
+        CONV_OK, or the CONV_ flags for why the score became 0
+    """
+    scores = np.asarray(scores, dtype=float)
+    status = np.zeros(scores.shape, dtype=np.int8)
+
+    status[(36 < scores) & (scores < min_score)] |= CONV_LOW
+    status[scores > max_score] |= CONV_HIGH
+    status[(status == CONV_OK) & (scores != np.floor(scores))] |= CONV_DECIMAL
+
+    sat = (scores > 36) & (status == CONV_OK)
+    index = np.where(sat, scores, 0).astype(int)
+    converted = lookup[np.minimum(index, len(lookup) - 1)]
+    status[sat & np.isnan(converted)] |= CONV_MISSING
+
+    act = np.where(sat, converted, scores)
+    act[status != CONV_OK] = 0.0
+    return act, status
@@ -0,0 +1,138 @@
+"""
+Collects the warnings the validations and scoring raise about each applicant as events, instead of printing them one
+by one inside the per applicant loops. An event is a code, a level, the applicant and any details. Events below the
+level set are dropped before anything is built, and the rest are kept in memory and written together to
+Diagnostics/{year}_{stage}.jsonl (or .csv) when each stage finishes, so they can be read back and filtered with
+read_events. With verbose, flushing prints how many events of each code were raised rather than every event.
+
+Level - the event levels, events below the Diagnostics level are dropped
+Diagnostics - the buffer of events, see emit() and flush()
+read_events - reads the events written by Diagnostics.flush into a DataFrame
+"""
+
+import csv
+import json
+import os
+from collections import Counter
+from enum import IntEnum
+
+import pandas as pd
+
+import constants as cs
+
+
+class Level(IntEnum):
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+    OFF = 100
+
+
+columns = ['Stage', 'Code', 'Level', 'Applicant', 'Details']
+
+
+class Diagnostics:
+    """Keeps the events raised during a run until they are flushed"""
+
+    def __init__(self, year: int, level: str = cs.diagnostics_level, folder: str = cs.diagnostics_folder,
+                 file_format: str = cs.diagnostics_format, verbose: bool = False):
+        """
+        Parameters
+        ----------
+        year : int
+            The year of the awards, the start of the file names
+        level : str
+            The lowest level kept, 'DEBUG', 'INFO', 'WARNING', 'ERROR' or 'OFF'
+        folder : str
+            The folder the events are written to
+        file_format : str
+            'jsonl' or 'csv'
+        """
+        if file_format not in ('jsonl', 'csv'):
+            raise ValueError(f'Unknown diagnostics format {file_format}, use jsonl or csv')
+        self.year = year
+        self.level = Level[level.upper()]
+        self.folder = folder
+        self.file_format = file_format
+        self.verbose = verbose
+        self.events = []
+        self._written = set()
+
+    def enabled(self, level: Level) -> bool:
+        """If events of the level are kept, check it before building any expensive details"""
+        return level >= self.level
+
+    def emit(self, code: str, level: Level, s=None, applicant: str = None, **details) -> None:
+        """Keeps an event if its level is enabled
+
+        Parameters
+        ----------
+        code : str
+            What happened, e.g. 'unknown_class'
+        level : Level
+            How serious it is
+        s : Student
+            The applicant it is about, None if it is not about one applicant
+        applicant : str
+            The applicant as 'LastName, FirstName' when there is no Student, e.g. a transcript's folder name
+        details
+            Anything else worth keeping, must be JSON serializable
+        """
+        if level < self.level:
+            return
+        if s is not None:
+            applicant = f'{s.lastName}, {s.firstName}'
+        elif applicant is None:
+            applicant = ''
+        self.events.append((code, level, applicant, details))
+
+    def flush(self, stage: str) -> str:
+        """Writes the events kept since the last flush to the stage's file and empties the buffer. The first flush of a
+        stage in a run replaces the file from earlier runs, later ones add to it
+
+        Parameters
+        ----------
+        stage : str
+            The stage the events were raised in, e.g. 'HS_scoring'
+
+        Returns
+        -------
+        file : str
+            The file written, None if there were no events
+        """
+        events, self.events = self.events, []
+        if self.verbose:
+            for (code, level), count in sorted(Counter((e[0], e[1]) for e in events).items()):
+                print(f'{stage}: {count:5} {level.name} {code}')
+        if not events:
+            return None
+
+        os.makedirs(self.folder, exist_ok=True)
+        file = os.path.join(self.folder, f'{self.year}_{stage}.{self.file_format}')
+        mode = 'a' if file in self._written else 'w'
+        with open(file, mode, newline='', encoding='utf-8') as f:
+            if self.file_format == 'jsonl':
+                f.writelines(json.dumps({'Stage': stage, 'Code': code, 'Level': level.name, 'Applicant': applicant,
+                                         'Details': details}, default=str) + '\n'
+                             for code, level, applicant, details in events)
+            else:
+                writer = csv.writer(f)
+                if mode == 'w':
+                    writer.writerow(columns)
+                writer.writerows([stage, code, level.name, applicant, json.dumps(details, default=str)]
+                                 for code, level, applicant, details in events)
+        self._written.add(file)
+        return file
+
+
+def read_events(file: str) -> pd.DataFrame:
+    """Reads a file written by Diagnostics.flush, one row per event with the details as a dict"""
+    if file.endswith('.jsonl'):
+        events_df = pd.read_json(file, lines=True, dtype=False)
+        if events_df.empty:
+            return pd.DataFrame(columns=columns)
+        return events_df[columns]
+    events_df = pd.read_csv(file, dtype=str, keep_default_na=False)
+    events_df['Details'] = events_df['Details'].map(json.loads)
+    return events_df
@@ -0,0 +1,378 @@
+"""
+Differential testing of the faster engines against the original scalar code. Both run on copies of the same cohort,
+every output column is compared within a tolerance and the two run times are reported side by side, so an optimized
+engine can only replace the code it copies once it gives the same answers.
+
+generate_cohort - builds a random cohort of applicants, including bad scores and unknown colleges and majors
+load_cohort - builds a cohort from a year's student answers file
+register - adds a legacy and candidate engine pair to engines
+compare - runs one pair on a cohort and reports the differences and timings
+compare_all - runs every registered pair
+"""
+
+import copy
+import csv
+import math
+import random
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import percentileofscore
+
+import constants as cs
+from classes import CohortTable, Student
+from classes.ValidationFlags import ValidationFlags
+from utils import concordance, reference_data, rules, sensitivity, util
+from utils import scoring_util as sutil
+from utils import validations as vali
+
+# The name of each engine pair to its (legacy, candidate, tolerances). Each engine takes a list of Students and
+# returns a DataFrame with one row per Student and the same columns as its pair
+engines = {}
+
+# Float columns differing by less than this are equal, unless the pair gives its own tolerance
+default_tolerance = 1e-9
+
+
+def generate_cohort(n: int = 1000, seed: int = 0, college_share: float = 0.2) -> list:
+    """Builds a random cohort shaped like the applicants. Most have valid scores, a few have the bad scores the
+    validators catch (SAT scores too low or high, decimals, scores with no conversion) and unknown colleges
+
+    Parameters
+    ----------
+    n : int
+        The number of applicants
+    seed : int
+        Seeds the random values so a failing cohort can be rebuilt
+    college_share : float
+        The share of applicants who are college students renewing the award, the rest are high school seniors
+
+    Returns
+    -------
+    student_list : list
+        A list containing all the students as the student class, not yet scored
+    """
+    rng = random.Random(seed)
+    with open('School_Data/ABET_Accredited_Schools.csv', 'r', encoding="utf-8-sig") as f:
+        programs = [(line[cs.abet_school_name], line[cs.abet_major]) for line in csv.DictReader(f)]
+    colleges = sorted({college for college, _ in programs}) + ['Not Listed', 'Harold Washington College']
+    majors = sorted({major for _, major in programs}) + ['Undecided Engineering', 'Not Listed']
+
+    def test_score(low_act: int, high_sat: int) -> float:
+        kind = rng.random()
+        if kind < 0.55:
+            return float(rng.randint(low_act, 36))
+        if kind < 0.9:
+            return float(rng.randrange(high_sat // 2, high_sat + 10, 10))
+        return rng.choice([0.0, 150.0, 1234.5, 1610.0, 2400.0, 27.5, 1055.0])
+
+    student_list = []
+    for i in range(n):
+        s = Student.Student(f'First{i}', f'Last{i}')
+        s.student_type = cs.college_student if rng.random() < college_share else cs.high_schooler
+        s.GPA_Value = round(rng.choice([rng.uniform(2.0, 4.0), rng.uniform(2.0, 4.0), rng.uniform(3.0, 5.0),
+                                        rng.uniform(4.0, 6.0)]), 2)
+        s.ACT_SAT_value = test_score(12, cs.max_SAT)
+        s.ACTM_SATM_value = test_score(12, cs.max_SATM)
+        s.STEM_raw = float(rng.randint(0, 90))
+        s.reviewer_score = cs.reviewer_multiplier * rng.randint(50, 100)
+        s.College = ','.join(rng.sample(colleges, rng.choice([1, 1, 2])))
+        s.major = rng.choice(majors + ['Not listed'])
+        s.NON_ENG_value = rng.choice(['', 'Physics'])
+        s.major_school_change = rng.choice(['', 'No', 'N/A', 'no.', 'Yes, now at Purdue'])
+        s.address_type = rng.choice(['Residential', 'Residential', 'Residential', 'Commercial'])
+        s.city = rng.choice(['Chicago', 'Chicago', 'chicago', 'Evanston'])
+        s.high_school_city = rng.choice(['Chicago', 'Chicago', '', 'Oak Park'])
+        if s.student_type == cs.college_student:
+            # Some college applicants never received the award, their GPA, college and major are not checked
+            s.past_recipient = rng.random() < 0.9
+        student_list.append(s)
+    return student_list
+
+
+def load_cohort(file: str, year: int) -> list:
+    """Builds a cohort from the high school applicants in a year's student answers file
+
+    Parameters
+    ----------
+    file : str
+        The student answers csv in the Student_Data folder
+    year : int
+        The year of the questions in cs.questions the file uses
+
+    Returns
+    -------
+    student_list : list
+        A list containing all the students as the student class, not yet scored
+    """
+    questions = cs.questions[year][0]
+    student_list = []
+    with open('Student_Data/' + str(file), 'r', encoding="utf-8-sig") as f:
+        for line in csv.DictReader(f):
+            if cs.high_schooler not in line[questions['student_type']].upper():
+                continue
+            s = Student.Student(line[questions['firstName']], line[questions['lastName']])
+            s.student_type = line[questions['student_type']]
+            s.GPA_Value = util.get_num(line[questions['GPA_Value']])
+            s.ACT_SAT_value = util.get_num(line[questions['ACT_SAT_value']])
+            s.ACTM_SATM_value = util.get_num(line[questions['ACTM_SATM_value']])
+            s.College = line[questions['College']]
+            s.Other_College = line[questions['Other_College']]
+            s.major = line['Major']
+            student_list.append(s)
+    return student_list
+
+
+def register(name: str, legacy, candidate, tolerances: dict = None) -> None:
+    """Adds an engine pair to engines
+
+    Parameters
+    ----------
+    name : str
+        The name of the pair
+    legacy : function
+        The original code, takes a list of Students and returns a DataFrame with one row per Student
+    candidate : function
+        The engine replacing it, returns the same columns as legacy
+    tolerances : dict
+        The column name to the largest difference still taken as equal
+    """
+    engines[name] = (legacy, candidate, tolerances or {})
+
+
+def _timed(engine, student_list: list, repeats: int) -> tuple:
+    """Runs the engine on fresh copies of the cohort, returns its output and its fastest run time"""
+    best = math.inf
+    for _ in range(repeats):
+        cohort = copy.deepcopy(student_list)
+        start = time.perf_counter()
+        output = engine(cohort)
+        best = min(best, time.perf_counter() - start)
+    return output, best
+
+
+def compare(name: str, student_list: list, repeats: int = 3, show: int = 5, verbose: bool = False) -> pd.DataFrame:
+    """Runs a registered engine pair on the cohort and compares every column
+
+    Parameters
+    ----------
+    name : str
+        The name of the pair in engines
+    student_list : list
+        A list containing all the students as the student class, neither engine changes it
+    repeats : int
+        How many times each engine is run, the fastest time is reported
+    show : int
+        How many of the first divergent applicants to list for each column
+
+    Returns
+    -------
+    report : pd.DataFrame
+        One row per column with the number of mismatches, the largest difference, the first divergent applicants and
+        both engines' run times. A pair whose input files are missing is one row with the reason in skipped
+    """
+    legacy, candidate, tolerances = engines[name]
+    try:
+        expected, legacy_time = _timed(legacy, student_list, repeats)
+        actual, candidate_time = _timed(candidate, student_list, repeats)
+    except FileNotFoundError as e:
+        if verbose:
+            print(f'{name}: SKIPPED - {e}')
+        return pd.DataFrame([{'engine': name, 'column': '', 'applicants': len(student_list), 'mismatches': np.nan,
+                              'max_diff': np.nan, 'first_divergent': '', 'legacy_seconds': np.nan,
+                              'candidate_seconds': np.nan, 'skipped': str(e)}])
+    names = np.array([f'{s.lastName}, {s.firstName}' for s in student_list])
+
+    rows = []
+    for column in expected.columns:
+        want = expected[column].to_numpy()
+        got = actual[column].to_numpy()
+        if np.issubdtype(want.dtype, np.number) and np.issubdtype(got.dtype, np.number):
+            tolerance = tolerances.get(column, default_tolerance)
+            want = want.astype(float)
+            got = got.astype(float)
+            same = np.isclose(want, got, rtol=0, atol=tolerance, equal_nan=True)
+            max_diff = float(np.nanmax(np.abs(want - got), initial=0))
+        else:
+            same = want == got
+            max_diff = np.nan
+
+        divergent = np.flatnonzero(~same)
+        rows.append({'engine'           : name,
+                     'column'           : column,
+                     'applicants'       : len(want),
+                     'mismatches'       : len(divergent),
+                     'max_diff'         : max_diff,
+                     'first_divergent'  : '; '.join(f'{names[i]} ({want[i]} vs {got[i]})'
+                                                   for i in divergent[:show]),
+                     'legacy_seconds'   : legacy_time,
+                     'candidate_seconds': candidate_time,
+                     'skipped'          : ''})
+
+    report = pd.DataFrame(rows)
+    if verbose:
+        status = 'MATCH' if report['mismatches'].sum() == 0 else 'DIFFERS'
+        print(f'{name}: {status} - legacy {legacy_time:.4f}s, candidate {candidate_time:.4f}s, '
+              f'{legacy_time / max(candidate_time, 1e-12):.1f}x')
+        for row in report[report['mismatches'] > 0].itertuples():
+            print(f'    {row.column}: {row.mismatches} mismatches, first {row.first_divergent}')
+    return report
+
+
+def compare_all(student_list: list, repeats: int = 3, show: int = 5, verbose: bool = False) -> pd.DataFrame:
+    """Runs compare for every registered engine pair, see compare"""
+    return pd.concat([compare(name, student_list, repeats, show, verbose) for name in engines], ignore_index=True)
+
+
+# The engine pairs which ship with the program
+
+def _flag_columns(student_list: list) -> dict:
+    return {'validation_flags': vali.failure_flags(student_list), 'validationError': [s.validationError for s in
+                                                                                      student_list]}
+
+
+def _legacy_act_conversion(student_list: list) -> pd.DataFrame:
+    SAT_to_ACT_dict = util.conversion_dict('SAT_to_ACT.csv', 'int')
+    SAT_to_ACT_Math_dict = util.conversion_dict('SAT_to_ACT_Math.csv', 'int')
+    act = [sutil.ACT_SAT_Conv(s, SAT_to_ACT_dict, 'C') for s in student_list]
+    actm = [sutil.ACT_SAT_Conv(s, SAT_to_ACT_Math_dict, 'M') for s in student_list]
+    return pd.DataFrame({'ACT_value': act, 'ACTM_value': actm, **_flag_columns(student_list)})
+
+
+def _status_flags(s: Student, status: int) -> None:
+    # The Student flag ACT_SAT_Conv sets, the low, high and decimal scores are flagged by the rules
+    if status & concordance.CONV_MISSING:
+        s.ACT_SAT_conversion = False
+        s.validationError = True
+
+
+def _candidate_act_conversion(student_list: list) -> pd.DataFrame:
+    SAT_to_ACT = concordance.from_dict(util.conversion_dict('SAT_to_ACT.csv', 'int'))
+    SAT_to_ACT_Math = concordance.from_dict(util.conversion_dict('SAT_to_ACT_Math.csv', 'int'))
+    act, act_status = concordance.convert_scores([s.ACT_SAT_value for s in student_list], SAT_to_ACT)
+    actm, actm_status = concordance.convert_scores([s.ACTM_SATM_value for s in student_list], SAT_to_ACT_Math)
+    for s, status in zip(student_list, act_status | actm_status):
+        _status_flags(s, int(status))
+    return pd.DataFrame({'ACT_value': act, 'ACTM_value': actm, **_flag_columns(student_list)})
+
+
+def _ranks(totals: np.ndarray) -> np.ndarray:
+    # Tied totals share the best rank, totals are rounded first so the order the parts were added in can't split a tie
+    totals = np.round(totals, 6)
+    return 1 + np.searchsorted(np.sort(-totals), -totals, side='left')
+
+
+def _legacy_scoring(student_list: list) -> pd.DataFrame:
+    """Scores the cohort the way compute_HS_scores does, one applicant at a time"""
+    SAT_to_ACT_dict = util.conversion_dict('SAT_to_ACT.csv', 'int')
+    SAT_to_ACT_Math_dict = util.conversion_dict('SAT_to_ACT_Math.csv', 'int')
+
+    histograms = []
+    for conv_dict, test_type in ((SAT_to_ACT_dict, 'C'), (SAT_to_ACT_Math_dict, 'M')):
+        scores = [sutil.ACT_SAT_Conv(copy.copy(s), conv_dict, test_type) for s in student_list]
+        scores = [score for score in scores if score > cs.ACT_histogram_cutoff]
+        histograms.append({x: percentileofscore(scores, x) for x in range(0, 37)})
+
+    for s in student_list:
+        sutil.GPA_Calc(s)
+        sutil.ACT_SAT_Calc(s, SAT_to_ACT_dict, histograms[0], 'C')
+        sutil.ACT_SAT_Calc(s, SAT_to_ACT_Math_dict, histograms[1], 'M')
+        s.STEM_Score = min(cs.STEM_Score, s.STEM_raw / cs.STEM_divisor)
+        s.total_score = sutil.total_score(s)
+
+    totals = np.array([s.total_score for s in student_list])
+    return pd.DataFrame({'GPA_Value'  : [s.GPA_Value for s in student_list],
+                         'ACT_value'  : [s.ACT_value for s in student_list],
+                         'ACTM_value' : [s.ACTM_value for s in student_list],
+                         'total_score': totals,
+                         'rank'       : _ranks(totals)})
+
+
+def _candidate_scoring(student_list: list) -> pd.DataFrame:
+    """Scores the whole cohort at once with concordance.convert_scores and sensitivity.score_scenarios"""
+    conversions = _candidate_act_conversion(student_list)
+    gpa = np.array([s.GPA_Value for s in student_list], dtype=float)
+    scale = np.ceil(gpa)
+    gpa = np.where((scale == 5) | (scale == 6), 4.0 * gpa / np.where(scale == 6, 6.0, 5.0), gpa)
+
+    for s, g, act, actm in zip(student_list, gpa, conversions['ACT_value'], conversions['ACTM_value']):
+        s.GPA_Value, s.ACT_value, s.ACTM_value = g, act, actm
+    baseline = {param: np.atleast_1d(value) for param, value in sensitivity.baseline_scenario().items()}
+    totals, _ = sensitivity.score_scenarios(student_list, baseline)
+
+    return pd.DataFrame({'GPA_Value'  : gpa,
+                         'ACT_value'  : conversions['ACT_value'],
+                         'ACTM_value' : conversions['ACTM_value'],
+                         'total_score': totals[0],
+                         'rank'       : _ranks(totals[0])})
+
+
+def _legacy_accreditation(student_list: list) -> pd.DataFrame:
+    for s in student_list:
+        vali.accred_check(s)
+    return pd.DataFrame({'accredited': [s.accredited for s in student_list]})
+
+
+def _candidate_accreditation(student_list: list) -> pd.DataFrame:
+    # Only maps the ABET table, the school and course files are not needed
+    reference = reference_data.attach()
+    for s in student_list:
+        vali.accred_check(s, reference=reference)
+    return pd.DataFrame({'accredited': [s.accredited for s in student_list]})
+
+
+def _candidate_accreditation_distinct(student_list: list) -> pd.DataFrame:
+    reference = reference_data.attach()
+    table = CohortTable.CohortTable.from_students(student_list, ['College', 'Other_College', 'major'], [])
+    return pd.DataFrame({'accredited': vali.accred_check_cohort(table, reference)})
+
+
+# The flags constants.validation_rules set
+rule_flags = (ValidationFlags.ACT_SAT_low | ValidationFlags.ACT_SAT_high | ValidationFlags.ACT_SAT_decimal |
+              ValidationFlags.GPA_C_Under | ValidationFlags.GPA_C_Warn | ValidationFlags.C_College_change |
+              ValidationFlags.C_Major_Warn | ValidationFlags.ChicagoSchool | ValidationFlags.valid_major)
+
+
+def _legacy_rules(student_list: list) -> pd.DataFrame:
+    """The checks the validators made one applicant at a time before constants.validation_rules set the flags"""
+    for s in student_list:
+        student_type = s.student_type.upper()
+        if cs.high_schooler in student_type:
+            for score in (s.ACT_SAT_value, s.ACTM_SATM_value):
+                if 36 < score < cs.min_SAT:
+                    s.ACT_SAT_low = False
+                elif cs.max_SAT < score:
+                    s.ACT_SAT_high = False
+                elif not float(score).is_integer():
+                    s.ACT_SAT_decimal = False
+            if s.address_type == 'Residential' and s.city.upper() != 'CHICAGO' and \
+                    s.high_school_city.upper() not in ('', 'CHICAGO'):
+                s.ChicagoSchool = False
+            if not s.accredited and s.major == 'Not Listed':
+                s.valid_major = False
+        if cs.college_student in student_type and s.past_recipient:
+            if s.GPA_Value and s.GPA_Value < cs.minimum_gpa:
+                s.GPA_C_Under = False
+            elif s.GPA_Value and s.GPA_Value < cs.warning_gpa:
+                s.GPA_C_Warn = False
+            if s.major_school_change and \
+                    re.sub('[^A-Za-z0-9]+', '', s.major_school_change.strip().upper()) not in ['NO', 'NA']:
+                s.C_College_change = False
+            if s.major == 'Not listed' and s.NON_ENG_value:
+                s.C_Major_Warn = False
+    return pd.DataFrame({'rule_flags': vali.failure_flags(student_list) & np.uint32(rule_flags)})
+
+
+def _candidate_rules(student_list: list) -> pd.DataFrame:
+    rules.apply_rules(student_list)
+    return pd.DataFrame({'rule_flags': vali.failure_flags(student_list) & np.uint32(rule_flags)})
+
+
+register('act_conversion', _legacy_act_conversion, _candidate_act_conversion)
+# The candidate adds the rounded parts of the total in a different order
+register('scoring', _legacy_scoring, _candidate_scoring, {'total_score': 1e-6})
+register('accreditation', _legacy_accreditation, _candidate_accreditation)
+register('rules', _legacy_rules, _candidate_rules)
+register('accreditation_distinct', _legacy_accreditation, _candidate_accreditation_distinct)
@@ -0,0 +1,135 @@
+"""
+A persistent cache of fuzzy name matches so the same free text school or recipient name is only fuzzy matched once,
+across runs and years. Matches are keyed by the input name, a hash of the list of names it was matched against and the
+minimum score, so a changed list (e.g. a new Illinois_Schools file or recipient list) is matched afresh.
+
+MatchCache - the cache for one list of names, pass it to util.name_compare_list
+import_overrides - loads human confirmed matches from a csv
+"""
+
+import csv
+import hashlib
+import sqlite3
+from typing import Tuple
+
+cache_file = 'util_data/match_cache.sqlite'
+
+
+def _normalize(name: str) -> str:
+    # Leading, trailing and repeated whitespace never changes the fuzzy score
+    return ' '.join(name.split())
+
+
+def _connect(file: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(file)
+    conn.execute('CREATE TABLE IF NOT EXISTS matches (dataset TEXT, version TEXT, input TEXT, min_score INTEGER, '
+                 'found INTEGER, match TEXT, score INTEGER, PRIMARY KEY (dataset, version, input, min_score))')
+    conn.execute('CREATE TABLE IF NOT EXISTS overrides (dataset TEXT, input TEXT, match TEXT, '
+                 'PRIMARY KEY (dataset, input))')
+    return conn
+
+
+class MatchCache:
+    """The cached fuzzy matches against one list of names"""
+
+    def __init__(self, dataset: str, list_of_names, file: str = cache_file, verbose: bool = False):
+        """
+        Parameters
+        ----------
+        dataset : str
+            A name for the list, e.g. 'Illinois_Schools'
+        list_of_names : list
+            The list of known good names the inputs are matched against
+        file : str
+            The sqlite file the matches are kept in
+        """
+        self.dataset = dataset
+        self.version = hashlib.sha256('\n'.join(sorted(list_of_names)).encode('utf-8')).hexdigest()[:16]
+        self.conn = _connect(file)
+        self.pending = []
+        self.hits = 0
+        self.misses = 0
+        self.verbose = verbose
+
+        # Matches against an older version of the list can never be used again
+        self.conn.execute('DELETE FROM matches WHERE dataset = ? AND version != ?', (self.dataset, self.version))
+        # An override naming something no longer in the list would be used as a match the callers can't look up
+        names = set(list_of_names)
+        self.overrides, stale = {}, []
+        for name, match in self.conn.execute('SELECT input, match FROM overrides WHERE dataset = ?', (dataset,)):
+            if match and match not in names:
+                stale.append((name, match))
+            else:
+                self.overrides[name] = match
+        if stale and verbose:
+            print(f'WARNING: Skipping {len(stale)} {dataset} match overrides not in the list:')
+            for name, match in stale:
+                print(f'    {name} -> {match}')
+        self.matches = {(row[0], row[1]): (bool(row[2]), row[3], row[4]) for row in self.conn.execute(
+                'SELECT input, min_score, found, match, score FROM matches WHERE dataset = ? AND version = ?',
+                (self.dataset, self.version))}
+
+    def get(self, name: str, minScore: int) -> Tuple[bool, str, int]:
+        """Returns the cached result of name_compare_list, or None if the name has not been matched yet"""
+        key = _normalize(name)
+        if key in self.overrides:
+            self.hits += 1
+            if self.overrides[key]:
+                return True, self.overrides[key], 100
+            return False, 'No Close Matching Name', 0
+
+        result = self.matches.get((key, minScore))
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def put(self, name: str, minScore: int, result: Tuple[bool, str, int]) -> None:
+        """Stores the result of name_compare_list, written to the file in batches"""
+        key = _normalize(name)
+        self.matches[(key, minScore)] = result
+        self.pending.append((self.dataset, self.version, key, minScore, int(result[0]), result[1], int(result[2])))
+        if len(self.pending) >= 100:
+            self.flush()
+
+    def flush(self) -> None:
+        self.conn.executemany('INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?, ?, ?, ?)', self.pending)
+        self.conn.commit()
+        self.pending = []
+
+    def close(self) -> None:
+        self.flush()
+        if self.verbose:
+            print(f'{self.dataset} match cache: {self.hits} hits, {self.misses} misses')
+        self.conn.close()
+
+
+def import_overrides(file: str, cache: str = cache_file, verbose: bool = False) -> int:
+    """Loads human confirmed matches from a csv with the columns Dataset, Input and Match. An empty Match confirms the
+    input has no match. Overrides apply to every version of the dataset's list, except that a MatchCache skips the ones
+    whose Match is not in its list
+
+    Parameters
+    ----------
+    file : str
+        The csv of confirmed matches
+    cache : str
+        The sqlite file the matches are kept in
+
+    Returns
+    -------
+    count : int
+        The number of overrides loaded
+    """
+    with open(file, 'r', encoding="utf-8-sig") as f:
+        rows = [(line['Dataset'], _normalize(line['Input']), line['Match'].strip()) for line in csv.DictReader(f)]
+
+    conn = _connect(cache)
+    conn.executemany('INSERT OR REPLACE INTO overrides VALUES (?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+
+    if verbose:
+        print(f'Imported {len(rows)} match overrides')
+    return len(rows)
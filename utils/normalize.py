@@ -0,0 +1,94 @@
+"""
+One place for the name normalization used by the validators and scorers. Each kind of name has its rules listed once,
+and every function is memoized so a raw string is only normalized once per run however many validators ask for it.
+
+school_name - removes the common words from a high school name for fuzzy matching
+university_name - the university name as compared against the ABET list
+program_name - the major as compared against the ABET list, may hold several majors separated by commas
+person_key - the applicant key, LastName concatenated with FirstName
+normalize_all - normalizes a list of names of one kind, each distinct name only once
+"""
+
+from functools import lru_cache
+
+# How many distinct strings of each kind to remember, far more than the schools, majors and applicants in a year
+cache_size = 8192
+
+# The rules are applied in order, each is a (find, replace) pair
+school_rules = ((' High School', ''),
+                (' Middle School', ''),
+                (' Elementary School', ''),
+                (' College Prep', ''),
+                (' Academy', ''),
+                (' School', ''))
+
+university_rules = (('THE ', ''),
+                    (' AT ', ' - '),
+                    ('-', ''),
+                    (' ', ''))
+
+program_rules = ((' AND ', ','),
+                 (' ', ''),
+                 ('ENGINEERING', ''))
+
+
+def _apply(text: str, rules: tuple) -> str:
+    for find, replace in rules:
+        text = text.replace(find, replace)
+    return text
+
+
+@lru_cache(maxsize=cache_size)
+def school_name(name: str) -> str:
+    """Removes the common words from a high school name, e.g. 'Lane Tech College Prep High School' becomes 'Lane Tech'.
+    Too many schools have "High School" in the name which makes fuzzy match scores too high"""
+    return _apply(name, school_rules)
+
+
+@lru_cache(maxsize=cache_size)
+def university_name(name: str) -> str:
+    """The upper case university name without 'THE', dashes or spaces, e.g. 'The University of Illinois at Chicago'
+    becomes 'UNIVERSITYOFILLINOISCHICAGO'"""
+    return _apply(name.upper().strip(), university_rules)
+
+
+@lru_cache(maxsize=cache_size)
+def program_name(name: str) -> str:
+    """The upper case major without spaces or the word engineering, 'AND' separates majors, e.g. 'Civil and Mechanical
+    Engineering' becomes 'CIVIL,MECHANICAL'"""
+    return _apply(name.upper().strip(), program_rules)
+
+
+@lru_cache(maxsize=cache_size)
+def person_key(lastName: str, firstName: str) -> str:
+    """The applicant key used to match applicants across files, LastName concatenated with FirstName in upper case"""
+    return lastName.strip().upper() + firstName.strip().upper()
+
+
+normalizers = {'school'    : school_name,
+               'university': university_name,
+               'program'   : program_name,
+               'person'    : person_key}
+
+
+def normalize_all(kind: str, names: list) -> list:
+    """Normalizes a list of names of one kind, each distinct name is only normalized once
+
+    Parameters
+    ----------
+    kind : str
+        'school', 'university', 'program' or 'person'. For 'person' each name is a (LastName, FirstName) tuple
+    names : list
+        The raw names
+
+    Returns
+    -------
+    normalized : list
+        The normalized names in the same order
+    """
+    normalizer = normalizers[kind]
+    if kind == 'person':
+        distinct = {name: normalizer(*name) for name in set(names)}
+    else:
+        distinct = {name: normalizer(name) for name in set(names)}
+    return [distinct[name] for name in names]
@@ -0,0 +1,163 @@
+"""
+How stable each applicant's rank is. An applicant's reviewer score is the average of a few reviews, so a different draw
+of reviewers could have moved them up or down. Each applicant's reviews are resampled with replacement many times, the
+totals and ranks are recomputed for every resample at once with NumPy, and the spread of the ranks is reported along
+with how often each applicant lands inside the awards. The reviews are the scores the ranking used, e.g. the normalized
+scores of scoring_util.normalized_reviews, combined the same way, so the resampled ranks are centred on the real ones.
+
+read_reviews - every completed review score of each applicant
+bootstrap_ranks - the rank of each applicant in each resample
+rank_intervals - the rank interval and chance of an award of each applicant
+"""
+
+import csv
+
+import numpy as np
+import pandas as pd
+
+import constants as cs
+from classes import Ranking
+from utils import normalize
+
+
+def read_reviews(file: str) -> dict:
+    """Every completed review score of each applicant
+
+    Parameters
+    ----------
+    file : str
+        The name of the file which contains the reviewer scores
+
+    Returns
+    -------
+    reviews : dict
+        The list of scores by student, LastName concatenated with FirstName
+    """
+    reviews = {}
+    with open('Student_Data/' + str(file), 'r', encoding="utf-8-sig") as f:
+        for line in csv.DictReader(f):
+            if line[cs.ReviewStatus] == 'Complete':
+                student = normalize.person_key(line[cs.StudentLastName], line[cs.StudentFirstName])
+                reviews.setdefault(student, []).append(float(line[cs.GivenScore]))
+    return reviews
+
+
+def _slot_weights(counts: np.ndarray, aggregate) -> np.ndarray:
+    # The aggregate is linear, so its weight for each position is its value on that position's unit vector. Computed
+    # once per number of reviews
+    weights = {}
+    for n in np.unique(counts[counts > 0]).tolist():
+        weights[n] = np.array([aggregate([1.0 if i == k else 0.0 for i in range(n)]) for k in range(n)], dtype=float)
+    return np.concatenate([weights[n] for n in counts.tolist() if n > 0]) if weights else np.empty(0)
+
+
+def bootstrap_ranks(student_list: list, reviews: dict, resamples: int = cs.bootstrap_resamples, seed: int = 0,
+                    batch: int = 1000, aggregate=None) -> np.ndarray:
+    """The rank of each applicant when their reviewer score is combined from a resample of their own reviews. The
+    other scores are kept, the reviewer score is rounded and multiplied as in compute_HS_scores. Applicants without
+    reviews keep their reviewer score
+
+    Parameters
+    ----------
+    student_list : list
+        A list containing all the students as the student class, already scored
+    reviews : dict
+        The review scores of each applicant the ranking used, in the order of the reviews file, e.g. the output of
+        read_reviews or scoring_util.normalized_reviews
+    resamples : int
+        How many times the reviews are resampled
+    seed : int
+        Seeds the resampling
+    batch : int
+        How many resamples are computed at once, bounds the memory used
+    aggregate : function
+        Combines an applicant's reviews into their reviewer score the way the ranking did, must be linear in the
+        scores, e.g. scoring_util.normalized_mean. Defaults to the mean
+
+    Returns
+    -------
+    ranks : np.ndarray
+        The 1 based rank of each resample (rows) and applicant (columns). Ties keep the order of student_list
+    """
+    n = len(student_list)
+    if aggregate is None:
+        aggregate = np.mean
+    scores = [reviews.get(Ranking.Ranking.student_key(s), []) for s in student_list]
+    counts = np.array([len(review) for review in scores], dtype=int)
+    offsets = np.cumsum(counts) - counts
+    flat = np.array([score for review in scores for score in review], dtype=float)
+    weights = _slot_weights(counts, aggregate)
+
+    # Every review slot belongs to one applicant and is refilled from that applicant's reviews
+    owner = np.repeat(np.arange(n), counts)
+    reviewed = counts > 0
+    starts = offsets[reviewed]
+    others = np.array([s.total_score - s.reviewer_score for s in student_list], dtype=float)
+    kept = np.array([s.reviewer_score for s in student_list], dtype=float)
+
+    rng = np.random.default_rng(seed)
+    ranks = np.empty((resamples, n), dtype=np.int32)
+    for first in range(0, resamples, batch):
+        size = min(batch, resamples - first)
+        picks = offsets[owner] + (rng.random((size, len(flat))) * counts[owner]).astype(int)
+        # Each resampled review takes the weight of the position it fills
+        sums = np.add.reduceat(flat[picks] * weights, starts, axis=1) if len(flat) else np.zeros((size, 0))
+        reviewer_points = np.tile(kept, (size, 1))
+        reviewer_points[:, reviewed] = cs.reviewer_multiplier * np.round(sums)
+
+        order = np.argsort(-(others + reviewer_points), axis=1, kind='stable')
+        ranks[first:first + size][np.arange(size)[:, None], order] = np.arange(1, n + 1, dtype=np.int32)
+    return ranks
+
+
+def rank_intervals(student_list: list, reviews: dict, resamples: int = cs.bootstrap_resamples,
+                   interval: float = cs.rank_interval, cutoff: int = None, seed: int = 0, aggregate=None,
+                   verbose: bool = False, DEBUG: bool = False) -> pd.DataFrame:
+    """The rank interval of each applicant and how often they land inside the awards
+
+    Parameters
+    ----------
+    student_list : list
+        A list containing all the students as the student class, already scored
+    reviews : dict
+        The review scores of each applicant the ranking used, see bootstrap_ranks
+    resamples : int
+        How many times the reviews are resampled
+    interval : float
+        The share of resampled ranks inside the interval, e.g. 0.9 for the 5th to 95th percentile
+    cutoff : int
+        The number of awards, applicants ranked at or above this are above the cutoff. Defaults to the total count of
+        cs.award_tiers
+    aggregate : function
+        See bootstrap_ranks
+
+    Returns
+    -------
+    report : pd.DataFrame
+        One row per applicant, best first, with their rank, the number of reviews, the low, median and high resampled
+        rank and the share of resamples ranking them at or above the cutoff
+    """
+    columns = ['Applicant', 'Rank', 'Reviews', 'Rank_low', 'Rank_median', 'Rank_high', 'Award_chance']
+    if not student_list:
+        return pd.DataFrame(columns=columns)
+    if cutoff is None:
+        cutoff = sum(tier['count'] for tier in cs.award_tiers)
+
+    # Resample in rank order so ties are broken the way Ranking breaks them
+    ranked = list(Ranking.Ranking(student_list))
+    ranks = bootstrap_ranks(ranked, reviews, resamples, seed, aggregate=aggregate)
+    low, median, high = np.percentile(ranks, [50 * (1 - interval), 50, 50 * (1 + interval)], axis=0)
+
+    report = pd.DataFrame({'Applicant'   : [f'{s.lastName}, {s.firstName}' for s in ranked],
+                           'Rank'        : np.arange(1, len(ranked) + 1),
+                           'Reviews'     : [len(reviews.get(Ranking.Ranking.student_key(s), [])) for s in ranked],
+                           'Rank_low'    : np.floor(low).astype(int),
+                           'Rank_median' : np.round(median).astype(int),
+                           'Rank_high'   : np.ceil(high).astype(int),
+                           'Award_chance': np.mean(ranks <= cutoff, axis=0)})
+
+    if verbose:
+        uncertain = report[(report['Award_chance'] > 0.05) & (report['Award_chance'] < 0.95)]
+        print(f'Resampled the reviews {resamples} times: {len(uncertain)} applicants have between a 5% and 95% chance '
+              f'of an award')
+    return report
@@ -0,0 +1,242 @@
+"""
+The reference data the validators and scorers look things up in (the Illinois high schools, the Chicago high schools,
+the ABET accredited programs, the course scores and the SAT to ACT concordances), saved as plain NumPy arrays in
+util_data/reference and memory mapped read only, so a run only reads the pages it uses. Each table is built from its
+own source files, only when it is first used and only again when one of those files changes, so code that only needs
+the ABET programs does not need the school or course files.
+
+    reference = reference_data.attach()
+    reference.abet_accredited(schools, majors)  # builds or maps only the ABET table
+
+tables - the source files of each table
+prepare_table - builds one table's arrays, only if a source file changed since they were last built
+prepare_reference_data - prepare_table for several tables at once
+attach - the ReferenceData over the arrays, each table is prepared and mapped when it is first used
+ReferenceData - the arrays and the lookups over them
+"""
+
+import csv
+import json
+import os
+
+import numpy as np
+
+import constants as cs
+from utils import concordance, normalize, util
+from utils import validations as vali
+
+reference_folder = 'util_data/reference'
+default_school_file = 'Illinois_Schools_Fix.csv'
+default_course_file = 'Course_scoring.csv'
+
+# The arrays of each table
+table_arrays = {'schools'     : ['school_names', 'school_cities', 'school_full', 'chicago_schools'],
+                'abet'        : ['abet_universities', 'abet_programs', 'abet_offsets'],
+                'courses'     : ['course_names', 'course_values'],
+                'concordances': ['concordance_' + test_type for test_type in concordance.concordance_files]}
+array_table = {array: table for table, arrays in table_arrays.items() for array in arrays}
+
+
+def tables(school_file: str = default_school_file, course_file: str = default_course_file) -> dict:
+    """The source files of each table"""
+    return {'schools'     : ['School_Data/' + school_file],
+            'abet'        : ['School_Data/ABET_Accredited_Schools.csv'],
+            'courses'     : ['dict_Data/' + course_file],
+            'concordances': ['dict_Data/' + file_name for file_name in concordance.concordance_files.values()]}
+
+
+def _school_arrays(school_file: str) -> dict:
+    school_list, chicago_schools = vali.get_school_list(school_file)
+    # The schools keep the order of school_list so fuzzy matching against them breaks ties the same way
+    return {'school_names'   : np.array(list(school_list), dtype=str),
+            'school_cities'  : np.array([city for city, _ in school_list.values()], dtype=str),
+            'school_full'    : np.array([full for _, full in school_list.values()], dtype=str),
+            'chicago_schools': np.unique(np.array(chicago_schools, dtype=str))}
+
+
+def _abet_arrays() -> dict:
+    """The accredited programs grouped by university, the programs of abet_universities[i] are
+    abet_programs[abet_offsets[i]:abet_offsets[i + 1]]"""
+    programs = {}
+    with open('School_Data/ABET_Accredited_Schools.csv', 'r', encoding="utf-8-sig") as f:
+        for line in csv.DictReader(f):
+            university = normalize.university_name(line[cs.abet_school_name])
+            programs.setdefault(university, set()).add(normalize.program_name(line[cs.abet_major]))
+
+    universities = sorted(programs)
+    grouped = [sorted(programs[university]) for university in universities]
+    return {'abet_universities': np.array(universities, dtype=str),
+            'abet_programs'    : np.array([program for group in grouped for program in group], dtype=str),
+            'abet_offsets'     : np.cumsum([0] + [len(group) for group in grouped])}
+
+
+def _course_arrays(course_file: str) -> dict:
+    course_scores = util.conversion_dict(course_file, 'str')
+    return {'course_names' : np.array(list(course_scores), dtype=str),
+            'course_values': np.array(list(course_scores.values()), dtype=float)}
+
+
+def _build(table: str, school_file: str, course_file: str) -> dict:
+    if table == 'schools':
+        return _school_arrays(school_file)
+    if table == 'abet':
+        return _abet_arrays()
+    if table == 'courses':
+        return _course_arrays(course_file)
+    return {'concordance_' + test_type: concordance.load_concordance(file_name, 'exact')
+            for test_type, file_name in concordance.concordance_files.items()}
+
+
+def prepare_table(table: str, school_file: str = default_school_file, course_file: str = default_course_file,
+                  folder: str = reference_folder, verbose: bool = False) -> list:
+    """Builds a table's arrays unless they were already built from the same source files
+
+    Parameters
+    ----------
+    table : str
+        'schools', 'abet', 'courses' or 'concordances'
+    school_file : str
+        The csv of Illinois high schools in the School_Data folder, see validations.get_school_list
+    course_file : str
+        The csv of course scores in the dict_Data folder, see util.conversion_dict
+    folder : str
+        Where the arrays are saved
+
+    Returns
+    -------
+    arrays : list
+        The names of the table's .npy files in folder
+    """
+    sources = tables(school_file, course_file)[table]
+    for path in sources:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'The {table} reference data is built from {path}, which is missing')
+
+    manifest = os.path.join(folder, table + '.json')
+    hashes = [[path, util.file_hash(path)] for path in sources]
+    try:
+        with open(manifest, 'r') as f:
+            if json.load(f)['sources'] == hashes:
+                return table_arrays[table]
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    arrays = _build(table, school_file, course_file)
+    os.makedirs(folder, exist_ok=True)
+    # Another run may have the arrays memory mapped, so each is written to a temporary file and swapped into place.
+    # The manifest is written last, a build that stops part way is built again on the next run
+    for name, array in arrays.items():
+        path = os.path.join(folder, name + '.npy')
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, array)
+        os.replace(path + '.tmp', path)
+    with open(manifest + '.tmp', 'w') as f:
+        json.dump({'arrays': sorted(arrays), 'sources': hashes}, f, indent=1)
+    os.replace(manifest + '.tmp', manifest)
+
+    if verbose:
+        print(f'Saved the {table} reference arrays to {folder}')
+    return table_arrays[table]
+
+
+def prepare_reference_data(school_file: str = default_school_file, course_file: str = default_course_file,
+                           folder: str = reference_folder, table_names: list = None, verbose: bool = False) -> str:
+    """Builds the arrays of several tables up front, see prepare_table
+
+    Parameters
+    ----------
+    table_names : list
+        The tables to build, defaults to all of them
+
+    Returns
+    -------
+    folder : str
+        Where the arrays are, pass it to attach
+    """
+    for table in table_names or table_arrays:
+        prepare_table(table, school_file, course_file, folder, verbose)
+    return folder
+
+
+def attach(folder: str = reference_folder, school_file: str = default_school_file,
+           course_file: str = default_course_file, verbose: bool = False) -> 'ReferenceData':
+    """The reference data in folder. Nothing is read until a table is used, see ReferenceData
+
+    Parameters
+    ----------
+    folder : str
+        Where the arrays are saved
+    school_file : str
+        The csv of Illinois high schools in the School_Data folder
+    course_file : str
+        The csv of course scores in the dict_Data folder
+
+    Returns
+    -------
+    reference : ReferenceData
+        The reference data
+    """
+    return ReferenceData(folder, school_file, course_file, verbose)
+
+
+class ReferenceData:
+    """The memory mapped reference arrays, each is an attribute named after its .npy file. A table is prepared and
+    mapped the first time one of its arrays is used, and raises FileNotFoundError naming the source file it is missing"""
+
+    def __init__(self, folder: str = reference_folder, school_file: str = default_school_file,
+                 course_file: str = default_course_file, verbose: bool = False):
+        self.folder = folder
+        self.school_file = school_file
+        self.course_file = course_file
+        self.verbose = verbose
+
+    def __getattr__(self, name: str):
+        # Only called for attributes not set yet, i.e. the arrays of tables not mapped yet
+        table = array_table.get(name)
+        if table is None:
+            raise AttributeError(name)
+        for array in prepare_table(table, self.school_file, self.course_file, self.folder, self.verbose):
+            self.__dict__[array] = np.load(os.path.join(self.folder, array + '.npy'), mmap_mode='r')
+        return self.__dict__[name]
+
+    def school_list(self) -> dict:
+        """The school_list of validations.get_school_list, the reduced school name to [city, full school name]"""
+        return {name: [city, full] for name, city, full in
+                zip(self.school_names.tolist(), self.school_cities.tolist(), self.school_full.tolist())}
+
+    def course_scores(self) -> dict:
+        """The course scores of util.conversion_dict, the upper case course name to its score"""
+        return dict(zip(self.course_names.tolist(), self.course_values.tolist()))
+
+    def is_chicago_school(self, school: str) -> bool:
+        """If the school, as written on the application, is a Chicago high school"""
+        school = school.upper().strip()
+        i = np.searchsorted(self.chicago_schools, school)
+        return bool(i < len(self.chicago_schools) and self.chicago_schools[i] == school)
+
+    def abet_accredited(self, schools: list, majors: list) -> bool:
+        """The check of validations.accred_check, if any of the schools has an accredited program in any of the majors.
+        Undecided or blank majors only need the school to have an accredited program
+
+        Parameters
+        ----------
+        schools : list
+            The school names, normalized with normalize.university_name
+        majors : list
+            The majors, normalized with normalize.program_name
+
+        Returns
+        -------
+        accredited : bool
+            If any school and major combination is accredited
+        """
+        undecided = 'UNDECIDED' in majors or '' in majors
+        for school in schools:
+            # A school matches every ABET university whose name contains it
+            for i in np.flatnonzero(np.char.find(self.abet_universities, school) >= 0):
+                if undecided:
+                    return True
+                programs = self.abet_programs[self.abet_offsets[i]:self.abet_offsets[i + 1]]
+                if np.isin(programs, majors).any():
+                    return True
+        return False
@@ -0,0 +1,256 @@
+"""
+How well the reviewers agree with each other. The reviews form a sparse reviewer by applicant matrix for the overall
+score in the Reviewer Scores csv and for each criteria of the detailed feedback workbook. Every statistic is a sum over
+the applicants of per applicant sums, so they are taken from the column sums of the matrix, and bootstrap intervals
+reweight those sums with a resampled applicant count rather than rebuilding the matrix.
+
+read_reviews - the reviews of a year as one long table, one row per reviewer, applicant and criteria
+ReviewMatrix - the sparse reviewer by applicant matrix of one criteria
+icc - the one way intraclass correlation, ICC(1), for unbalanced designs
+krippendorff_alpha - Krippendorff's alpha for interval scores
+agreement - the ICC and alpha of each criteria with bootstrap intervals
+reviewer_report - how far each reviewer is from the other reviewers of the same applicants
+reviewer_drift - each reviewer's leniency across years
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import constants as cs
+from utils import normalize, scorecard_parser, util
+
+overall_criteria = 'Overall'
+
+
+def read_reviews(year: int, verbose: bool = False) -> pd.DataFrame:
+    """The completed reviews of a year with the overall score and, from 2022, each detailed feedback criteria
+
+    Parameters
+    ----------
+    year : int
+        The year of the reviews
+
+    Returns
+    -------
+    reviews : pd.DataFrame
+        The Reviewer, Applicant, Criteria and Score of each review. Applicants are LastName concatenated with FirstName
+    """
+    scores = pd.read_csv(f'Student_Data/Reviewer Scores by Applicant for {year} Incentive Awards.csv',
+                         encoding='utf-8-sig', dtype=str).fillna('')
+    scores = scores[scores[cs.ReviewStatus] == 'Complete']
+    frames = [pd.DataFrame({'Reviewer' : scores[cs.ReviewerLastName] + scores[cs.ReviewerFirstName],
+                            'Applicant': [normalize.person_key(last, first) for last, first in
+                                          zip(scores[cs.StudentLastName], scores[cs.StudentFirstName])],
+                            'Criteria' : overall_criteria,
+                            'Score'    : pd.to_numeric(scores[cs.GivenScore], errors='coerce')})]
+
+    workbook = f'{year} CEF Reviewer Detailed Feedback.xlsx'
+    if year >= 2022 and os.path.exists(f'Student_Data/{workbook}'):
+        feedback = util.get_review_feedback_rows(workbook, verbose)
+        # The workbook names applicants 'LastName, FirstName'
+        names = feedback['Applicant'].astype(str).str.split(',', n=1)
+        applicants = [normalize.person_key(name[0], name[1] if len(name) > 1 else '') for name in names]
+        for criteria in scorecard_parser.scorecard_criteria:
+            frames.append(pd.DataFrame({'Reviewer' : feedback['Reviewer'].astype(str),
+                                        'Applicant': applicants,
+                                        'Criteria' : criteria,
+                                        'Score'    : pd.to_numeric(feedback[criteria], errors='coerce')}))
+
+    reviews = pd.concat(frames, ignore_index=True)
+    return reviews.dropna(subset=['Score']).reset_index(drop=True)
+
+
+class ReviewMatrix:
+    """The reviews of one criteria as a sparse reviewer (rows) by applicant (columns) matrix. A score of 0 is a real
+    score, so which entries exist is kept in a separate indicator matrix"""
+
+    def __init__(self, reviews: pd.DataFrame):
+        reviewer_codes, self.reviewers = pd.factorize(reviews['Reviewer'])
+        applicant_codes, self.applicants = pd.factorize(reviews['Applicant'])
+        shape = (len(self.reviewers), len(self.applicants))
+        self.rows, self.cols = reviewer_codes, applicant_codes
+        self.scores = reviews['Score'].to_numpy(dtype=float)
+        self.matrix = sparse.csr_array((self.scores, (self.rows, self.cols)), shape=shape)
+        self.indicator = sparse.csr_array((np.ones(len(self.scores)), (self.rows, self.cols)), shape=shape)
+
+    def unit_sums(self) -> tuple:
+        """For each applicant, the number of reviews, the sum of the scores and the sum of the squared scores"""
+        return (self.indicator.sum(axis=0), self.matrix.sum(axis=0), (self.matrix * self.matrix).sum(axis=0))
+
+    def overlap(self) -> sparse.csr_array:
+        """The number of applicants each pair of reviewers both reviewed"""
+        return self.indicator @ self.indicator.T
+
+
+def _weighted(weights, values: np.ndarray) -> np.ndarray:
+    """The sum of values over the applicants, once per row of weights, or once unweighted"""
+    return values.sum()[None] if weights is None else weights @ values
+
+
+def icc(k: np.ndarray, s: np.ndarray, q: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+    """The one way random effects intraclass correlation ICC(1) over applicants with at least two reviews, using the
+    average number of reviews n0 of an unbalanced design
+
+    Parameters
+    ----------
+    k, s, q : np.ndarray
+        For each applicant, the number of reviews, the sum of the scores and the sum of the squared scores
+    weights : np.ndarray
+        How many times each applicant is counted, one row per bootstrap resample. Counted once if not given
+
+    Returns
+    -------
+    icc : np.ndarray
+        The ICC of each row of weights
+    """
+    keep = k >= 2
+    k, s, q = k[keep], s[keep], q[keep]
+    weights = None if weights is None else weights[:, keep]
+
+    units = _weighted(weights, np.ones_like(k))
+    n = _weighted(weights, k)
+    total = _weighted(weights, s)
+    between = _weighted(weights, s ** 2 / k) - total ** 2 / n
+    within = _weighted(weights, q - s ** 2 / k)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ms_between = between / (units - 1)
+        ms_within = within / (n - units)
+        n0 = (n - _weighted(weights, k ** 2) / n) / (units - 1)
+        return (ms_between - ms_within) / (ms_between + (n0 - 1) * ms_within)
+
+
+def krippendorff_alpha(k: np.ndarray, s: np.ndarray, q: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+    """Krippendorff's alpha with the interval difference over applicants with at least two reviews
+
+    Parameters
+    ----------
+    k, s, q : np.ndarray
+        For each applicant, the number of reviews, the sum of the scores and the sum of the squared scores
+    weights : np.ndarray
+        How many times each applicant is counted, one row per bootstrap resample. Counted once if not given
+
+    Returns
+    -------
+    alpha : np.ndarray
+        The alpha of each row of weights
+    """
+    keep = k >= 2
+    k, s, q = k[keep], s[keep], q[keep]
+    weights = None if weights is None else weights[:, keep]
+
+    # The squared differences of every ordered pair of scores of an applicant sum to 2 (k q - s^2)
+    n = _weighted(weights, k)
+    observed = _weighted(weights, 2 * (k * q - s ** 2) / (k - 1)) / n
+    total, total_sq = _weighted(weights, s), _weighted(weights, q)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        expected = 2 * (n * total_sq - total ** 2) / (n * (n - 1))
+        return 1 - observed / expected
+
+
+def agreement(reviews: pd.DataFrame, resamples: int = cs.agreement_resamples, interval: float = cs.agreement_interval,
+              seed: int = 0, verbose: bool = False, DEBUG: bool = False) -> pd.DataFrame:
+    """The ICC and Krippendorff's alpha of each criteria, with bootstrap intervals from resampling the applicants
+
+    Parameters
+    ----------
+    reviews : pd.DataFrame
+        The output of read_reviews
+    resamples : int
+        How many bootstrap resamples of the applicants
+    interval : float
+        The share of resamples inside the interval, e.g. 0.9 for the 5th to 95th percentile
+
+    Returns
+    -------
+    report : pd.DataFrame
+        One row per criteria with the reviewers, applicants and reviews, and each statistic with its interval
+    """
+    rng = np.random.default_rng(seed)
+    bounds = [50 * (1 - interval), 50 * (1 + interval)]
+    rows = []
+    for criteria, criteria_reviews in reviews.groupby('Criteria', sort=False):
+        matrix = ReviewMatrix(criteria_reviews)
+        k, s, q = matrix.unit_sums()
+        weights = rng.multinomial(len(k), np.full(len(k), 1 / len(k)), size=resamples).astype(float)
+        row = {'Criteria'  : criteria,
+               'Reviewers' : len(matrix.reviewers),
+               'Applicants': len(matrix.applicants),
+               'Reviews'   : len(matrix.scores)}
+        for name, statistic in (('ICC', icc), ('Alpha', krippendorff_alpha)):
+            row[name] = float(statistic(k, s, q)[0])
+            row[f'{name}_low'], row[f'{name}_high'] = np.nanpercentile(statistic(k, s, q, weights), bounds)
+        rows.append(row)
+
+    report = pd.DataFrame(rows)
+    if verbose:
+        for row in report.itertuples():
+            print(f'{row.Criteria}: ICC {row.ICC:.2f} ({row.ICC_low:.2f}-{row.ICC_high:.2f}), '
+                  f'alpha {row.Alpha:.2f} ({row.Alpha_low:.2f}-{row.Alpha_high:.2f})')
+    return report
+
+
+def reviewer_report(reviews: pd.DataFrame) -> pd.DataFrame:
+    """How each reviewer's scores compare with the average of the other reviewers of the same applicants
+
+    Parameters
+    ----------
+    reviews : pd.DataFrame
+        The output of read_reviews
+
+    Returns
+    -------
+    report : pd.DataFrame
+        One row per reviewer and criteria with the reviews compared, the mean difference from the others (above 0 is
+        generous), the mean absolute difference and the correlation with the others
+    """
+    frames = []
+    for criteria, criteria_reviews in reviews.groupby('Criteria', sort=False):
+        matrix = ReviewMatrix(criteria_reviews)
+        k, s, _ = matrix.unit_sums()
+
+        # The mean of the other reviews of the same applicant, only for applicants with other reviews
+        shared = k[matrix.cols] >= 2
+        rows, x = matrix.rows[shared], matrix.scores[shared]
+        others = (s[matrix.cols][shared] - x) / (k[matrix.cols][shared] - 1)
+
+        def per_reviewer(values):
+            return np.bincount(rows, weights=values, minlength=len(matrix.reviewers))
+
+        count = per_reviewer(np.ones_like(x))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_x, mean_o = per_reviewer(x) / count, per_reviewer(others) / count
+            cov = per_reviewer(x * others) / count - mean_x * mean_o
+            var_x = per_reviewer(x ** 2) / count - mean_x ** 2
+            var_o = per_reviewer(others ** 2) / count - mean_o ** 2
+            frames.append(pd.DataFrame({'Reviewer'     : matrix.reviewers,
+                                        'Criteria'     : criteria,
+                                        'Reviews'      : count.astype(int),
+                                        'Bias'         : per_reviewer(x - others) / count,
+                                        'Mean_abs_diff': per_reviewer(np.abs(x - others)) / count,
+                                        'Correlation'  : cov / np.sqrt(var_x * var_o)}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def reviewer_drift(reports: dict) -> pd.DataFrame:
+    """Each reviewer's bias in each year, to follow reviewers who return year after year
+
+    Parameters
+    ----------
+    reports : dict
+        The year to its reviewer_report
+
+    Returns
+    -------
+    drift : pd.DataFrame
+        One row per reviewer and criteria with their bias in each year as a column, and the change from their first
+        to their last year
+    """
+    drift = pd.concat([report.assign(Year=year) for year, report in reports.items()], ignore_index=True)
+    drift = drift.pivot_table(index=['Reviewer', 'Criteria'], columns='Year', values='Bias')
+    years = sorted(drift.columns)
+    drift['Drift'] = drift[years].ffill(axis=1).iloc[:, -1] - drift[years].bfill(axis=1).iloc[:, 0]
+    return drift.reset_index()
@@ -0,0 +1,218 @@
+"""
+Plans which reviewers review which applicants. Every applicant gets the same number of reviews, no reviewer gets more
+than their share, nobody reviews an applicant they have a conflict with, and the reviewers are linked through the
+applicants they share so each reviewer's harshness can be estimated against every other's. Normalizing reviewer scores
+needs that overlap, get_reviewer_scores_normalized gets it by giving every reviewer the same cs.normalizing_students.
+
+plan_assignments - assigns the reviewers to the applicants, greedily by load then repaired until the overlap is connected
+overlap_components - the groups of reviewers linked through shared applicants
+write_assignments - saves a plan as a csv of Reviewer, Applicant
+"""
+
+import csv
+import heapq
+import math
+import random
+
+import constants as cs
+
+
+class _Components:
+    """Union-find over the reviewers, two reviewers are in the same component when linked through shared applicants"""
+
+    def __init__(self, reviewers):
+        self.parent = {r: r for r in reviewers}
+
+    def find(self, r):
+        while self.parent[r] != r:
+            self.parent[r] = self.parent[self.parent[r]]
+            r = self.parent[r]
+        return r
+
+    def union(self, a, b) -> None:
+        self.parent[self.find(a)] = self.find(b)
+
+
+def overlap_components(plan: dict) -> list:
+    """The groups of reviewers linked through the applicants they share, largest first
+
+    Parameters
+    ----------
+    plan : dict
+        Applicant to the list of their reviewers, see plan_assignments
+
+    Returns
+    -------
+    components : list
+        A set of reviewers for each group
+    """
+    reviewers = {r for assigned in plan.values() for r in assigned}
+    components = _Components(reviewers)
+    for assigned in plan.values():
+        for r in assigned[1:]:
+            components.union(assigned[0], r)
+
+    groups = {}
+    for r in reviewers:
+        groups.setdefault(components.find(r), set()).add(r)
+    return sorted(groups.values(), key=len, reverse=True)
+
+
+def plan_assignments(reviewers: list, applicants: list, reviews_per_applicant: int = cs.reviews_per_applicant,
+                     max_load: int = cs.reviewer_max_load, conflicts=(), calibration: list = (), seed: int = 0,
+                     verbose: bool = False, DEBUG: bool = False) -> dict:
+    """Assigns reviewers to applicants
+
+    Each applicant takes the least loaded reviewers they have no conflict with, preferring reviewers not yet linked to
+    the others reviewing them so the overlap graph joins up as it is built. Applicants with the fewest eligible
+    reviewers go first. If the reviewers still end up in separate groups, reviews are swapped between groups until
+    they are linked.
+
+    Parameters
+    ----------
+    reviewers : list
+        The reviewer roster
+    applicants : list
+        The applicants to be reviewed
+    reviews_per_applicant : int
+        How many reviewers each applicant gets
+    max_load : int
+        The most applicants one reviewer can get, defaults to an even share rounded up plus one
+    conflicts : iterable
+        (reviewer, applicant) pairs which must not be assigned
+    calibration : list
+        Applicants every reviewer reviews, e.g. cs.normalizing_students. They count towards each reviewer's load
+    seed : int
+        Seeds the tie breaks between equally loaded reviewers
+
+    Returns
+    -------
+    plan : dict
+        Applicant to the list of their reviewers
+    """
+    reviewers = list(dict.fromkeys(reviewers))
+    applicants = list(dict.fromkeys(applicants))
+    conflicts = set(conflicts)
+    if reviews_per_applicant > len(reviewers):
+        raise ValueError(f'{reviews_per_applicant} reviews per applicant needs at least that many reviewers, '
+                         f'there are {len(reviewers)}')
+
+    calibration = [a for a in dict.fromkeys(calibration) if a in set(applicants)]
+    regular = [a for a in applicants if a not in set(calibration)]
+    if max_load is None:
+        max_load = math.ceil(len(regular) * reviews_per_applicant / len(reviewers)) + len(calibration) + 1
+
+    rng = random.Random(seed)
+    tie_break = {r: rng.random() for r in reviewers}
+    load = {r: 0 for r in reviewers}
+    components = _Components(reviewers)
+    plan = {}
+
+    for a in calibration:
+        plan[a] = [r for r in reviewers if (r, a) not in conflicts]
+        for r in plan[a]:
+            load[r] += 1
+        for r in plan[a][1:]:
+            components.union(plan[a][0], r)
+
+    # Applicants with the most conflicts have the fewest choices, so they choose first
+    conflict_count = {}
+    for _, a in conflicts:
+        conflict_count[a] = conflict_count.get(a, 0) + 1
+    regular.sort(key=lambda a: -conflict_count.get(a, 0))
+
+    heap = [(load[r], tie_break[r], r) for r in reviewers]
+    heapq.heapify(heap)
+    for a in regular:
+        # Take reviewers off the heap, least loaded first, until enough eligible ones and one spare are found
+        candidates, skipped = [], []
+        while heap and len(candidates) < reviews_per_applicant + 1:
+            entry = heapq.heappop(heap)
+            r = entry[2]
+            if entry[0] != load[r]:
+                continue  # A stale entry, the reviewer's current load is on the heap too
+            if (r, a) in conflicts or load[r] >= max_load:
+                skipped.append(entry)
+            else:
+                candidates.append(entry)
+        if len(candidates) < reviews_per_applicant:
+            raise ValueError(f'Only {len(candidates)} reviewers can still take {a}, {reviews_per_applicant} needed. '
+                             f'Raise max_load or remove conflicts')
+
+        # Prefer a reviewer from another group over the spare with the same or one more review
+        chosen = candidates[:reviews_per_applicant]
+        spare = candidates[reviews_per_applicant:]
+        groups = {components.find(entry[2]) for entry in chosen}
+        if spare and len(groups) == 1 and components.find(spare[0][2]) not in groups and \
+                spare[0][0] <= chosen[-1][0] + 1:
+            chosen[-1], spare[0] = spare[0], chosen[-1]
+
+        plan[a] = [entry[2] for entry in chosen]
+        for r in plan[a]:
+            load[r] += 1
+            components.union(plan[a][0], r)
+            heapq.heappush(heap, (load[r], tie_break[r], r))
+        for entry in spare + skipped:
+            heapq.heappush(heap, entry)
+
+    _repair(plan, reviewers, load, max_load, conflicts, set(calibration))
+
+    if verbose:
+        loads = sorted(load.values())
+        print(f'Assigned {len(reviewers)} reviewers to {len(applicants)} applicants: loads {loads[0]}-{loads[-1]}, '
+              f'{len(overlap_components(plan))} overlap group(s)')
+    return plan
+
+
+def _repair(plan: dict, reviewers: list, load: dict, max_load: int, conflicts: set, calibration: set) -> None:
+    """Swaps single reviews between overlap groups until the groups are linked or no swap is possible. Moving a review
+    of applicant a from reviewer r in one group to reviewer r2 in another links the groups through a's other reviewers,
+    and the two loads change by one each. Reviews are only taken from reviewers left with at least two, so r stays
+    linked, and every swap has to leave fewer groups than before, so it stops after at most one swap per reviewer"""
+    previous = None
+    for _ in range(len(reviewers) + 1):
+        groups = overlap_components(plan)
+        # Reviewers with no applicants at all are their own group
+        assigned = set().union(*groups) if groups else set()
+        groups += [{r} for r in reviewers if r not in assigned]
+        if len(groups) <= 1:
+            return
+        if previous is not None and len(groups) >= previous:
+            break
+        previous = len(groups)
+
+        main, others = groups[0], set().union(*groups[1:])
+        swapped = False
+        for a, assigned_reviewers in plan.items():
+            if a in calibration or len(assigned_reviewers) < 2:
+                continue
+            inside = [r for r in assigned_reviewers if r in main]
+            donors = [r for r in inside if load[r] - 1 >= 2]
+            if len(inside) < 2 or not donors:
+                continue
+            for r2 in sorted(others, key=lambda r: load[r]):
+                if (r2, a) in conflicts or r2 in assigned_reviewers or load[r2] >= max_load:
+                    continue
+                # Move the review from the most loaded reviewer in the main group
+                r = max(donors, key=lambda r: load[r])
+                assigned_reviewers[assigned_reviewers.index(r)] = r2
+                load[r] -= 1
+                load[r2] += 1
+                swapped = True
+                break
+            if swapped:
+                break
+        if not swapped:
+            break
+    raise ValueError(f'The reviewers can not be linked into one overlap group, {len(groups)} groups remain. '
+                     f'Raise max_load, remove conflicts or use fewer reviewers')
+
+
+def write_assignments(plan: dict, file: str) -> None:
+    """Saves the plan as a csv with a Reviewer and an Applicant column, one row per review"""
+    with open(file, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Reviewer', 'Applicant'])
+        for a, assigned in plan.items():
+            for r in assigned:
+                writer.writerow([r, a])
@@ -0,0 +1,241 @@
+"""
+Eligibility rules declared as data in constants.validation_rules and checked over the whole cohort at once. Each rule
+compiles to a vectorized predicate over a table with one row per applicant, so the committee can add or change a rule
+in constants.py and every applicant is checked against every rule in one pass.
+
+compile_rules - turns the declared rules into predicates
+StudentColumns - the Student attributes the rules read, one row per applicant, read as the rules use them
+evaluate_rules - runs the predicates over the applicants, returns the failed flags of each applicant and each rule's timing
+apply_rules - checks a list of Students against the rules and sets their flags, no other code sets these flags
+"""
+
+import time
+from operator import attrgetter
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+import constants as cs
+from classes.ValidationFlags import ValidationFlags, messages
+from utils import diagnostics
+
+# The operators a condition can use, each takes the column and the condition's value
+operators = {'<'      : lambda column, value: column < value,
+             '<='     : lambda column, value: column <= value,
+             '>'      : lambda column, value: column > value,
+             '>='     : lambda column, value: column >= value,
+             '=='     : lambda column, value: column == value,
+             '!='     : lambda column, value: column != value,
+             'in'     : lambda column, value: column.isin(value),
+             'not in' : lambda column, value: ~column.isin(value),
+             'between': lambda column, value: (value[0] < column) & (column < value[1]),
+             'outside': lambda column, value: (column <= value[0]) | (value[1] <= column),
+             'decimal': lambda column, value: column != np.floor(column)}
+
+numeric_operators = {'<', '<=', '>', '>=', 'between', 'outside', 'decimal'}
+
+transforms = {'upper': lambda column: column.astype(str).str.strip().str.upper(),
+              'alnum': lambda column: column.astype(str).str.upper().str.replace('[^A-Z0-9]+', '', regex=True)}
+
+
+def _resolve(value):
+    """A value of 'cs.<name>' is the constant of that name, lists are resolved item by item"""
+    if isinstance(value, (list, tuple)):
+        return [_resolve(item) for item in value]
+    if isinstance(value, str) and value.startswith('cs.'):
+        return getattr(cs, value[3:])
+    return value
+
+
+def _condition(condition: dict):
+    column, op = condition['column'], condition['op']
+    if op not in operators:
+        raise ValueError(f'Unknown operator {op} in rule condition {condition}, use one of {list(operators)}')
+    compare = operators[op]
+    value = _resolve(condition.get('value'))
+    transform = condition.get('transform')
+    if transform is not None and transform not in transforms:
+        raise ValueError(f'Unknown transform {transform} in rule condition {condition}, use one of {list(transforms)}')
+    numeric = op in numeric_operators
+
+    def predicate(table: pd.DataFrame, prepared: dict) -> np.ndarray:
+        # Each column is converted once per transform, however many conditions read it
+        key = (column, numeric, transform)
+        if key not in prepared:
+            values = table[column]
+            if numeric:
+                try:
+                    values = pd.Series(values.to_numpy(dtype=float))
+                except (TypeError, ValueError):
+                    # Text answers which are not numbers never fail a numeric check
+                    values = pd.to_numeric(values, errors='coerce')
+            if transform is not None:
+                # Most answers repeat, e.g. the cities, so each distinct answer is cleaned once
+                codes, distinct = pd.factorize(values, use_na_sentinel=False)
+                cleaned = np.asarray(transforms[transform](pd.Series(distinct, dtype=object)), dtype=object)
+                values = pd.Series(cleaned[codes], dtype=object)
+            prepared[key] = values
+        return np.asarray(compare(prepared[key], value), dtype=bool)
+
+    return predicate
+
+
+def compile_rules(rules: list = None) -> list:
+    """Turns the declared rules into predicates, constants are looked up now so compile again after changing them
+
+    Parameters
+    ----------
+    rules : list
+        The rules, defaults to constants.validation_rules
+
+    Returns
+    -------
+    compiled : list
+        A (name, flag, student_type, predicates, columns) tuple for each rule
+    """
+    if rules is None:
+        rules = cs.validation_rules
+
+    compiled = []
+    for rule in rules:
+        if rule['flag'] not in ValidationFlags.__members__:
+            raise ValueError(f"Rule {rule['name']} sets unknown flag {rule['flag']}")
+        predicates = [_condition(condition) for condition in rule['all']]
+        columns = {condition['column'] for condition in rule['all']}
+        compiled.append((rule['name'], ValidationFlags[rule['flag']], rule.get('student_type'), predicates, columns))
+    return compiled
+
+
+class StudentColumns:
+    """The Student attributes the rules read, one column per attribute with one row per applicant. A column is only
+    read from the Students the first time a rule uses it, validation checks, e.g. accredited, from validation_flags.
+    Rules can be evaluated over it or over any DataFrame with the same columns"""
+
+    def __init__(self, student_list: list):
+        self.student_list = student_list
+        self._columns = {}
+        self._flags = None  # The validation_flags of each applicant, read once for every check
+
+    def __len__(self) -> int:
+        return len(self.student_list)
+
+    def take(self, rows) -> 'StudentColumns':
+        """The columns of only the applicants in the given rows, nothing is read until a rule uses it"""
+        return StudentColumns([self.student_list[i] for i in np.asarray(rows).tolist()])
+
+    def __getitem__(self, column: str) -> pd.Series:
+        if column not in self._columns:
+            if column in ValidationFlags.__members__:
+                flag = ValidationFlags[column]
+                if self._flags is None:
+                    self._flags = list(map(attrgetter('validation_flags'), self.student_list))
+                values = self._flags
+                # Most applicants share the same few combinations of flags, each is tested once
+                passed = {value: not value & flag for value in set(values)}
+                self._columns[column] = pd.Series(np.fromiter(map(passed.__getitem__, values), dtype=bool,
+                                                              count=len(values)))
+            else:
+                # Kept as objects, pandas would otherwise spend longer inferring a string type than the rules take
+                self._columns[column] = pd.Series(list(map(attrgetter(column), self.student_list)), dtype=object)
+        return self._columns[column]
+
+
+def evaluate_rules(table, compiled: list) -> Tuple[np.ndarray, pd.DataFrame]:
+    """Runs every rule over the table. The rules of one student type only run over those applicants, and each column
+    is converted once however many conditions read it
+
+    Parameters
+    ----------
+    table : StudentColumns
+        The applicants, or a DataFrame with a row per applicant and a column per attribute the rules read,
+        including student_type
+    compiled : list
+        The output of compile_rules
+
+    Returns
+    -------
+    flags : np.ndarray
+        The ValidationFlags of the rules each applicant failed
+    timings : pd.DataFrame
+        One row per rule with the number of applicants failing it and how long it took
+    """
+    flags = np.zeros(len(table), dtype=np.uint32)
+    groups = {}
+    for i, rule in enumerate(compiled):
+        groups.setdefault(rule[2], []).append((i, rule))
+
+    timings = [None] * len(compiled)
+    for student_type, group in groups.items():
+        start = time.perf_counter()
+        if student_type is None:
+            rows, members = np.arange(len(table)), table
+        else:
+            types = table['student_type']
+            # Matched once per distinct student type rather than once per applicant
+            matches = [value for value in pd.unique(types) if student_type in str(value).upper()]
+            rows = np.flatnonzero(np.asarray(types.isin(matches), dtype=bool))
+            # The rules of a student type only read the columns of those applicants
+            members = table.take(rows)
+        prepared = {}
+        for i, (name, flag, _, predicates, _) in group:
+            failed = np.ones(len(members), dtype=bool)
+            for predicate in predicates:
+                if not failed.any():
+                    break
+                failed &= predicate(members, prepared)
+            flags[rows[failed]] |= np.uint32(flag)
+            timings[i] = {'rule': name, 'flag': flag.name, 'applicants': int(failed.sum()),
+                          'seconds': time.perf_counter() - start}
+            start = time.perf_counter()
+    return flags, pd.DataFrame(timings)
+
+
+def apply_rules(student_list: list, rules: list = None, verbose: bool = False, DEBUG: bool = False,
+                events: diagnostics.Diagnostics = None) -> pd.DataFrame:
+    """Checks every Student against the rules and sets the flags of the rules they fail
+
+    Parameters
+    ----------
+    student_list : list
+        A list containing all the students as the student class
+    rules : list
+        The rules, defaults to constants.validation_rules
+    events : Diagnostics
+        Collects a warning for each flag an applicant fails, with the attributes the flag's rules read
+
+    Returns
+    -------
+    timings : pd.DataFrame
+        One row per rule with the number of applicants failing it and how long it took
+    """
+    compiled = compile_rules(rules)
+    flags, timings = evaluate_rules(StudentColumns(student_list), compiled)
+    # The attributes the rules of each flag read, kept with the flag's warnings
+    flag_columns = {}
+    for _, flag, _, _, columns in compiled:
+        flag_columns.setdefault(flag, set()).update(columns)
+    flag_columns = {flag: sorted(columns) for flag, columns in flag_columns.items()}
+
+    failed = np.flatnonzero(flags)
+    # Building a ValidationFlags is slow, each combination of an applicant's flags and the rules they failed is built
+    # once
+    combined = {}
+    for i, value in zip(failed.tolist(), flags[failed].tolist()):
+        s = student_list[i]
+        key = (s.validation_flags, value)
+        if key not in combined:
+            combined[key] = s.validation_flags | ValidationFlags(value)
+        s.validation_flags = combined[key]
+        s.validationError = True
+        if events is not None:
+            for flag in ValidationFlags(value):
+                events.emit(flag.name, diagnostics.Level.WARNING, s, message=messages[flag],
+                            **{column: getattr(s, column) for column in flag_columns[flag]})
+
+    if verbose:
+        print(f'Checked {len(student_list)} applicants against {len(compiled)} rules in '
+              f'{timings["seconds"].sum():.4f}s')
+        for row in timings.itertuples():
+            print(f'    {row.applicants:5} failed - {row.rule} ({row.seconds:.4f}s)')
+    return timings
@@ -0,0 +1,178 @@
+"""
+Works out which year's questions an answers export uses from its header row, so an export can be read without first
+editing cs.questions when a question is reworded. Headers are compared normalized, ignoring case, punctuation, spacing
+and years, e.g. 'Fall 2024' and 'Fall 2025' are the same question. Every normalized question of every year is hashed
+into one index, so a header row is checked against all years with one lookup per header. When no year's questions
+are all found, the closest year's missing questions are matched one to one to the remaining headers by fuzzy matching
+and the proposed mapping is reported. Header rows already resolved are remembered in registry_file by the hash of
+the row.
+
+normalize_header - the normalized form headers are compared in
+fingerprint - the hash of a whole header row
+detect_schema - the year and the header of each question for an export's header row
+"""
+
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+from fuzzywuzzy import fuzz
+
+import constants as cs
+
+registry_file = 'util_data/schema_registry.json'
+
+
+def normalize_header(header: str) -> str:
+    """The header lower case with years replaced by 'year' and only single spaces between the words"""
+    header = re.sub(r'\b(19|20)\d{2}\b', 'year', str(header).lower())
+    return ' '.join(re.findall('[a-z0-9]+', header))
+
+
+def fingerprint(headers: list) -> str:
+    """The hash of a header row, the same for any export with the same columns in the same order"""
+    return hashlib.sha256('\x1f'.join(headers).encode()).hexdigest()[:32]
+
+
+def _index() -> dict:
+    """Each normalized question to the years which ask it"""
+    index = {}
+    for year, questions in cs.questions.items():
+        for question in set(questions[0].values()):
+            index.setdefault(normalize_header(question), set()).add(year)
+    return index
+
+
+def _mapping(headers: list, year: int) -> tuple:
+    """Each question key of the year to the export header with the same normalized text, and the keys not found"""
+    by_normalized = {}
+    for header in headers:
+        by_normalized.setdefault(normalize_header(header), header)
+    questions, missing = {}, []
+    for key, question in cs.questions[year][0].items():
+        if question in headers:
+            questions[key] = question
+        elif normalize_header(question) in by_normalized:
+            questions[key] = by_normalized[normalize_header(question)]
+        else:
+            missing.append(key)
+    return questions, missing
+
+
+def _load_registry(file: str) -> dict:
+    try:
+        with open(file, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _remember(file: str, key: str, year: int, questions: dict) -> None:
+    registry = _load_registry(file)
+    registry[key] = {'year': year, 'questions': questions}
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(file, 'w') as f:
+        json.dump(registry, f, indent=1)
+
+
+def detect_schema(headers: list, year: int = None, threshold: int = cs.schema_match_threshold,
+                  file: str = registry_file, verbose: bool = False, DEBUG: bool = False) -> tuple:
+    """Finds the year whose questions the export asks and the export header of each question
+
+    Parameters
+    ----------
+    headers : list
+        The header row of the export
+    year : int
+        The year expected, preferred when several years' questions are all found
+    threshold : int
+        The lowest fuzzy match score, 0-100, a proposed header needs
+    file : str
+        Where resolved header rows are remembered
+
+    Returns
+    -------
+    year : int
+        The year of the questions the export uses, None if some questions could not be matched
+    questions : dict
+        Each question key to its header in the export, like cs.questions[year][0]. The keys which could not be matched
+        are missing
+    proposed : pd.DataFrame
+        One row per question matched by fuzzy matching or not matched at all, with the key, the question in
+        constants.py, the proposed header, its score, how many free headers score as well and if it was used. A
+        header is used for at most one question, and never when another scores as well. Empty for an exact match
+    """
+    headers = list(headers)
+    columns = ['Key', 'Question', 'Proposed header', 'Score', 'Ties', 'Applied']
+    key = fingerprint(headers)
+    known = _load_registry(file).get(key)
+    # A remembered mapping is only used while the year's question keys in constants.py are unchanged
+    if known is not None and set(known['questions']) == set(cs.questions.get(known['year'], [{}])[0]):
+        return known['year'], known['questions'], pd.DataFrame(columns=columns)
+
+    # Count how many of each year's questions are in the export, one lookup per header
+    index = _index()
+    found = {y: 0 for y in cs.questions}
+    for normalized in {normalize_header(header) for header in headers}:
+        for y in index.get(normalized, ()):
+            found[y] += 1
+    wanted = {y: len({normalize_header(q) for q in questions[0].values()}) for y, questions in cs.questions.items()}
+    complete = [y for y in cs.questions if found[y] == wanted[y]]
+
+    if complete:
+        # The expected year, then the year asking the most questions, then the latest
+        best = year if year in complete else max(complete, key=lambda y: (wanted[y], y))
+        questions, _ = _mapping(headers, best)
+        _remember(file, key, best, questions)
+        if verbose and best != year:
+            print(f'The export uses the {best} questions')
+        return best, questions, pd.DataFrame(columns=columns)
+
+    # Propose a header for each question of the closest year that is missing, each header for at most one question
+    best = max(cs.questions, key=lambda y: (found[y] / wanted[y], y == year, y))
+    questions, missing = _mapping(headers, best)
+    unused = [header for header in headers if header not in set(questions.values())]
+    missing_questions = list(dict.fromkeys(cs.questions[best][0][missing_key] for missing_key in missing))
+    scores = {question: [(fuzz.token_sort_ratio(normalize_header(question), normalize_header(header)), header)
+                         for header in unused] for question in missing_questions}
+    # The best pairs first, ties in the order of the questions and headers
+    pairs = sorted(((score, i, j) for i, question in enumerate(missing_questions)
+                    for j, (score, _) in enumerate(scores[question])), key=lambda pair: (-pair[0], pair[1], pair[2]))
+    proposals, taken = {}, set()
+    for score, i, j in pairs:
+        question, header = missing_questions[i], unused[j]
+        if question in proposals or header in taken:
+            continue
+        # A header is only used when no other header still free scores as well, otherwise it is a guess
+        ties = sum(1 for other_score, other in scores[question] if other_score == score and other not in taken)
+        applied = ties == 1 and score >= threshold
+        proposals[question] = (header, score, ties, applied)
+        if applied:
+            taken.add(header)
+
+    rows = []
+    for missing_key in missing:
+        question = cs.questions[best][0][missing_key]
+        header, score, ties, applied = proposals.get(question, (None, 0, 0, False))
+        rows.append({'Key': missing_key, 'Question': question, 'Proposed header': header, 'Score': score,
+                     'Ties': ties, 'Applied': applied})
+        if applied:
+            questions[missing_key] = header
+
+    proposed = pd.DataFrame(rows, columns=columns)
+    resolved = len(questions) == len(cs.questions[best][0])
+    if resolved:
+        _remember(file, key, best, questions)
+    if verbose or not resolved:
+        print(f'The export does not ask every {best} question as written in constants.py, proposed headers:')
+        for row in rows:
+            if row['Applied']:
+                status = 'using'
+            elif row['Ties'] > 1 and row['Score'] >= threshold:
+                status = f"NOT MATCHED, {row['Ties']} headers tie, one is"
+            else:
+                status = 'NOT MATCHED, closest'
+            print(f"    {row['Key']}: {status} {row['Proposed header']!r} ({row['Score']})")
+    return (best if resolved else None), questions, proposed
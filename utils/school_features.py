@@ -0,0 +1,228 @@
+"""
+Builds one table of high school features from the extracts in the School_Data folder, so the quality of an applicant's
+school can be looked up while scoring rather than worked out in a spreadsheet.
+
+school_key - the reduced, upper case school name the table is indexed by, with the school's city
+build_school_features - joins the CPS, PSAT/SAT and NCES extracts and saves the table as parquet
+load_school_features - loads the saved table into dicts for lookups by school name and city and by school id
+lookup_school - returns the features of a school by name and city or by id
+"""
+
+import io
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils import validations as vali
+
+cps_profile_file = 'Chicago_Public_Schools_-_School_Profile_Information_SY1819.csv'
+cps_progress_file = 'Chicago_Public_Schools_-_School_Progress_Reports_SY1819.csv'
+psat_sat_file = 'Assessment_PSATSAT_SchoolLevel_2019.xls'
+nces_public_file = 'ncesdata - Public Schools.xls'
+nces_private_file = 'ncesdata - Private Schools.xls'
+school_features_file = 'School_Features.parquet'
+
+feature_columns = ['school_key', 'school_name', 'city', 'cps_school_id', 'nces_school_id', 'school_type',
+                   'enrollment', 'low_income_pct', 'pct_black', 'pct_hispanic', 'pct_white', 'pct_asian',
+                   'student_teacher_ratio', 'sat_composite', 'sat_ebrw', 'sat_math', 'college_ready_pct',
+                   'graduation_rate', 'college_enrollment_rate', 'attainment_rating', 'overall_rating']
+
+
+def school_key(school_name: str) -> str:
+    """The reduced, upper case school name the table is indexed by, e.g. 'Whitney M Young Magnet High School' becomes
+    'WHITNEY M YOUNG MAGNET'. Look schools up with the full name address_validation resolves to
+
+    Parameters
+    ----------
+    school_name : str
+        The name of the school
+
+    Returns
+    -------
+    key : str
+        The reduced school name
+    """
+    return vali.school_name_reduce(str(school_name).strip(), '').upper().strip()
+
+
+def _city_key(city) -> str:
+    return '' if city is None or pd.isna(city) else str(city).strip().upper()
+
+
+def _read_nces(file: str, header_text: str) -> pd.DataFrame:
+    """The NCES extracts are html tables saved as .xls with a few rows of notes above the header"""
+    with open('School_Data/' + file, 'r', encoding='latin-1') as f:
+        table = pd.read_html(io.StringIO(f.read()))[0]
+    header_row = table.index[table.eq(header_text).any(axis=1)][0]
+    table.columns = table.loc[header_row]
+    return table.loc[header_row + 1:].reset_index(drop=True)
+
+
+def _cps_features() -> pd.DataFrame:
+    profile = pd.read_csv('School_Data/' + cps_profile_file)
+    profile = profile[profile['Is_High_School'] == True]
+    progress = pd.read_csv('School_Data/' + cps_progress_file)
+    sat = pd.read_excel('School_Data/' + psat_sat_file, sheet_name='All Students Data')
+    sat = sat[sat['Test'] == 'SAT']
+
+    total = profile['Student_Count_Total'].replace(0, np.nan)
+    cps = pd.DataFrame({'school_key'             : profile['Long_Name'].map(school_key),
+                        'school_name'            : profile['Long_Name'],
+                        'city'                   : profile['City'].str.title(),
+                        'cps_school_id'          : profile['School_ID'].astype(str),
+                        'enrollment'             : profile['Student_Count_Total'],
+                        'low_income_pct'         : 100 * profile['Student_Count_Low_Income'] / total,
+                        'pct_black'              : 100 * profile['Student_Count_Black'] / total,
+                        'pct_hispanic'           : 100 * profile['Student_Count_Hispanic'] / total,
+                        'pct_white'              : 100 * profile['Student_Count_White'] / total,
+                        'pct_asian'              : 100 * profile['Student_Count_Asian'] / total,
+                        'graduation_rate'        : profile['Graduation_Rate_School'],
+                        'college_enrollment_rate': profile['College_Enrollment_Rate_School'],
+                        'overall_rating'         : profile['Overall_Rating']})
+
+    progress = pd.DataFrame({'cps_school_id'    : progress['School_ID'].astype(str),
+                             'school_type'      : 'CPS ' + progress['School_Type'].fillna('').astype(str),
+                             'attainment_rating': progress['Student_Attainment_Rating']})
+    sat = pd.DataFrame({'cps_school_id'    : sat['School ID'].astype(str),
+                        'sat_composite'    : pd.to_numeric(sat['Average Composite Score'], errors='coerce'),
+                        'sat_ebrw'         : pd.to_numeric(sat['Average EBRW Score'], errors='coerce'),
+                        'sat_math'         : pd.to_numeric(sat['Average Math Score'], errors='coerce'),
+                        'college_ready_pct': pd.to_numeric(sat['% Meeting College Readiness Benchmark'],
+                                                           errors='coerce')})
+
+    cps = cps.merge(progress.drop_duplicates('cps_school_id'), on='cps_school_id', how='left')
+    return cps.merge(sat.drop_duplicates('cps_school_id'), on='cps_school_id', how='left')
+
+
+def _nces_features() -> pd.DataFrame:
+    public = _read_nces(nces_public_file, 'School Name')
+    students = pd.to_numeric(public['Students*'], errors='coerce')
+    lunch = pd.to_numeric(public['Free Lunch*'], errors='coerce') + pd.to_numeric(public['Reduced Lunch*'],
+                                                                                  errors='coerce')
+    public = pd.DataFrame({'school_key'           : public['School Name'].map(school_key),
+                           'school_name'          : public['School Name'],
+                           'city'                 : public['City'].str.title(),
+                           'nces_school_id'       : public['NCES School ID'].astype(str),
+                           'school_type'          : np.where(public['Charter'] == 'Yes', 'Charter', 'Public'),
+                           'enrollment'           : students,
+                           'low_income_pct'       : 100 * lunch / students.replace(0, np.nan),
+                           'student_teacher_ratio': pd.to_numeric(public['Student Teacher Ratio*'],
+                                                                  errors='coerce')})
+
+    private = _read_nces(nces_private_file, 'PSS_INST')
+    private = pd.DataFrame({'school_key'           : private['PSS_INST'].str.title().map(school_key),
+                            'school_name'          : private['PSS_INST'].str.title(),
+                            'city'                 : private['PSS_CITY'].str.title(),
+                            'nces_school_id'       : private['PSS_SCHOOL_ID'].astype(str),
+                            'school_type'          : 'Private',
+                            'enrollment'           : pd.to_numeric(private['PSS_ENROLL_T'], errors='coerce'),
+                            'pct_black'            : pd.to_numeric(private['PSS_BLACK_PCT'], errors='coerce'),
+                            'pct_hispanic'         : pd.to_numeric(private['PSS_HISP_PCT'], errors='coerce'),
+                            'pct_white'            : pd.to_numeric(private['PSS_WHITE_PCT'], errors='coerce'),
+                            'pct_asian'            : pd.to_numeric(private['PSS_ASIAN_PCT'], errors='coerce'),
+                            'student_teacher_ratio': pd.to_numeric(private['PSS_STDTCH_RT'], errors='coerce')})
+
+    return pd.concat([public, private], ignore_index=True)
+
+
+def build_school_features(verbose: bool = False, DEBUG: bool = False) -> pd.DataFrame:
+    """Joins the CPS profile, CPS progress report, CPS PSAT/SAT and NCES public and private school extracts into one
+    row per high school and saves it to School_Data/School_Features.parquet. CPS schools are joined on their School ID,
+    the NCES data is joined on the reduced school name and city and fills in anything CPS doesn't have. Schools in
+    different cities are kept apart even when they share a name, e.g. the CENTRAL high schools. If two schools share a
+    reduced name in the same city, the CPS school is kept, then the first NCES school
+
+    Returns
+    -------
+    school_features : pd.DataFrame
+        One row per high school with the feature_columns
+    """
+    index = ['school_key', 'city_key']
+    cps = _cps_features()
+    nces = _nces_features()
+    cps['city_key'] = cps['city'].map(_city_key)
+    nces['city_key'] = nces['city'].map(_city_key)
+    cps = cps.drop_duplicates(index).set_index(index)
+    nces = nces.drop_duplicates(index).set_index(index)
+
+    school_features = cps.combine_first(nces).reset_index()
+    school_features = school_features.reindex(columns=feature_columns)
+
+    school_features.to_parquet('School_Data/' + school_features_file, index=False)
+    if verbose:
+        print(f'Saved {len(school_features)} schools to {school_features_file}')
+        shared = school_features['school_key'].duplicated(keep=False)
+        if shared.any():
+            print(f'{school_features.loc[shared, "school_key"].nunique()} school names are used in more than one '
+                  f'city, they are only matched with the applicant\'s school city')
+
+    return school_features
+
+
+def load_school_features(file: str = school_features_file, verbose: bool = False) -> Tuple[dict, dict]:
+    """Loads the saved school features into dicts so each lookup is O(1)
+
+    Parameters
+    ----------
+    file : str
+        The parquet file built by build_school_features in the School_Data folder
+
+    Returns
+    -------
+    by_key : dict
+        The school_key to a dict of the upper case city to the features of the school of that name in that city
+    by_id : dict
+        The CPS and NCES school ids to the school's (school_key, city)
+    """
+    school_features = pd.read_parquet('School_Data/' + file)
+    school_features = school_features.replace({np.nan: None})
+
+    by_key, by_id = {}, {}
+    for row in school_features.to_dict('records'):
+        city = _city_key(row['city'])
+        by_key.setdefault(row['school_key'], {})[city] = row
+        for id_col in ('cps_school_id', 'nces_school_id'):
+            if row[id_col]:
+                by_id[row[id_col]] = (row['school_key'], city)
+
+    if verbose:
+        shared = sorted(key for key, cities in by_key.items() if len(cities) > 1)
+        if shared:
+            print(f'{len(shared)} school names are used in more than one city and are only matched with a city: '
+                  f'{", ".join(shared)}')
+    return by_key, by_id
+
+
+def lookup_school(by_key: dict, by_id: dict, school_name: str = None, school_id: str = None, city: str = None) -> dict:
+    """Returns the features of a school by its id or its name and city, an empty dict if it isn't in the table. A
+    name used by schools in more than one city only matches with the city, rather than guessing between them
+
+    Parameters
+    ----------
+    by_key : dict
+        See load_school_features
+    by_id : dict
+        See load_school_features
+    school_name : str
+        The full name of the school, e.g. as resolved by address_validation
+    school_id : str
+        A CPS or NCES school id
+    city : str
+        The city of the school, e.g. s.high_school_city
+
+    Returns
+    -------
+    features : dict
+        The school's features
+    """
+    if school_id is not None and str(school_id) in by_id:
+        key, school_city = by_id[str(school_id)]
+        return by_key[key][school_city]
+    if school_name is not None:
+        cities = by_key.get(school_key(school_name), {})
+        if city:
+            return cities.get(_city_key(city), {})
+        if len(cities) == 1:
+            return next(iter(cities.values()))
+    return {}
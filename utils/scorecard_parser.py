@@ -0,0 +1,162 @@
+"""
+Parses reviewer scorecard pages saved from AwardSpring so scraping the site and reading the scores are separate steps.
+The pages are expected to be saved as Scorecards/<year>/<Reviewer Name>/<anything>.html, one page per scorecard.
+
+parse_scorecard - parses the html of one scorecard into a record
+parse_scorecard_file - parses one saved scorecard page, the reviewer is taken from the folder name
+find_scorecards - returns all saved scorecard pages in a folder
+parse_scorecards - parses all saved scorecard pages in parallel and returns the reviewer feedback DataFrame
+save_review_feedback - writes the reviewer feedback DataFrame to the workbook get_review_feedback reads
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+from lxml import html as lxml_html
+
+# The scorecard criteria in the order they appear on the page, these are the columns get_review_feedback expects
+scorecard_criteria = ['Community Service / Work', 'Short Essay', 'Bonus/Discretionary Points']
+
+# The xpaths used when scraping, tied to the same scorecard container under <main>. The page layout accepted is the
+# one scrape_awardspring.ipynb saves, see Student_Data/Validation_Scorecards: the applicant's name in the h2 of the
+# 3rd block, the scorecard in the 6th block with the criteria as the 2nd-4th rows of its 2nd div, each a table whose
+# first cell holds the score's input. The table's rows may or may not be wrapped in a <tbody>
+scorecard_xpath = '/html/body/section/div/main/div/div/div'
+student_name_xpath = scorecard_xpath + '/div[3]/h2'
+score_xpath = scorecard_xpath + '/div[6]/div[2]/div[position() >= 2 and position() <= 4]/div/table//tr/td[1]'
+note_xpath = '//*[@id="notes"]'
+
+
+def parse_scorecard(page: str, reviewer: str, verbose: bool = False, DEBUG: bool = False) -> dict:
+    """Parses the html of one scorecard into a record with the reviewer, applicant, scores and notes
+
+    Parameters
+    ----------
+    page : str
+        The html of the scorecard page
+    reviewer : str
+        The name of the reviewer who filled out the scorecard
+
+    Returns
+    -------
+    record : dict
+        The reviewer, applicant, one entry per scorecard criteria and the notes
+    """
+    tree = lxml_html.fromstring(page)
+
+    student_name = tree.xpath(student_name_xpath)
+    record = {'Reviewer' : reviewer,
+              'Applicant': student_name[0].text_content().strip() if student_name else ''}
+
+    cells = tree.xpath(score_xpath)
+    for i, criteria in enumerate(scorecard_criteria):
+        score = 0
+        if i < len(cells):
+            values = cells[i].xpath('.//@value')
+            try:
+                score = int(values[0])
+            except (IndexError, ValueError):
+                if verbose:
+                    print(f'WARNING: No {criteria} score found for {record["Applicant"]} by {reviewer}')
+        record[criteria] = score
+
+    notes = tree.xpath(note_xpath)
+    record['Notes'] = notes[0].text_content().strip() if notes else ''
+
+    return record
+
+
+def parse_scorecard_file(path: str, verbose: bool = False, DEBUG: bool = False) -> dict:
+    """Parses one saved scorecard page, the reviewer is the name of the folder the page is saved in
+
+    Parameters
+    ----------
+    path : str
+        The path to the saved scorecard page
+
+    Returns
+    -------
+    record : dict
+        See parse_scorecard
+    """
+    reviewer = os.path.basename(os.path.dirname(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_scorecard(f.read(), reviewer, verbose, DEBUG)
+
+
+def find_scorecards(folder: str) -> list:
+    """Returns all saved scorecard pages in a folder, sorted so the output order does not depend on the file system
+
+    Parameters
+    ----------
+    folder : str
+        The folder with one sub folder per reviewer
+
+    Returns
+    -------
+    pages : list
+        The paths to all the saved scorecard pages
+    """
+    pages = []
+    for root, _, files in os.walk(folder):
+        for file in files:
+            if file.lower().endswith(('.html', '.htm')):
+                pages.append(os.path.join(root, file))
+    return sorted(pages)
+
+
+def parse_scorecards(folder: str, workers: int = None, verbose: bool = False, DEBUG: bool = False) -> pd.DataFrame:
+    """Parses all saved scorecard pages in a folder in parallel. The DataFrame is built once from all the records
+    rather than concatenating each scorecard onto it
+
+    Parameters
+    ----------
+    folder : str
+        The folder with one sub folder per reviewer, e.g. 'Scorecards/2024'
+    workers : int
+        The number of processes to parse with, defaults to the number of CPUs. 1 parses in this process
+
+    Returns
+    -------
+    review_feedback_df : pd.DataFrame
+        One row per scorecard with the Reviewer, Applicant, scorecard criteria and Notes columns
+    """
+    pages = find_scorecards(folder)
+
+    if workers == 1 or len(pages) < 2:
+        records = [parse_scorecard_file(page, verbose, DEBUG) for page in pages]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            records = list(executor.map(partial(parse_scorecard_file, verbose=verbose, DEBUG=DEBUG), pages,
+                                        chunksize=max(1, len(pages) // 64)))
+
+    review_feedback_df = pd.DataFrame.from_records(records,
+                                                   columns=['Reviewer', 'Applicant'] + scorecard_criteria + ['Notes'])
+    review_feedback_df = review_feedback_df.drop_duplicates().reset_index(drop=True)
+
+    if verbose:
+        print(f'Parsed {len(pages)} scorecards into {len(review_feedback_df)} reviews')
+
+    return review_feedback_df
+
+
+def save_review_feedback(review_feedback_df: pd.DataFrame, year: int) -> str:
+    """Writes the parsed reviewer feedback to the workbook that util.get_review_feedback reads
+
+    Parameters
+    ----------
+    review_feedback_df : pd.DataFrame
+        The output of parse_scorecards
+    year : int
+        The award year
+
+    Returns
+    -------
+    file_name : str
+        The name of the workbook in the Student_Data folder
+    """
+    file_name = f'{year} CEF Reviewer Detailed Feedback.xlsx'
+    review_feedback_df.to_excel(f'Student_Data/{file_name}', index=False)
+    return file_name
@@ -2,13 +2,18 @@
 All functions related to generating the score for each applicant
 
 get_reviewer_scores_normalized - returns a dict of normalized reviewer scores
+normalized_reviews - each student's review scores adjusted for harsh and generous reviewers
+normalized_mean - combines a student's adjusted review scores into their normalized reviewer score
 get_reviewer_scores - returns the average score for each student in a dict
+get_reviewer_score_stats - one pass over the reviews, returns per student stats and those with a wide reviewer spread
 generate_histo_arrays - generates lists containing all the ACT and ACTM scores
+histo_arrays - the same from scores already read from the file
 GPA_Calc - Calculates the number of points a student gets for their GPA
 ACT_SAT_Conv - Converts SAT scores to ACT scores
 ACT_SAT_Calc - The scoring function for ACT and ACT Math
 class_split - WIP: A function that cleans an input list of classes the student has taken
 COMMS_calc - Converts total community service hours into a score
+total_score - The total of all of an applicant's scores
 
 """
 
@@ -21,15 +26,48 @@ import numpy as np
 from scipy.stats import percentileofscore
 
 import constants as cs
+from classes import ReviewStats
 from classes import Student
-from utils import util
+from utils import concordance, diagnostics, normalize, util
 
 
 # To run this the student names MUST be concatenated together in the order "LastNameFirstName"
 # For example if FirstName = John and LastName = Doe, then student1 = DoeJohn
 # Currently it works if a reviewer has a z score, for all students, greater or less than 1/-1 for all test students
 #
-def get_reviewer_scores_normalized(file: str, year: int, verbose: bool = False, DEBUG: bool = False) -> dict:
+def get_reviewer_scores_normalized(file: str, year: int, verbose: bool = False, DEBUG: bool = False,
+                                   reviews: list = None) -> dict:
+    """Returns the normalized reviewer score of each student, see normalized_reviews and normalized_mean
+
+    Parameters
+    ----------
+    file : str
+        The name of the file which contains the reviewer scores
+    reviews : list
+        The completed reviews as (student, reviewer, score), see get_reviewer_score_stats. The file is only read when
+        they are not given
+
+    Returns
+    -------
+    reviewer_output : dict
+        A dictionary of normalized reviewer scores
+    """
+    adjusted = normalized_reviews(file, year, verbose, DEBUG, reviews)
+    return {student: normalized_mean(scores) for student, scores in adjusted.items()}
+
+
+def normalized_mean(scores: list) -> float:
+    """Combines a student's adjusted review scores, in the order of the reviews file, into their normalized reviewer
+    score. A linear combination of the scores, see rank_stability.bootstrap_ranks"""
+    n = len(scores)
+    output = scores[0]
+    for score in scores[1:]:
+        output = output + (score - output) / n
+    return output
+
+
+def normalized_reviews(file: str, year: int, verbose: bool = False, DEBUG: bool = False,
+                       reviews: list = None) -> dict:
     """This function takes in a file with all the reviews for all students and normalizes them. It does this based on
     the prerequisite that all reviewers have been assigned the same three students to review in addition to others.
     The program will compute the z-score for each reviewer and student combo for the three in question (how many
@@ -42,11 +80,15 @@ def get_reviewer_scores_normalized(file: str, year: int, verbose: bool = False,
     ----------
     file : str
         The name of the file which contains the reviewer scores
+    reviews : list
+        The completed reviews as (student, reviewer, score), see get_reviewer_score_stats. The file is only read when
+        they are not given
 
     Returns
     -------
-    reviewer_output : dict
-        A dictionary of normalized reviewer scores
+    adjusted : dict
+        Each student's review scores, in the order of the reviews file, with the harsh and generous reviewers' scores
+        adjusted
 
     """
     reviewer_list = []
@@ -62,45 +104,40 @@ def get_reviewer_scores_normalized(file: str, year: int, verbose: bool = False,
     all_scores = {}
     harsh_reviewer = []
     generous_reviewer = []
-    reviewer_output = {}
+    adjusted = {}
 
     student1 = cs.normalizing_students[year][0]
     student2 = cs.normalizing_students[year][1]
     student3 = cs.normalizing_students[year][2]
 
-    with open('Student_Data/' + str(file), 'r', encoding="utf-8-sig") as f:
-        # get fieldnames from DictReader object and store in list
-        d_reader = csv.DictReader(f)
-        for line in d_reader:
-            ReviewerLastName = line[cs.ReviewerLastName]
-            ReviewerFirstName = line[cs.ReviewerFirstName]
-            StudentLastName = line[cs.StudentLastName].strip().upper()
-            StudentFirstName = line[cs.StudentFirstName].strip().upper()
-            GivenScore = float(line[cs.GivenScore])
-            ReviewStatus = line[cs.ReviewStatus]
-
-            if ReviewStatus == 'Complete':
-                student = StudentLastName + StudentFirstName
-                reviewer = ReviewerLastName + ReviewerFirstName
-                if reviewer not in reviewer_list:
-                    reviewer_list.append(reviewer)
-
-                if student == student1.strip().upper():
-                    student1_dict[reviewer] = GivenScore
-                    student1_arr.append(GivenScore)
-                    review1_dict[reviewer] = GivenScore
-                elif student == student2.strip().upper():
-                    student2_dict[reviewer] = GivenScore
-                    student2_arr.append(GivenScore)
-                    review2_dict[reviewer] = GivenScore
-                elif student == student3.strip().upper():
-                    student3_dict[reviewer] = GivenScore
-                    student3_arr.append(GivenScore)
-                    review3_dict[reviewer] = GivenScore
-                if student not in all_scores.keys():
-                    all_scores[student] = [[reviewer, GivenScore]]
-                else:
-                    all_scores[student].append([reviewer, GivenScore])
+    if reviews is None:
+        reviews = []
+        with open('Student_Data/' + str(file), 'r', encoding="utf-8-sig") as f:
+            for line in csv.DictReader(f):
+                if line[cs.ReviewStatus] == 'Complete':
+                    reviews.append((normalize.person_key(line[cs.StudentLastName], line[cs.StudentFirstName]),
+                                    line[cs.ReviewerLastName] + line[cs.ReviewerFirstName], float(line[cs.GivenScore])))
+
+    for student, reviewer, GivenScore in reviews:
+        if reviewer not in reviewer_list:
+            reviewer_list.append(reviewer)
+
+        if student == student1.strip().upper():
+            student1_dict[reviewer] = GivenScore
+            student1_arr.append(GivenScore)
+            review1_dict[reviewer] = GivenScore
+        elif student == student2.strip().upper():
+            student2_dict[reviewer] = GivenScore
+            student2_arr.append(GivenScore)
+            review2_dict[reviewer] = GivenScore
+        elif student == student3.strip().upper():
+            student3_dict[reviewer] = GivenScore
+            student3_arr.append(GivenScore)
+            review3_dict[reviewer] = GivenScore
+        if student not in all_scores.keys():
+            all_scores[student] = [[reviewer, GivenScore]]
+        else:
+            all_scores[student].append([reviewer, GivenScore])
 
     student1_avg = stat.mean(student1_arr)
     student2_avg = stat.mean(student2_arr)
@@ -129,30 +166,16 @@ def get_reviewer_scores_normalized(file: str, year: int, verbose: bool = False,
             print('Harsh Reviewer', r, student1_z, student2_z, student3_z)
             harsh_reviewer.append(reviewer)
 
+    adjustment = (student1_std + student2_std + student3_std) / 3 / 2
     for s in all_scores:
-        n = len(all_scores[s])
-
-        for i, review in enumerate(all_scores[s]):
-            if review[0] in harsh_reviewer:
-                if s not in reviewer_output:
-                    reviewer_output[s] = review[1] + (student1_std + student2_std + student3_std) / 3 / 2
-                else:
-                    reviewer_output[s] = reviewer_output[s] + (
-                            (review[1] + (student1_std + student2_std + student3_std) / 3 / 2) - reviewer_output[s]) / n
-            elif review[0] in generous_reviewer:
-                if s not in reviewer_output:
-                    reviewer_output[s] = review[1] - (student1_std + student2_std + student3_std) / 3 / 2
-                else:
-                    reviewer_output[s] = reviewer_output[s] + (
-                            (review[1] - (student1_std + student2_std + student3_std) / 3 / 2) - reviewer_output[s]) / n
-            else:
-                if s not in reviewer_output:
-                    reviewer_output[s] = review[1]
-                else:
-                    reviewer_output[s] = reviewer_output[s] + (
-                            (review[1]) - reviewer_output[s]) / n
-
-    return reviewer_output
+        for reviewer, score in all_scores[s]:
+            if reviewer in harsh_reviewer:
+                score = score + adjustment
+            elif reviewer in generous_reviewer:
+                score = score - adjustment
+            adjusted.setdefault(s, []).append(score)
+
+    return adjusted
 
 
 def get_reviewer_scores(file: str, verbose: bool = False, DEBUG: bool = False) -> dict:
@@ -168,34 +191,74 @@ def get_reviewer_scores(file: str, verbose: bool = False, DEBUG: bool = False) -
     reviewer_avg : dict
         A dictionary of averaged reviewer scores by student
     """
-    reviewer_avg = {}
-    student_cnt = {}
-
-    with open('Student_Data/' + str(file), 'r', encoding="utf-8-sig") as f:
-        # get fieldnames from DictReader object and store in list
-        d_reader = csv.DictReader(f)
-        for line in d_reader:
-            lastName = line['StudentLastName']
-            firstName = line['StudentFirstName']
-            ReviewStatus = line[cs.ReviewStatus]
-            score = float(line['GivenScore'])
-
-            if ReviewStatus == 'Complete':
-                concat_name = lastName.strip().upper() + firstName.strip().upper()
-                if concat_name in student_cnt:
-                    student_cnt[concat_name] = student_cnt[concat_name] + 1
-                else:
-                    student_cnt[concat_name] = 1
-
-                if concat_name in reviewer_avg:
-                    reviewer_avg[concat_name] = reviewer_avg[concat_name] + (score - reviewer_avg[concat_name]) / \
-                                                student_cnt[concat_name]
-                else:
-                    reviewer_avg[concat_name] = score
+    reviewer_stats, _ = get_reviewer_score_stats(file, verbose=verbose, DEBUG=DEBUG)
+    reviewer_avg = {student: stats.mean for student, stats in reviewer_stats.items()}
 
     return reviewer_avg
 
 
+def get_reviewer_score_stats(file: str, spread_limit: float = cs.reviewer_spread_limit, verbose: bool = False,
+                             DEBUG: bool = False, reviews: list = None) -> Tuple[dict, set]:
+    """Reads the reviewer scores file once and keeps running statistics for each student: the number of reviews, the
+    mean and variance of the scores, and the lowest and highest score along with the reviewer who gave them. Students
+    whose lowest and highest score are more than spread_limit apart are flagged in the same pass.
+
+    Parameters
+    ----------
+    file : str
+        The name of the file which contains the reviewer scores
+    spread_limit : float
+        The largest difference allowed between a student's lowest and highest score before it is flagged
+    reviews : list
+        If given, each completed review is added to it as (student, reviewer, score), e.g. for
+        get_reviewer_scores_normalized so the file is only read once
+
+    Returns
+    -------
+    reviewer_stats : dict
+        A dictionary of ReviewStats by student, LastName concatenated with FirstName
+    wide_spread : set
+        The students whose reviewer scores are more than spread_limit apart
+    """
+    reviewer_stats = {}
+    wide_spread = set()
+
+    with open('Student_Data/' + str(file), 'r', encoding="utf-8-sig") as f:
+        # A plain reader with the column positions looked up once is much cheaper than a dict per row on large exports
+        reader = csv.reader(f)
+        headers = next(reader)
+        reviewer_last = headers.index(cs.ReviewerLastName)
+        reviewer_first = headers.index(cs.ReviewerFirstName)
+        student_last = headers.index(cs.StudentLastName)
+        student_first = headers.index(cs.StudentFirstName)
+        given_score = headers.index(cs.GivenScore)
+        review_status = headers.index(cs.ReviewStatus)
+
+        for line in reader:
+            if line[review_status] != 'Complete':
+                continue
+
+            student = normalize.person_key(line[student_last], line[student_first])
+            stats = reviewer_stats.get(student)
+            if stats is None:
+                stats = reviewer_stats[student] = ReviewStats.ReviewStats()
+            score, reviewer = float(line[given_score]), line[reviewer_last] + line[reviewer_first]
+            stats.add(score, reviewer)
+            if reviews is not None:
+                reviews.append((student, reviewer, score))
+
+            if stats.spread > spread_limit:
+                wide_spread.add(student)
+
+    if verbose:
+        for student in sorted(wide_spread):
+            stats = reviewer_stats[student]
+            print(f'WARNING: Wide reviewer spread for {student}: {stats.min_score} ({stats.min_reviewer}) to '
+                  f'{stats.max_score} ({stats.max_reviewer})')
+
+    return reviewer_stats, wide_spread
+
+
 def generate_histo_arrays(file: str, SAT_to_ACT_dict: dict, SAT_to_ACT_Math_dict: dict, year: int,
                           verbose: bool = False,
                           DEBUG: bool = False) -> Tuple[
@@ -221,28 +284,51 @@ def generate_histo_arrays(file: str, SAT_to_ACT_dict: dict, SAT_to_ACT_Math_dict
         A list of all applicants ACT Math scores, duplicates are not removed and does not list student
 
     """
-    # Create arrays to store the total for each ACT score type to determine percentiles
-    ACT_Overall = []
-    ACTM_Overall = []
+    # Collect the raw scores first and convert the whole column at once
+    ACT_SAT_values = []
+    ACTM_SATM_values = []
 
     with open('Student_Data/' + str(file), 'r', encoding="utf-8-sig") as f:
         # get fieldnames from DictReader object and store in list
         d_reader = csv.DictReader(f)
         for line in d_reader:
             student_type = line[cs.questions[year][0]['student_type']]
-            s = Student.Student('Dummy', 'Student')
-            s.ACT_SAT_value = util.get_num(line[cs.questions[year][0]['ACT_SAT_value']])
-            s.ACTM_SATM_value = util.get_num(line[cs.questions[year][0]['ACTM_SATM_value']])
-
             if cs.high_schooler in student_type.upper():
-                ACT_score = ACT_SAT_Conv(s, SAT_to_ACT_dict, 'C')
-                # Don't want to add the error values into our histogram and frankly only worth considering those which meet our minimum
-                if ACT_score > 21:
-                    ACT_Overall.append(ACT_score)
-                ACTM_Score = ACT_SAT_Conv(s, SAT_to_ACT_Math_dict, 'M')
-                # Don't want to add the error values into our histogram and frankly only worth considering those which meet our minimum
-                if ACTM_Score > 21:
-                    ACTM_Overall.append(ACTM_Score)
+                ACT_SAT_values.append(util.get_num(line[cs.questions[year][0]['ACT_SAT_value']]))
+                ACTM_SATM_values.append(util.get_num(line[cs.questions[year][0]['ACTM_SATM_value']]))
+
+    return histo_arrays(ACT_SAT_values, ACTM_SATM_values, SAT_to_ACT_dict, SAT_to_ACT_Math_dict)
+
+
+def histo_arrays(ACT_SAT_values: list, ACTM_SATM_values: list, SAT_to_ACT_dict: dict, SAT_to_ACT_Math_dict: dict,
+                 verbose: bool = False, DEBUG: bool = False) -> Tuple[dict, dict]:
+    """The percentile of each ACT score 0-36 among the applicants, from their raw ACT/SAT scores. See
+    generate_histo_arrays
+
+    Parameters
+    ----------
+    ACT_SAT_values : list
+        Every high school applicant's ACT or SAT score
+    ACTM_SATM_values : list
+        Every high school applicant's ACT or SAT Math score
+    SAT_to_ACT_dict : dict
+        A dict containing what ACT score is equivalent to what SAT score (Composite)
+    SAT_to_ACT_Math_dict : dict
+        A dict containing what ACT score is equivalent to what SAT score (Math)
+
+    Returns
+    -------
+    ACT_Overall_dict : dict
+        The ACT score to its percentile
+    ACTM_Overall_dict : dict
+        The ACT Math score to its percentile
+    """
+    ACT_scores, _ = concordance.convert_scores(ACT_SAT_values, concordance.from_dict(SAT_to_ACT_dict))
+    ACTM_scores, _ = concordance.convert_scores(ACTM_SATM_values, concordance.from_dict(SAT_to_ACT_Math_dict))
+
+    # Don't want to add the error values into our histogram and frankly only worth considering those which meet our minimum
+    ACT_Overall = ACT_scores[ACT_scores > cs.ACT_histogram_cutoff]
+    ACTM_Overall = ACTM_scores[ACTM_scores > cs.ACT_histogram_cutoff]
 
     # Rather than return the lists, just return the dicts, better for performance and memory
     ACT_Overall_dict = {}
@@ -279,18 +365,9 @@ def ACT_SAT_Conv(s: Student, conv_dict: dict, test_type: str, verbose: bool = Fa
     elif test_type == 'M':
         score = s.ACTM_SATM_value
 
-    # Sanity checks for min/max scores
-    if 36 < score < cs.min_SAT:
-        s.validationError = True
-        s.ACT_SAT_low = False
-        score = 0.0
-    elif cs.max_SAT < score:
-        s.validationError = True
-        s.ACT_SAT_high = False
-        score = 0.0
-    if not score.is_integer():
-        s.validationError = True
-        s.ACT_SAT_decimal = False
+    # Scores which are too low or high for the SAT or are decimals earn nothing, the ACT/SAT rules in
+    # constants.validation_rules flag them
+    if 36 < score < cs.min_SAT or cs.max_SAT < score or not score.is_integer():
         score = 0.0
 
     if score > 36:
@@ -361,14 +438,15 @@ def GPA_Calc(student: Student, verbose: bool = False, DEBUG: bool = False) -> No
         student.GPA_Value = 4.0 * student.GPA_Value / 6.0
 
     # 2.90 is worth 1 point and every 0.10 is an extra point up to 10 points
-    student.GPA_Score = student.GPA_Value - 2.9
+    student.GPA_Score = student.GPA_Value - cs.GPA_floor
     student.GPA_Score = max(student.GPA_Score, 0)
     student.GPA_Score = min(student.GPA_Score, 1)
     student.GPA_Score *= cs.GPA_Score
     student.GPA_Score = round(student.GPA_Score, 2)
 
 
-def score_coursework(s: Student, course_scores: dict, verbose: bool = False, DEBUG: bool = False) -> None:
+def score_coursework(s: Student, course_scores: dict, verbose: bool = False, DEBUG: bool = False,
+                     events: diagnostics.Diagnostics = None) -> None:
     classes = class_split(s.STEM_Classes)
     excep_list = []
     for c in classes:
@@ -379,9 +457,13 @@ def score_coursework(s: Student, course_scores: dict, verbose: bool = False, DEB
                 excep_list.append(c)
                 s.STEM_Score += 2
     if len(excep_list) > 0:
-        print(s.firstName, s.lastName, excep_list)
+        if events is not None:
+            events.emit('unknown_class', diagnostics.Level.WARNING, s, classes=excep_list)
+        elif verbose:
+            print(s.firstName, s.lastName, excep_list)
 
-    s.STEM_Score = min(cs.STEM_Score, s.STEM_Score / 3.5)
+    s.STEM_raw = s.STEM_Score
+    s.STEM_Score = min(cs.STEM_Score, s.STEM_Score / cs.STEM_divisor)
 
 
 def class_split(classes: str, verbose: bool = False, DEBUG: bool = False) -> list:
@@ -536,3 +618,19 @@ def COMMS_calc(value: float, verbose: bool = False, DEBUG: bool = False) -> int:
         COMMS_Score = 0
 
     return COMMS_Score
+
+
+def total_score(s: Student) -> float:
+    """The total of all of an applicant's scores, used to rank the applicants
+
+    Parameters
+    ----------
+    s : Student
+        A member of the Student class, already scored
+
+    Returns
+    -------
+    total : float
+        The applicant's total score
+    """
+    return s.GPA_Score + s.ACT_SAT_Score + s.ACTM_SATM_Score + s.reviewer_score + s.STEM_Score
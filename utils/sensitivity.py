@@ -0,0 +1,157 @@
+"""
+What-if analysis of the scoring constants. Re-scores an already scored cohort under many settings of the constants at
+once with NumPy, rather than re-running the program for each proposal.
+
+scenario_grid - builds every combination of the given constant values
+baseline_scenario - the constants currently in constants.py
+score_scenarios - computes every applicant's total and rank under every scenario in one batch
+sweep - compares every scenario to the baseline: rank correlation, rank changes and applicants crossing the cutoff
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import constants as cs
+
+# The constants which can be varied, each is a keyword of scenario_grid
+scenario_params = ['ACT_Score', 'ACTM_Score', 'GPA_Score', 'STEM_Score', 'reviewer_multiplier', 'GPA_floor',
+                   'ACT_histogram_cutoff']
+
+
+def baseline_scenario() -> dict:
+    """Returns the constants currently in constants.py as a scenario"""
+    return {param: getattr(cs, param) for param in scenario_params}
+
+
+def scenario_grid(**values) -> dict:
+    """Builds every combination of the given constant values, any constant not given keeps its value in constants.py
+
+    Parameters
+    ----------
+    values : list
+        For each constant to vary, e.g. GPA_Score=[10, 15], the values to try
+
+    Returns
+    -------
+    scenarios : dict
+        Constant name to a NumPy array with one value per scenario
+    """
+    unknown = set(values) - set(scenario_params)
+    if unknown:
+        raise ValueError(f'Can not vary {sorted(unknown)}, only {scenario_params}')
+
+    grid = dict(baseline_scenario(), **values)
+    options = [np.atleast_1d(grid[param]) for param in scenario_params]
+    combos = np.array(list(itertools.product(*options)), dtype=float)
+
+    return {param: combos[:, i] for i, param in enumerate(scenario_params)}
+
+
+def _percentile_multipliers(act: np.ndarray, cutoff: np.ndarray) -> np.ndarray:
+    """The ACT_SAT_Calc multiplier for each scenario (rows) and ACT score 0-36 (columns). Matches percentileofscore
+    with kind='rank' over the scores above each scenario's cutoff"""
+    one_hot = np.zeros((len(act), 37))
+    one_hot[np.arange(len(act)), act] = 1
+    counts = (act[None, :] > cutoff[:, None]).astype(float) @ one_hot
+
+    at_or_below = np.cumsum(counts, axis=1)
+    below = at_or_below - counts
+    total = at_or_below[:, -1:]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pct = (below + at_or_below + (at_or_below > below)) * 50.0 / total
+    pct = np.nan_to_num(pct)
+
+    multiplier = np.round(pct / 100, 2)
+    multiplier[:, 36] = 1  # Perfect scores always get full points
+    return multiplier
+
+
+def score_scenarios(student_list: list, scenarios: dict) -> tuple:
+    """Computes every applicant's total and rank under every scenario in one batch. The applicants must already have
+    been scored, as the converted ACT scores, 4.0 scale GPA and summed coursework points are reused. The ACT percentiles
+    are recomputed from the applicants in student_list
+
+    Parameters
+    ----------
+    student_list : list
+        A list containing all the students as the student class, already scored
+    scenarios : dict
+        The output of scenario_grid
+
+    Returns
+    -------
+    totals : np.ndarray
+        The total score of each scenario (rows) and applicant (columns)
+    ranks : np.ndarray
+        The 1 based rank of each scenario (rows) and applicant (columns), ties keep the order of student_list
+    """
+    gpa = np.array([s.GPA_Value for s in student_list], dtype=float)
+    act = np.clip(np.array([s.ACT_value for s in student_list], dtype=int), 0, 36)
+    actm = np.clip(np.array([s.ACTM_value for s in student_list], dtype=int), 0, 36)
+    stem_raw = np.array([s.STEM_raw for s in student_list], dtype=float)
+    reviewer_avg = np.array([s.reviewer_score for s in student_list], dtype=float) / cs.reviewer_multiplier
+
+    col = {param: values[:, None] for param, values in scenarios.items()}
+
+    gpa_points = np.round(np.clip(gpa[None, :] - col['GPA_floor'], 0, 1) * col['GPA_Score'], 2)
+    act_points = np.round(_percentile_multipliers(act, scenarios['ACT_histogram_cutoff'])[:, act] * col['ACT_Score'], 2)
+    actm_points = np.round(
+            _percentile_multipliers(actm, scenarios['ACT_histogram_cutoff'])[:, actm] * col['ACTM_Score'], 2)
+    stem_points = np.minimum(col['STEM_Score'], stem_raw[None, :] / cs.STEM_divisor)
+    reviewer_points = col['reviewer_multiplier'] * reviewer_avg[None, :]
+
+    totals = gpa_points + act_points + actm_points + stem_points + reviewer_points
+
+    order = np.argsort(-totals, axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    ranks[np.arange(len(totals))[:, None], order] = np.arange(1, totals.shape[1] + 1)
+
+    return totals, ranks
+
+
+def sweep(student_list: list, scenarios: dict, cutoff: int = None, verbose: bool = False,
+          DEBUG: bool = False) -> pd.DataFrame:
+    """Compares every scenario to the baseline constants
+
+    Parameters
+    ----------
+    student_list : list
+        A list containing all the students as the student class, already scored
+    scenarios : dict
+        The output of scenario_grid
+    cutoff : int
+        The number of awards, applicants ranked at or above this are above the cutoff. Defaults to the total count of
+        cs.award_tiers
+
+    Returns
+    -------
+    report : pd.DataFrame
+        One row per scenario with its constants, the Spearman rank correlation with the baseline, the largest and mean
+        rank change, and the applicants who move above or below the cutoff
+    """
+    if cutoff is None:
+        cutoff = sum(tier['count'] for tier in cs.award_tiers)
+    names = np.array([f'{s.lastName}, {s.firstName}' for s in student_list])
+    n = len(student_list)
+
+    _, base_ranks = score_scenarios(student_list, {k: np.atleast_1d(v) for k, v in baseline_scenario().items()})
+    _, ranks = score_scenarios(student_list, scenarios)
+
+    change = ranks - base_ranks
+    spearman = 1 - 6 * (change.astype(float) ** 2).sum(axis=1) / (n * (n ** 2 - 1)) if n > 1 else np.ones(len(ranks))
+    base_above = base_ranks[0] <= cutoff
+    above = ranks <= cutoff
+
+    report = pd.DataFrame(scenarios)
+    report['spearman'] = spearman
+    report['max_rank_change'] = np.abs(change).max(axis=1) if n else 0
+    report['mean_rank_change'] = np.abs(change).mean(axis=1) if n else 0.0
+    report['moved_above_cutoff'] = [' | '.join(names[row & ~base_above]) for row in above]
+    report['moved_below_cutoff'] = [' | '.join(names[~row & base_above]) for row in above]
+
+    if verbose:
+        print(f'Evaluated {len(report)} scenarios over {n} applicants')
+
+    return report
@@ -0,0 +1,226 @@
+"""
+ACT and ACT Math percentiles that can be used while applications are still coming in. histo_arrays needs the whole
+cohort, so until the season closes every score is provisional and each new applicant shifts every other score. Here
+the ACT scores seen so far are kept as counts of each score 0-36, saved in percentile_folder between runs, so a run only
+adds the applicants who are new or changed their scores. Counts from different runs or years simply add up.
+
+Until the cohort is complete the counts are blended with the earlier years' distribution, weighted by how many of the
+expected applicants have not applied yet, so the prior is replaced by the current cohort as it arrives. For each score
+the lowest and highest percentile it could still end up at is reported, assuming the remaining applicants all score
+below or all score above it.
+
+PercentileState - the converted ACT scores of each applicant so far and their counts
+load_state, save_state - a year's state, saved in percentile_folder
+prior_counts - the pooled counts of the years before
+interim_histograms - updates the year's state and returns blended percentiles in the format of histo_arrays
+percentile_ranges - the lowest and highest percentile of each score once every expected applicant has applied
+score_ranges - the range of ACT and ACT Math points each applicant could still end up with
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import constants as cs
+from classes import Ranking
+from utils import concordance
+
+percentile_folder = 'util_data/percentile_state'
+
+test_types = ('C', 'M')
+
+
+class PercentileState:
+    """The converted ACT and ACT Math score of each applicant seen so far. The counts of each score are kept alongside
+    so adding or changing one applicant is O(1)"""
+
+    def __init__(self, applicants: dict = None):
+        self.applicants = {}  # applicant key -> [ACT, ACT Math]
+        self.counts = {test_type: np.zeros(37) for test_type in test_types}
+        for key, scores in (applicants or {}).items():
+            self.add(key, *scores)
+
+    def __len__(self) -> int:
+        return len(self.applicants)
+
+    def add(self, key: str, act: int, actm: int) -> bool:
+        """Adds an applicant's scores, or replaces them if they changed. Returns if anything changed"""
+        old = self.applicants.get(key)
+        new = [int(np.clip(act, 0, 36)), int(np.clip(actm, 0, 36))]
+        if old == new:
+            return False
+        for test_type, before, after in zip(test_types, old or [None, None], new):
+            if before is not None:
+                self.counts[test_type][before] -= 1
+            self.counts[test_type][after] += 1
+        self.applicants[key] = new
+        return True
+
+    def merge(self, other: 'PercentileState') -> 'PercentileState':
+        """The state of both, other's scores are kept for applicants in both"""
+        merged = PercentileState(self.applicants)
+        for key, scores in other.applicants.items():
+            merged.add(key, *scores)
+        return merged
+
+
+def load_state(year: int, folder: str = percentile_folder) -> PercentileState:
+    """The state saved for a year, empty if there is none"""
+    try:
+        with open(os.path.join(folder, f'{year}.json'), 'r') as f:
+            return PercentileState(json.load(f)['applicants'])
+    except FileNotFoundError:
+        return PercentileState()
+
+
+def save_state(year: int, state: PercentileState, folder: str = percentile_folder) -> None:
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, f'{year}.json'), 'w') as f:
+        json.dump({'applicants': state.applicants}, f)
+
+
+def prior_counts(year: int, folder: str = percentile_folder) -> tuple:
+    """The counts of every earlier year saved in folder added together, and the number of applicants in the latest
+
+    Returns
+    -------
+    counts : dict
+        The test type to the pooled counts of each score, None if no earlier year is saved
+    latest : int
+        The number of applicants in the most recent earlier year
+    """
+    years = sorted(int(file[:4]) for file in os.listdir(folder)
+                   if file.endswith('.json') and file[:4].isdigit() and int(file[:4]) < year) \
+        if os.path.isdir(folder) else []
+    if not years:
+        return None, 0
+    states = [load_state(prior_year, folder) for prior_year in years]
+    counts = {test_type: sum(state.counts[test_type] for state in states) for test_type in test_types}
+    return counts, len(states[-1])
+
+
+def _percentiles(counts: np.ndarray) -> np.ndarray:
+    """The percentileofscore, kind='rank', of each score 0-36 among the scores above cs.ACT_histogram_cutoff"""
+    counts = np.where(np.arange(37) > cs.ACT_histogram_cutoff, counts, 0)
+    at_or_below = np.cumsum(counts)
+    below = at_or_below - counts
+    if at_or_below[-1] <= 0:
+        return np.zeros(37)
+    return (below + at_or_below + (counts > 0)) * 50.0 / at_or_below[-1]
+
+
+def _blend(counts: np.ndarray, prior: np.ndarray, seen: int, expected: int) -> np.ndarray:
+    """The counts plus the prior scaled to the applicants still expected"""
+    if prior is None or prior.sum() == 0:
+        return counts
+    remaining = max(expected - seen, 0)
+    return counts + prior * remaining / prior.sum()
+
+
+def _expected(state: PercentileState, latest: int, expected: int) -> int:
+    if expected is None:
+        expected = cs.percentile_expected_applicants or latest
+    return max(expected, len(state))
+
+
+def interim_histograms(year: int, students: list, SAT_to_ACT_dict: dict, SAT_to_ACT_Math_dict: dict,
+                       expected: int = None, folder: str = percentile_folder, verbose: bool = False,
+                       DEBUG: bool = False) -> tuple:
+    """Adds the applicants to the year's saved state and returns the percentiles of each score blended with the
+    earlier years, in the format histo_arrays returns so ACT_SAT_Calc can use them as they are
+
+    Parameters
+    ----------
+    year : int
+        The year of the applications
+    students : list
+        The high school applicants so far, as the student class
+    SAT_to_ACT_dict : dict
+        A dict containing what ACT score is equivalent to what SAT score (Composite)
+    SAT_to_ACT_Math_dict : dict
+        A dict containing what ACT score is equivalent to what SAT score (Math)
+    expected : int
+        How many applicants are expected this year, defaults to cs.percentile_expected_applicants, or to last year's
+
+    Returns
+    -------
+    ACT_Overall_dict : dict
+        The ACT score to its percentile
+    ACTM_Overall_dict : dict
+        The ACT Math score to its percentile
+    """
+    state = load_state(year, folder)
+    act, _ = concordance.convert_scores([s.ACT_SAT_value for s in students], concordance.from_dict(SAT_to_ACT_dict))
+    actm, _ = concordance.convert_scores([s.ACTM_SATM_value for s in students],
+                                         concordance.from_dict(SAT_to_ACT_Math_dict))
+    changed = sum(state.add(Ranking.Ranking.student_key(s), a, m) for s, a, m in zip(students, act, actm))
+    if changed:
+        save_state(year, state, folder)
+
+    prior, latest = prior_counts(year, folder)
+    expected = _expected(state, latest, expected)
+    histograms = []
+    for test_type in test_types:
+        blended = _blend(state.counts[test_type], None if prior is None else prior[test_type], len(state), expected)
+        histograms.append(dict(enumerate(_percentiles(blended).tolist())))
+
+    if verbose:
+        print(f'Percentiles from {len(state)} of {expected} expected applicants, {changed} new or changed')
+    return histograms[0], histograms[1]
+
+
+def percentile_ranges(state: PercentileState, expected: int, test_type: str) -> tuple:
+    """The lowest and highest percentile of each score once the expected applicants have all applied, the remaining
+    applicants all scoring at the top or all scoring just above the cutoff
+
+    Returns
+    -------
+    low : np.ndarray
+        The lowest percentile of each score 0-36
+    high : np.ndarray
+        The highest percentile of each score 0-36
+    """
+    counts = state.counts[test_type]
+    remaining = max(expected - len(state), 0)
+    top, bottom = counts.copy(), counts.copy()
+    top[36] += remaining
+    bottom[cs.ACT_histogram_cutoff + 1] += remaining
+    scenarios = np.stack([_percentiles(counts), _percentiles(top), _percentiles(bottom)])
+    return scenarios.min(axis=0), scenarios.max(axis=0)
+
+
+def score_ranges(year: int, student_list: list, expected: int = None, folder: str = percentile_folder) -> pd.DataFrame:
+    """The ACT and ACT Math points each scored applicant has now and the range they could still end up in
+
+    Parameters
+    ----------
+    year : int
+        The year of the applications, its state must have been saved by interim_histograms
+    student_list : list
+        A list containing all the students as the student class, already scored
+    expected : int
+        How many applicants are expected this year, defaults to cs.percentile_expected_applicants, or to last year's
+
+    Returns
+    -------
+    ranges : pd.DataFrame
+        One row per applicant with their current, lowest and highest ACT and ACT Math points
+    """
+    state = load_state(year, folder)
+    expected = _expected(state, prior_counts(year, folder)[1], expected)
+    ranges = {'Applicant': [f'{s.lastName}, {s.firstName}' for s in student_list]}
+    for test_type, value, score, points in (('C', 'ACT_value', 'ACT_SAT_Score', cs.ACT_Score),
+                                            ('M', 'ACTM_value', 'ACTM_SATM_Score', cs.ACTM_Score)):
+        low, high = percentile_ranges(state, expected, test_type)
+        values = np.array([int(getattr(s, value)) for s in student_list], dtype=int)
+        valid = (values >= 0) & (values < 36)  # Perfect scores always get full points, errors stay negative
+        current = np.array([getattr(s, score) for s in student_list], dtype=float)
+        ranges[score] = current
+        ranges[f'{score}_low'] = np.where(valid, np.round(np.round(low[np.clip(values, 0, 36)] / 100, 2) * points, 2),
+                                          current)
+        ranges[f'{score}_high'] = np.where(valid,
+                                           np.round(np.round(high[np.clip(values, 0, 36)] / 100, 2) * points, 2),
+                                           current)
+    return pd.DataFrame(ranges)
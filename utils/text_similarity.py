@@ -0,0 +1,228 @@
+"""
+Finds written answers which are nearly the same as another applicant's, this year or in a past year, e.g. a copied or
+templated essay. Each answer is cut into overlapping word phrases (shingles) and summarized by its MinHash signature,
+the smallest hash of its shingles under each of cs.similarity_hashes hash functions. Two answers share about as many
+signature values as they share shingles. Signatures are split into bands and only answers with an identical band are
+compared, so finding the pairs takes about linear time rather than comparing every pair. Each year's signatures are
+saved in util_data/essay_signatures so later years are checked against them without reading the old answers again.
+
+shingles - the hashed word phrases of an answer
+signatures - the MinHash signature of each answer
+similar_pairs - the pairs of signatures sharing a band whose estimated similarity passes the threshold
+check_answers - flags the Students with a written answer nearly the same as another applicant's
+save_signatures, load_signatures - the signatures of a year's answers, saved in signature_folder
+"""
+
+import os
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import constants as cs
+
+signature_folder = 'util_data/essay_signatures'
+
+# The hash functions are (a * x + b) mod _prime, the coefficients are fixed so signatures from any year can be compared
+_prime = (1 << 31) - 1
+_seed = 20240101
+
+
+def _coefficients(n: int) -> np.ndarray:
+    rng = np.random.default_rng(_seed)
+    return rng.integers(1, _prime, size=(2, n), dtype=np.uint64)
+
+
+def shingles(text: str, k: int = cs.similarity_shingle) -> np.ndarray:
+    """The crc32 of each k word phrase of the text, ignoring case and punctuation
+
+    Parameters
+    ----------
+    text : str
+        The answer
+    k : int
+        The number of words in a phrase
+
+    Returns
+    -------
+    hashes : np.ndarray
+        The distinct phrase hashes, empty when the text has fewer than k words
+    """
+    words = re.findall('[a-z0-9]+', text.lower())
+    phrases = {' '.join(words[i:i + k]) for i in range(len(words) - k + 1)}
+    return np.fromiter((zlib.crc32(phrase.encode()) for phrase in phrases), dtype=np.uint64, count=len(phrases))
+
+
+def signatures(texts: list, n: int = cs.similarity_hashes) -> np.ndarray:
+    """The MinHash signature of each text
+
+    Parameters
+    ----------
+    texts : list
+        The answers
+    n : int
+        The number of hash functions
+
+    Returns
+    -------
+    signatures : np.ndarray
+        One row of n uint32 values per text
+    """
+    a, b = _coefficients(n)
+    result = np.full((len(texts), n), _prime, dtype=np.uint32)
+    for i, text in enumerate(texts):
+        x = shingles(text) % _prime
+        if len(x):
+            result[i] = ((a[:, None] * x[None, :] + b[:, None]) % _prime).min(axis=1)
+    return result
+
+
+def similar_pairs(signature: np.ndarray, bands: int = cs.similarity_bands,
+                  threshold: float = cs.similarity_threshold, new: np.ndarray = None) -> list:
+    """The pairs of rows which share a whole band of their signatures and agree on at least threshold of the values
+
+    Parameters
+    ----------
+    signature : np.ndarray
+        The output of signatures
+    bands : int
+        How many bands each signature is split into, it must divide the signature length
+    threshold : float
+        The least share of equal signature values, the estimated share of common phrases
+    new : np.ndarray
+        A boolean per row, only pairs with at least one new row are returned. All rows are new by default
+
+    Returns
+    -------
+    pairs : list
+        (i, j, similarity) for each pair, i < j
+    """
+    if signature.shape[1] % bands:
+        raise ValueError(f'{bands} bands do not divide signatures of {signature.shape[1]} values')
+    if new is None:
+        new = np.ones(len(signature), dtype=bool)
+
+    rows = signature.shape[1] // bands
+    candidates = set()
+    for band in range(bands):
+        buckets = {}
+        for i, key in enumerate(map(bytes, signature[:, band * rows:(band + 1) * rows])):
+            buckets.setdefault(key, []).append(i)
+        for bucket in buckets.values():
+            if len(bucket) < 2:
+                continue
+            for x, i in enumerate(bucket):
+                for j in bucket[x + 1:]:
+                    if new[i] or new[j]:
+                        candidates.add((i, j))
+
+    pairs = []
+    for i, j in sorted(candidates):
+        similarity = float(np.mean(signature[i] == signature[j]))
+        if similarity >= threshold:
+            pairs.append((i, j, similarity))
+    return pairs
+
+
+def _answers(student_list: list) -> list:
+    """(Student, question, answer) for each long enough answer to one of cs.similarity_questions"""
+    answers = []
+    for s in student_list:
+        for header, text in s.answers.items():
+            question = next((q for q in cs.similarity_questions if header and header.strip().startswith(q)), None)
+            if question is not None and text and len(text.split()) >= cs.similarity_min_words:
+                answers.append((s, question, text))
+    return answers
+
+
+def save_signatures(year: int, names: list, questions: list, signature: np.ndarray,
+                    folder: str = signature_folder) -> None:
+    """Saves a year's signatures with the applicant and question of each row"""
+    os.makedirs(folder, exist_ok=True)
+    np.savez(os.path.join(folder, f'{year}.npz'), names=np.array(names, dtype=str),
+             questions=np.array(questions, dtype=str), signatures=signature,
+             coefficients=_coefficients(signature.shape[1]))
+
+
+def load_signatures(year: int, folder: str = signature_folder):
+    """The names, questions and signatures saved for a year, or None if there are none made with the current hash
+    functions"""
+    try:
+        saved = np.load(os.path.join(folder, f'{year}.npz'))
+    except FileNotFoundError:
+        return None
+    if saved['signatures'].shape[1] != cs.similarity_hashes or \
+            not np.array_equal(saved['coefficients'], _coefficients(cs.similarity_hashes)):
+        return None
+    return saved['names'].tolist(), saved['questions'].tolist(), saved['signatures']
+
+
+def check_answers(student_list: list, year: int, folder: str = signature_folder, save: bool = True,
+                  verbose: bool = False, DEBUG: bool = False) -> pd.DataFrame:
+    """Flags every Student with an answer nearly the same as another applicant's this year or in an earlier year saved
+    in folder, and saves this year's signatures. An applicant reusing their own answer from an earlier year is not
+    flagged
+
+    Parameters
+    ----------
+    student_list : list
+        A list containing all the students as the student class, with their answers
+    year : int
+        The year of the applications, years before it saved in folder are checked too
+    folder : str
+        Where each year's signatures are saved
+    save : bool
+        If this year's signatures are saved for later years
+
+    Returns
+    -------
+    pairs : pd.DataFrame
+        One row per similar pair of answers, with the applicant, question, the other applicant, their year and
+        question, and the estimated share of common phrases
+    """
+    answers = _answers(student_list)
+    current = signatures([text for _, _, text in answers])
+    names = [s.lastName + s.firstName for s, _, _ in answers]
+    questions = [question for _, question, _ in answers]
+    years = [year] * len(answers)
+
+    # The earlier years go below this year's rows, only pairs with at least one of this year's answers are kept
+    stacked = [current]
+    saved_years = [int(file[:4]) for file in os.listdir(folder) if re.fullmatch(r'\d{4}\.npz', file)] \
+        if os.path.isdir(folder) else []
+    for past_year in sorted(y for y in saved_years if y < year):
+        saved = load_signatures(past_year, folder)
+        if saved is None:
+            continue
+        names += saved[0]
+        questions += saved[1]
+        years += [past_year] * len(saved[0])
+        stacked.append(saved[2])
+    signature = np.concatenate(stacked) if len(stacked) > 1 else current
+    new = np.arange(len(signature)) < len(answers)
+
+    rows = []
+    for i, j, similarity in similar_pairs(signature, new=new):
+        if names[i] == names[j]:
+            continue  # The same applicant repeating themselves, this year or reusing an answer from an earlier year
+        s = answers[i][0]
+        s.unique_essay = False
+        s.validationError = True
+        s.similar_answers.append((questions[i], names[j], years[j], questions[j], similarity))
+        if new[j]:
+            other = answers[j][0]
+            other.unique_essay = False
+            other.validationError = True
+            other.similar_answers.append((questions[j], names[i], years[i], questions[i], similarity))
+        rows.append({'Applicant': names[i], 'Question': questions[i], 'Other Applicant': names[j],
+                     'Other Year': years[j], 'Other Question': questions[j], 'Similarity': round(similarity, 3)})
+
+    if save:
+        save_signatures(year, names[:len(answers)], questions[:len(answers)], current, folder)
+
+    if verbose:
+        print(f'Compared {len(answers)} written answers against {len(signature) - len(answers)} from earlier years, '
+              f'{len(rows)} similar pairs')
+    return pd.DataFrame(rows, columns=['Applicant', 'Question', 'Other Applicant', 'Other Year', 'Other Question',
+                                       'Similarity'])
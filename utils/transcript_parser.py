@@ -0,0 +1,226 @@
+"""
+Reads the coursework off applicants' uploaded transcripts so it can be scored and checked against the STEM classes
+they listed. The transcripts are expected to be saved as Transcripts/<year>/<LastName, FirstName>/<anything>.pdf. The
+text of each PDF is extracted in a process pool, and the courses parsed from it are cached by the PDF's hash in
+Student_Data/cache/transcripts, so an unchanged upload is only ever parsed once.
+
+extract_text - the text of a transcript PDF
+parse_courses - the course names and grades in a transcript's text
+parse_transcript_file - the courses of one transcript, the applicant is taken from the folder name
+parse_transcripts - the courses of every transcript in a folder, parsing only the new or changed ones in parallel
+score_transcripts - the coursework points of each applicant's transcript, scored like the STEM classes they listed
+cross_check - compares the STEM classes each applicant listed with their transcript
+"""
+
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from classes import Student
+from utils import diagnostics, scoring_util as sutil, util
+
+try:
+    import pdftotext
+except ImportError:
+    # Only needed to read transcripts, https://pypi.org/project/pdftotext/
+    pdftotext = None
+
+# What reading one unreadable upload raises, e.g. a corrupt or password protected PDF
+read_errors = (OSError, pdftotext.Error) if pdftotext is not None else (OSError,)
+
+cache_folder = 'Student_Data/cache/transcripts'
+
+# A course is a course name, words split by single spaces, followed after at least two spaces or a tab by a letter
+# grade. Course codes before the name, and the credits, years, ... between the name and the grade are ignored, but a
+# word starting with a letter there is the next course, so a course without a grade never takes the next one's. A line
+# can hold several, e.g. two column transcripts
+course_pattern = re.compile(r'(?<!\S)(?:[A-Z]{0,4}\d{3,}[A-Z]?\s+)?'
+                            r'(?P<course>[A-Za-z][A-Za-z0-9&/().,\'\-]*(?: [A-Za-z0-9&/().,\'\-]+)*)(?<=[A-Za-z0-9)])'
+                            r'(?:\s{2,}|\t)(?:[^\sA-Za-z]\S*\s+)*?(?P<grade>[A-DF][+-]?|P)(?=\s|$)')
+
+
+def extract_text(path: str) -> str:
+    """The text of a PDF, page after page, with the layout kept so each course stays on its own line"""
+    if pdftotext is None:
+        raise ImportError('Reading transcripts needs the pdftotext package, pip install pdftotext')
+    with open(path, 'rb') as f:
+        return '\n'.join(pdftotext.PDF(f, physical=True))
+
+
+def parse_courses(text: str) -> list:
+    """The course names and grades in a transcript's text
+
+    Parameters
+    ----------
+    text : str
+        The text of the transcript
+
+    Returns
+    -------
+    courses : list
+        A [course, grade] pair for each course, in the order they appear, left to right along each line
+    """
+    courses = []
+    for line in text.splitlines():
+        for match in course_pattern.finditer(line):
+            courses.append([' '.join(match['course'].split()), match['grade']])
+    return courses
+
+
+def parse_transcript_file(path: str, verbose: bool = False, DEBUG: bool = False) -> list:
+    """The courses of one transcript PDF, see parse_courses"""
+    return parse_courses(extract_text(path))
+
+
+def _try_parse_transcript_file(path: str) -> tuple:
+    # One unreadable upload should not stop the others being parsed, its error is returned instead of the courses
+    try:
+        return parse_transcript_file(path), None
+    except read_errors as e:
+        return None, repr(e)
+
+
+def find_transcripts(folder: str) -> list:
+    """Returns all transcript PDFs in a folder, sorted so the output order does not depend on the file system"""
+    pdfs = []
+    for root, _, files in os.walk(folder):
+        for file in files:
+            if file.lower().endswith('.pdf'):
+                pdfs.append(os.path.join(root, file))
+    return sorted(pdfs)
+
+
+def parse_transcripts(folder: str, workers: int = None, verbose: bool = False, DEBUG: bool = False,
+                      events: diagnostics.Diagnostics = None) -> pd.DataFrame:
+    """Parses every transcript in a folder. Transcripts already parsed, by the hash of the PDF, are read from the cache
+    and the rest are parsed in parallel and added to it. Transcripts which can not be read, e.g. corrupt or password
+    protected PDFs, are left out and reported rather than stopping the others, and are tried again next time
+
+    Parameters
+    ----------
+    folder : str
+        The folder with one sub folder per applicant, e.g. 'Transcripts/2024'
+    workers : int
+        The number of processes to parse with, defaults to the number of CPUs. 1 parses in this process
+    events : Diagnostics
+        Collects an unreadable_transcript event for each transcript which could not be read
+
+    Returns
+    -------
+    transcripts_df : pd.DataFrame
+        One row per course with the Applicant, File, Course and Grade columns
+    """
+    pdfs = find_transcripts(folder)
+    hashes = [util.file_hash(pdf) for pdf in pdfs]
+    cached = {}
+    for pdf_hash in set(hashes):
+        try:
+            with open(os.path.join(cache_folder, pdf_hash[:32] + '.json'), 'r') as f:
+                cached[pdf_hash] = json.load(f)
+        except (FileNotFoundError, ValueError):
+            pass
+
+    # Identical uploads are parsed once
+    todo = {pdf_hash: pdf for pdf, pdf_hash in zip(pdfs, hashes) if pdf_hash not in cached}
+    if workers == 1 or len(todo) < 2:
+        parsed = [_try_parse_transcript_file(pdf) for pdf in todo.values()]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(_try_parse_transcript_file, todo.values(),
+                                       chunksize=max(1, len(todo) // 64)))
+
+    os.makedirs(cache_folder, exist_ok=True)
+    failed = {}
+    for pdf_hash, (courses, error) in zip(todo, parsed):
+        if error is not None:
+            failed[pdf_hash] = error
+            continue
+        cached[pdf_hash] = courses
+        with open(os.path.join(cache_folder, pdf_hash[:32] + '.json'), 'w') as f:
+            json.dump(courses, f)
+
+    records = []
+    for pdf, pdf_hash in zip(pdfs, hashes):
+        applicant = os.path.basename(os.path.dirname(pdf))
+        if pdf_hash in failed:
+            if verbose:
+                print(f'WARNING: Could not read the transcript {pdf}, {failed[pdf_hash]}')
+            if events is not None:
+                events.emit('unreadable_transcript', diagnostics.Level.ERROR, applicant=applicant, file=pdf,
+                            error=failed[pdf_hash])
+            continue
+        records.extend((applicant, os.path.basename(pdf), course, grade) for course, grade in cached[pdf_hash])
+    transcripts_df = pd.DataFrame.from_records(records, columns=['Applicant', 'File', 'Course', 'Grade'])
+
+    if verbose:
+        print(f'Read {len(pdfs)} transcripts, parsed {len(todo) - len(failed)} new ones, could not read '
+              f'{len(failed)}, found {len(transcripts_df)} courses')
+    return transcripts_df
+
+
+def _stem_courses(classes: str, course_scores: dict) -> list:
+    """The courses of a comma separated list, cleaned by class_split, which are in the course scores"""
+    return [c.strip() for c in sutil.class_split(classes) if c.strip().upper() in course_scores]
+
+
+def score_transcripts(transcripts_df: pd.DataFrame, course_scores: dict) -> pd.DataFrame:
+    """Scores each applicant's transcript courses with score_coursework. Only the courses found in the course scores
+    are scored, the rest of a transcript (English, PE, ...) would otherwise each get the points of an unknown class
+
+    Parameters
+    ----------
+    transcripts_df : pd.DataFrame
+        The output of parse_transcripts
+    course_scores : dict
+        The upper case course name to its score, see util.conversion_dict
+
+    Returns
+    -------
+    scores_df : pd.DataFrame
+        One row per applicant with the STEM courses found on their transcript and the points they score
+    """
+    rows = []
+    for applicant, courses in transcripts_df.groupby('Applicant', sort=True)['Course']:
+        s = Student.Student('', applicant)
+        s.STEM_Classes = ', '.join(_stem_courses(', '.join(courses), course_scores))
+        sutil.score_coursework(s, course_scores)
+        rows.append({'Applicant': applicant, 'Transcript_courses': s.STEM_Classes, 'Transcript_STEM': s.STEM_Score})
+    return pd.DataFrame(rows, columns=['Applicant', 'Transcript_courses', 'Transcript_STEM'])
+
+
+def cross_check(student_list: list, transcripts_df: pd.DataFrame, course_scores: dict) -> pd.DataFrame:
+    """Compares the STEM classes each applicant listed with the ones on their transcript
+
+    Parameters
+    ----------
+    student_list : list
+        A list containing all the students as the student class, already scored
+    transcripts_df : pd.DataFrame
+        The output of parse_transcripts, applicants are named 'LastName, FirstName'
+    course_scores : dict
+        The upper case course name to its score, see util.conversion_dict
+
+    Returns
+    -------
+    check_df : pd.DataFrame
+        One row per applicant with a transcript, with the listed classes not found on the transcript, the transcript
+        classes not listed, and the coursework points of both
+    """
+    scores_df = score_transcripts(transcripts_df, course_scores).set_index('Applicant')
+    rows = []
+    for s in student_list:
+        applicant = f'{s.lastName}, {s.firstName}'
+        if applicant not in scores_df.index:
+            continue
+        listed = {c.upper() for c in _stem_courses(s.STEM_Classes, course_scores)}
+        transcript = {c.strip().upper() for c in scores_df.at[applicant, 'Transcript_courses'].split(',') if c.strip()}
+        rows.append({'Applicant'               : applicant,
+                     'Listed_not_on_transcript': ', '.join(sorted(listed - transcript)),
+                     'Transcript_not_listed'   : ', '.join(sorted(transcript - listed)),
+                     'Listed_STEM'             : s.STEM_Score,
+                     'Transcript_STEM'         : scores_df.at[applicant, 'Transcript_STEM']})
+    return pd.DataFrame(rows, columns=['Applicant', 'Listed_not_on_transcript', 'Transcript_not_listed', 'Listed_STEM',
+                                       'Transcript_STEM'])
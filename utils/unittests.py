@@ -1,3 +1,6 @@
+from utils import reviewer_assignment, scorecard_parser, transcript_parser
+
+
 def unit_tests(student_list: list, CALL_APIS: bool = False):
     for s in student_list:
 
@@ -31,3 +34,60 @@ def unit_tests(student_list: list, CALL_APIS: bool = False):
                 assert (s.GPA_C_Warn is False), "C GPAWarn failed"
             elif s.firstName == 'InvalidMajor':
                 assert (s.C_Major_Warn is False), "C InvalidMajor failed"
+
+
+def reviewer_assignment_tests():
+    # Rosters too large to link through the reviews, the first has more reviewers than reviews. Planning has to stop
+    # and raise rather than swap reviews forever
+    for n_reviewers, n_applicants in [(12, 3), (40, 20), (10, 4), (12, 5)]:
+        reviewers = [f'Reviewer {i}' for i in range(n_reviewers)]
+        applicants = [f'Applicant {i}' for i in range(n_applicants)]
+        try:
+            reviewer_assignment.plan_assignments(reviewers, applicants, 3, None)
+        except ValueError:
+            continue
+        assert False, f"Reviewer roster of {n_reviewers} for {n_applicants} applicants failed"
+
+    # Rosters which can be planned, with a few conflicts. Each applicant gets enough different reviewers without a
+    # conflict, no reviewer goes over max_load and every reviewer is linked through the applicants they share
+    for n_reviewers, n_applicants in [(300, 3000), (500, 5000)]:
+        reviewers = [f'Reviewer {i}' for i in range(n_reviewers)]
+        applicants = [f'Applicant {i}' for i in range(n_applicants)]
+        conflicts = {(reviewers[i % n_reviewers], applicants[(7 * i) % n_applicants]) for i in range(n_reviewers)}
+        max_load = -(-n_applicants * 3 // n_reviewers) + 1
+        plan = reviewer_assignment.plan_assignments(reviewers, applicants, 3, max_load, conflicts)
+        assert sorted(plan) == sorted(applicants), f"Reviewer plan {n_reviewers}x{n_applicants} applicants failed"
+        load = {}
+        for a, assigned in plan.items():
+            assert len(set(assigned)) == 3, f"Reviewer plan {n_reviewers}x{n_applicants} reviewers per applicant failed"
+            assert not any((r, a) in conflicts for r in assigned), \
+                f"Reviewer plan {n_reviewers}x{n_applicants} conflicts failed"
+            for r in assigned:
+                load[r] = load.get(r, 0) + 1
+        assert max(load.values()) <= max_load, f"Reviewer plan {n_reviewers}x{n_applicants} max_load failed"
+        assert len(reviewer_assignment.overlap_components(plan)) == 1, \
+            f"Reviewer plan {n_reviewers}x{n_applicants} overlap groups failed"
+
+
+def scorecard_parser_tests():
+    # Saved scorecard pages, one with every score and one with a score missing and no notes
+    feedback = scorecard_parser.parse_scorecards('Student_Data/Validation_Scorecards', workers=1)
+    assert len(feedback) == 2, "Scorecards not all parsed"
+    full = feedback[feedback['Applicant'] == 'Pass HSValidation']
+    assert len(full) == 1, "Scorecard applicant name failed"
+    assert full['Reviewer'].values[0] == 'Reviewer, Valid', "Scorecard reviewer failed"
+    assert [full[c].values[0] for c in scorecard_parser.scorecard_criteria] == [8, 17, 3], "Scorecard scores failed"
+    assert full['Notes'].values[0] == 'Strong essay, ask about the internship', "Scorecard notes failed"
+    partial = feedback[feedback['Applicant'] == 'NoScores HSValidation']
+    assert [partial[c].values[0] for c in scorecard_parser.scorecard_criteria] == [5, 0, 0], \
+        "Scorecard missing scores failed"
+    assert partial['Notes'].values[0] == '', "Scorecard empty notes failed"
+
+
+def transcript_parser_tests():
+    # The text of a two column transcript, with course codes, credits, a year, a tab separated line and a course with
+    # no grade yet whose gap must not reach the next course's grade
+    with open('Student_Data/Validation_Transcript.txt', 'r', encoding='utf-8') as f:
+        courses = transcript_parser.parse_courses(f.read())
+    assert courses == [['Algebra II', 'A-'], ['AP Chemistry', 'B+'], ['AP Physics C', 'A'], ['Biology (Honors)', 'B'],
+                       ['Physical Education', 'P'], ['AP Calculus BC', 'A']], "Transcript courses failed"
@@ -5,9 +5,14 @@ get_num - returns first number in a string
 conversion_dict - implementation of VLOOKUP for python
 name_compare_list - Implements name matching on a string and a list
 name_compare - Implements name matching on two strings
+file_hash - returns the sha256 of a file's contents
+get_review_feedback_rows - returns the reviewer feedback with one row per scorecard, cached after the first read
+get_review_feedback - returns the reviewer feedback averaged by applicant, cached after the first read
 """
 
 import csv
+import hashlib
+import os
 from datetime import datetime, timedelta
 from typing import Tuple
 
@@ -17,7 +22,13 @@ from fuzzywuzzy import fuzz
 from fuzzywuzzy import process
 
 from classes import Student
-from utils import keys as keys
+from utils import api_transport
+
+try:
+    from utils import keys as keys
+except ImportError:
+    # keys.py is not committed, without it only replayed API calls can be made
+    keys = None
 
 
 # Too much of the data is dirty often times, this function gets the first number in a string, and returns it
@@ -86,7 +97,7 @@ def conversion_dict(file_name: str, type: str) -> dict:
     return conv_doc
 
 
-def name_compare_list(name: str, list_of_names: list, minScore: int = 85) -> Tuple[bool, str, int]:
+def name_compare_list(name: str, list_of_names: list, minScore: int = 85, cache=None) -> Tuple[bool, str, int]:
     """Checks for exact match of a string and list, and if not does a fuzzy name match, if no name found it
     returns 'No Close Matching Name'. This is implemented using the fuzzywuzzy package, see link below for details
     https://www.datacamp.com/community/tutorials/fuzzy-string-python
@@ -97,6 +108,8 @@ def name_compare_list(name: str, list_of_names: list, minScore: int = 85) -> Tup
         The name trying to find if exists in list
     list_of_names : str
         A list of known good names
+    cache : MatchCache
+        A match_cache.MatchCache for list_of_names, repeat names are then looked up rather than fuzzy matched
 
     Returns
     -------
@@ -112,12 +125,21 @@ def name_compare_list(name: str, list_of_names: list, minScore: int = 85) -> Tup
     if name in list_of_names:
         return True, name, 100
 
+    if cache is not None:
+        result = cache.get(name, minScore)
+        if result is not None:
+            return result
+
     # If not, then run fuzzy name extract
     cleaned_name = process.extractOne(name, list_of_names)
     if cleaned_name[1] < minScore:
-        return False, 'No Close Matching Name', cleaned_name[1]
+        result = False, 'No Close Matching Name', cleaned_name[1]
+    else:
+        result = True, cleaned_name[0], cleaned_name[1]
 
-    return True, cleaned_name[0], cleaned_name[1]
+    if cache is not None:
+        cache.put(name, minScore, result)
+    return result
 
 
 def name_compare(name1: str, name2: str) -> Tuple[bool, int]:
@@ -160,11 +182,12 @@ def next_weekday(d, weekday):
     return new_date
 
 
-def distance_between(s: Student, verbose: bool = False) -> None:
+def distance_between(s: Student, verbose: bool = False, transport: api_transport.ApiTransport = None) -> None:
     # Documentation: https://googlemaps.github.io/google-maps-services-python/docs/index.html
     # Source Code and Examples: https://github.com/googlemaps/google-maps-services-python
-
-    gmaps = googlemaps.Client(key=keys.google_api_key)
+    if transport is None:
+        transport = api_transport.ApiTransport()
+    gmaps = []
 
     # Students probably have to arrive by 7. This forces us to have all students arriving the next Monday
     arrive_time = next_weekday(datetime.now().date(), 0)
@@ -173,15 +196,29 @@ def distance_between(s: Student, verbose: bool = False) -> None:
     else:
         home_address = s.cleaned_address1 + ", " + s.cleaned_city + ", " + s.cleaned_state + ", " + s.cleaned_zip_code
 
+    def directions(mode):
+        def send():
+            # Only connect when actually calling Google, a replayed call needs no key
+            if not gmaps:
+                if keys is None:
+                    raise api_transport.ApiError('utils/keys.py is needed to call Google Maps')
+                gmaps.append(googlemaps.Client(key=keys.google_api_key))
+            return gmaps[0].directions(home_address,
+                                       s.high_school_full,
+                                       mode=mode,
+                                       arrival_time=arrive_time,
+                                       # traffic_model='best_guess',
+                                       region="us")
+
+        # The arrival is always the next Monday at 7, leave the date out so recorded responses can be replayed later
+        request = {'origin': home_address, 'destination': s.high_school_full, 'mode': mode, 'arrival': 'Monday 7:00'}
+        return transport.call('google_directions', request, send,
+                              retry_on=(googlemaps.exceptions.Timeout, googlemaps.exceptions.TransportError))
+
     # TODO: Get the real school address instead of just the school name
     if s.high_school_full != 'Homeschooled':
         try:
-            directions_result = gmaps.directions(home_address,
-                                                 s.high_school_full,
-                                                 mode="driving",  # mode="transit"
-                                                 arrival_time=arrive_time,
-                                                 # traffic_model='best_guess',
-                                                 region="us")
+            directions_result = directions("driving")
 
             s.home_to_school_dist = float(directions_result[0]['legs'][0]['distance']['text'].split()[0])
             # TODO: Duration outputs like 1 hour 9 mins, make this like 1:09
@@ -200,12 +237,7 @@ def distance_between(s: Student, verbose: bool = False) -> None:
             print(e)
 
         try:
-            directions_result = gmaps.directions(home_address,
-                                                 s.high_school_full,
-                                                 mode="transit",
-                                                 arrival_time=arrive_time,
-                                                 # traffic_model='best_guess',
-                                                 region="us")
+            directions_result = directions("transit")
             s.home_to_school_time_pt = directions_result[0]['legs'][0]['duration']['text']
         except Exception as e:
             print('Error getting Transit Directions for')
@@ -230,8 +262,95 @@ def distance_between(s: Student, verbose: bool = False) -> None:
             print('School Address', s.high_school_full)
 
 
-def get_review_feedback(file_name):
+def file_hash(path: str) -> str:
+    """Returns the sha256 of a file's contents, used to key caches so they are rebuilt when the file changes
+
+    Parameters
+    ----------
+    path : str
+        The path to the file
+
+    Returns
+    -------
+    digest : str
+        The hex digest of the file's contents
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _feedback_cache_name(file_name: str) -> str:
+    return f'Student_Data/cache/{os.path.splitext(file_name)[0]}.{file_hash(f"Student_Data/{file_name}")[:16]}'
+
+
+# The reviewer feedback columns which are text, the rest are scores
+feedback_text_columns = ['Reviewer', 'Applicant', 'Notes']
+
+
+def _cache_feedback_rows(reviewer_df: pd.DataFrame, cache_name: str) -> None:
+    # The cached rows have to aggregate exactly like the workbook's, so the score columns keep their types and only
+    # the values of the text columns are made strings, blanks stay missing. A score column with text in it is not cached
+    mixed = [col for col in reviewer_df.columns
+             if col not in feedback_text_columns and reviewer_df[col].dtype == object]
+    if mixed:
+        raise ValueError(f'the score columns {mixed} are not all numbers')
+    os.makedirs(os.path.dirname(cache_name), exist_ok=True)
+    text_cols = {col: reviewer_df[col].where(reviewer_df[col].isna(), reviewer_df[col].astype(str))
+                 for col in feedback_text_columns if col in reviewer_df}
+    reviewer_df.assign(**text_cols).to_parquet(f'{cache_name}.parquet', index=False)
+
+
+def get_review_feedback_rows(file_name: str, verbose: bool = False) -> pd.DataFrame:
+    """Returns the reviewer feedback with one row per scorecard, read from the parquet copy in Student_Data/cache when
+    the workbook has not changed
+
+    Parameters
+    ----------
+    file_name : str
+        The reviewer feedback workbook in the Student_Data folder
+
+    Returns
+    -------
+    reviewer_df : pd.DataFrame
+        The Reviewer, Applicant, a column per scorecard criteria and the Notes of each scorecard
+    """
+    cache_name = _feedback_cache_name(file_name)
+    if os.path.exists(f'{cache_name}.parquet'):
+        return pd.read_parquet(f'{cache_name}.parquet')
+
     reviewer_df = pd.read_excel(f'Student_Data/{file_name}')
+    try:
+        _cache_feedback_rows(reviewer_df, cache_name)
+    except (OSError, ImportError, ValueError) as e:
+        if verbose:
+            print(f'WARNING: Could not cache {file_name}: {e}')
+    return reviewer_df
+
+
+def get_review_feedback(file_name: str, verbose: bool = False) -> pd.DataFrame:
+    """Returns the reviewer feedback averaged by applicant. Reading the workbook is slow, so the first read converts it to
+    parquet in Student_Data/cache, keyed by the workbook's hash, along with the aggregated result. Later runs read the
+    aggregated parquet directly and are only rebuilt when the workbook changes
+
+    Parameters
+    ----------
+    file_name : str
+        The reviewer feedback workbook in the Student_Data folder
+
+    Returns
+    -------
+    agg_rev_df : pd.DataFrame
+        One row per applicant with the mean of each score and the notes joined by ' || '
+    """
+    cache_name = _feedback_cache_name(file_name)
+    if os.path.exists(f'{cache_name}.agg.parquet'):
+        return pd.read_parquet(f'{cache_name}.agg.parquet')
+
+    reviewer_df = get_review_feedback_rows(file_name, verbose)
+
     agg_rev_df = reviewer_df.fillna('').groupby(['Applicant']).agg({'Community Service / Work'  : ['mean'],
                                                                     'Short Essay'               : ['mean'],
                                                                     'Bonus/Discretionary Points': ['mean'],
@@ -239,4 +358,11 @@ def get_review_feedback(file_name):
                                                                         ' || '.join]}).reset_index()
     agg_rev_df.columns = ['_'.join(col) for col in agg_rev_df.columns]
 
+    try:
+        os.makedirs(os.path.dirname(cache_name), exist_ok=True)
+        agg_rev_df.to_parquet(f'{cache_name}.agg.parquet', index=False)
+    except (OSError, ImportError, ValueError) as e:
+        if verbose:
+            print(f'WARNING: Could not cache {file_name}: {e}')
+
     return agg_rev_df
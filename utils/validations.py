@@ -5,35 +5,47 @@ High School Students:
 address_validation - Validates if an applicant's address is a real residence, if they live or go to school in in Chicago
 resident_validation - Verify applicant lives in Chicago
 accred_check - Verify applicant is accepted into an ABET accredited program
+accred_check_cohort - accred_check over a whole CohortTable, once per distinct college and major
 school_name_reduce - Removes common words from school name
 
 College students:
 past_recipient - Validates if a college student is a past recipient of the award
-college_gpa - Checks if a past recipients GPA meets the threshold
-college_school_major - Validates if a college student has changed their major or school
 get_past_recipients - get a list of past recipients to verify they recieved it as a high school senior
 get_school_list - returns list of Illinois high schools
 
 Misc.:
 questions_check - Checks if all questions in the constants file exist in the csv header
-list_failures - TBD
+failure_flags - the validation flags of every applicant as one NumPy column
+failure_report - counts the applicants failing each check and each combination of checks
+list_failures - prints the failure report and the warnings for each failing applicant
 """
 
 import csv
-import re
 from typing import Tuple
 
+import numpy as np
+import pandas as pd
 from smartystreets_python_sdk import StaticCredentials, exceptions, ClientBuilder
 from smartystreets_python_sdk.us_street import Lookup as StreetLookup
 
 import constants as cs
 from classes import Student
-from utils import keys as keys
+from classes.ValidationFlags import ValidationFlags, messages
+from utils import api_transport
+from utils import diagnostics
+from utils import normalize
 from utils import util
 
+try:
+    from utils import keys as keys
+except ImportError:
+    # keys.py is not committed, without it only replayed API calls can be made
+    keys = None
+
 
 def address_validation(s: Student, chicago_schools: list, school_list: dict, verbose: bool = False, DEBUG: bool = False,
-                       CALL_APIS: bool = False) -> None:
+                       CALL_APIS: bool = False, match_cache=None, transport: api_transport.ApiTransport = None,
+                       events: diagnostics.Diagnostics = None) -> None:
     """Validates if an applicant's address is a real residence, if they live or go to school in in Chicago
 
     Parameters
@@ -44,14 +56,19 @@ def address_validation(s: Student, chicago_schools: list, school_list: dict, ver
         A list of all Chicago high schools
     school_list : list
         A list of all Illinois high schools
+    match_cache : MatchCache
+        A match_cache.MatchCache for school_list, to skip fuzzy matching schools seen before
+    transport : ApiTransport
+        Makes, records or replays the API calls when CALL_APIS is set
+    events : Diagnostics
+        Collects the warnings, they are printed when verbose if not given
 
     Returns
     -------
     """
     # Check address if residential or commercial and get cleaned up address
     if CALL_APIS:
-        pass
-        # resident_validation(s, verbose, DEBUG)
+        resident_validation(s, verbose, DEBUG, transport, events)
     else:
         s.address_type = 'Residential'
 
@@ -61,37 +78,36 @@ def address_validation(s: Student, chicago_schools: list, school_list: dict, ver
         s.high_school_partial = school_name_reduce(s.high_school_full, s.high_school_other)
         # This is an computationally EXPENSIVE operation, avoid as much as possible
         school_bool, school, school_score = util.name_compare_list(s.high_school_partial,
-                                                                   school_list.keys(), 95)
+                                                                   school_list.keys(), 95, match_cache)
         # print(school_bool, school, school_score, s.high_school_partial, s.high_school_full)
         if school_bool:
             s.high_school_full = school_list[school][1]
+            s.high_school_city = school_list[school][0]
             # print(s.high_school_full, ' - ', school, school_score, school_list[school], s.city)
             # Trial and error has found 95 to be required to ONLY get correct matches, 90 works the vast majoriy, but some false positives get through
-            if school_list[school][
-                0].upper() != 'CHICAGO' and s.address_type == 'Residential' and s.city.upper() != 'CHICAGO':
-                # print(orig_School, ' - ', school, school_score, school_list[school], s.city)
-                s.ChicagoSchool = False
-                s.validationError = True
-
-                if verbose:
-                    print(
-                        f'WARNING: Student does neither lives nor goes to high school in Chicago - {s.high_school_full}')
+            # Neither living nor going to high school in Chicago is the ChicagoSchool rule in constants.validation_rules
         else:
             s.school_found = False
             s.validationError = True
-            if verbose:
+            if events is not None:
+                events.emit('school_not_found', diagnostics.Level.WARNING, s, school=s.high_school_full,
+                            city=s.city, other=s.high_school_other)
+            elif verbose:
                 print('Could not find matching school in system')
                 print(f'{s.high_school_full} - Student City: {s.city} - Student School{s.high_school_other}')
+    else:
+        s.high_school_city = 'Chicago'
     if s.address_type != 'Residential':
         s.valid_address = False
         s.validationError = True
 
     if CALL_APIS:
-        util.distance_between(s, verbose)
+        util.distance_between(s, verbose, transport)
 
 
 # Source: https://smartystreets.com/docs/sdk/python
-def resident_validation(s: Student, verbose: bool = False, DEBUG: bool = False) -> None:
+def resident_validation(s: Student, verbose: bool = False, DEBUG: bool = False,
+                        transport: api_transport.ApiTransport = None, events: diagnostics.Diagnostics = None) -> None:
     """This function will check a given address to determine what type of address it is, either residential, commercial,
         or if it is invalid. If the address is valid, it will also return the longitude and latitude of the address
 
@@ -111,6 +127,10 @@ def resident_validation(s: Student, verbose: bool = False, DEBUG: bool = False)
         Applicant's home state
     zip_code : str
         Applicant's home zip_code
+    transport : ApiTransport
+        Makes, records or replays the SmartyStreets call, a live transport if not given
+    events : Diagnostics
+        Collects the warnings, they are printed when verbose if not given
 
     Returns
     -------
@@ -122,17 +142,6 @@ def resident_validation(s: Student, verbose: bool = False, DEBUG: bool = False)
         The longitude of the address given
 
     """
-    # We recommend storing your secret keys in environment variables instead---it's safer!
-    # auth_id = os.environ['SMARTY_AUTH_ID']
-    # auth_token = os.environ['SMARTY_AUTH_TOKEN']
-
-    credentials = StaticCredentials(keys.auth_id, keys.auth_token)
-
-    client = ClientBuilder(credentials).build_us_street_api_client()
-    # client = ClientBuilder(credentials).with_custom_header({'User-Agent': 'smartystreets (python@0.0.0)', 'Content-Type': 'application/json'}).build_us_street_api_client()
-    # client = ClientBuilder(credentials).with_proxy('localhost:8080', 'user', 'password').build_us_street_api_client()
-    # Uncomment the line above to try it with a proxy instead
-
     # Documentation for input fields can be found at:
     # https://smartystreets.com/docs/us-street-api#input-fields
 
@@ -152,38 +161,72 @@ def resident_validation(s: Student, verbose: bool = False, DEBUG: bool = False)
     # Refer to the documentation for additional Match Strategy options.
     # This has been modified to strict to only get valid addresses
 
-    try:
+    def send() -> list:
+        if keys is None:
+            raise api_transport.ApiError('utils/keys.py is needed to call SmartyStreets, replay recorded calls instead')
+        # We recommend storing your secret keys in environment variables instead---it's safer!
+        # auth_id = os.environ['SMARTY_AUTH_ID']
+        # auth_token = os.environ['SMARTY_AUTH_TOKEN']
+        credentials = StaticCredentials(keys.auth_id, keys.auth_token)
+        client = ClientBuilder(credentials).build_us_street_api_client()
+        # client = ClientBuilder(credentials).with_custom_header({'User-Agent': 'smartystreets (python@0.0.0)', 'Content-Type': 'application/json'}).build_us_street_api_client()
+        # client = ClientBuilder(credentials).with_proxy('localhost:8080', 'user', 'password').build_us_street_api_client()
+        # Uncomment the line above to try it with a proxy instead
         client.send_lookup(lookup)
-    except exceptions.SmartyException as err:
+
+        # Only the fields used below are kept so the response can be recorded and replayed
+        return [{'rdi'               : candidate.metadata.rdi,
+                 'latitude'          : candidate.metadata.latitude,
+                 'longitude'         : candidate.metadata.longitude,
+                 'delivery_line_1'   : candidate.delivery_line_1,
+                 'delivery_line_2'   : candidate.delivery_line_2,
+                 'city_name'         : candidate.components.city_name,
+                 'state_abbreviation': candidate.components.state_abbreviation,
+                 'zipcode'           : candidate.components.zipcode,
+                 'footnotes'         : candidate.analysis.footnotes} for candidate in (lookup.result or [])[:1]]
+
+    if transport is None:
+        transport = api_transport.ApiTransport()
+
+    request = {'addressee': lookup.addressee, 'street': lookup.street, 'secondary': lookup.secondary,
+               'city'     : lookup.city, 'state': lookup.state, 'zipcode': lookup.zipcode, 'match': lookup.match}
+    try:
+        result = transport.call('smartystreets', request, send,
+                                retry_on=(exceptions.TooManyRequestsError, exceptions.RequestTimeoutError,
+                                          exceptions.ServiceUnavailableError, exceptions.GatewayTimeoutError))
+    except (exceptions.SmartyException, api_transport.ApiError) as err:
         s.other_error = False
         s.validationError = True
-        s.other_error_message = s.other_error_message + ' - resident_validation failed with error: ' + err
-
-    result = lookup.result
+        s.other_error_message = s.other_error_message + ' - resident_validation failed with error: ' + str(err)
+        return
 
     if not result:
-        if verbose:
+        if events is not None:
+            events.emit('address_not_found', diagnostics.Level.WARNING, s,
+                        address=' '.join([s.address1, s.address2, s.city, s.state, s.zip_code]))
+        elif verbose:
             print("No candidates. This means the address is not valid.")
             print(s.address1, s.address2, s.city, s.state, s.zip_code)
         s.valid_address = False
         s.validationError = True
     else:
         first_candidate = result[0]
-        s.address_type = first_candidate.metadata.rdi
-        s.home_latitude = first_candidate.metadata.latitude
-        s.home_longitude = first_candidate.metadata.longitude
-        s.cleaned_address1 = first_candidate.delivery_line_1
-        s.cleaned_address2 = first_candidate.delivery_line_2
-        s.cleaned_city = first_candidate.components.city_name
+        s.address_type = first_candidate['rdi']
+        s.home_latitude = first_candidate['latitude']
+        s.home_longitude = first_candidate['longitude']
+        s.cleaned_address1 = first_candidate['delivery_line_1']
+        s.cleaned_address2 = first_candidate['delivery_line_2']
+        s.cleaned_city = first_candidate['city_name']
         if s.cleaned_city != 'Chicago':
             s.ChicagoHome = False
             s.validationError = True
-        s.cleaned_state = first_candidate.components.state_abbreviation
-        s.cleaned_zip_code = first_candidate.components.zipcode
-        s.address_footnotes = first_candidate.analysis.footnotes
+        s.cleaned_state = first_candidate['state_abbreviation']
+        s.cleaned_zip_code = first_candidate['zipcode']
+        s.address_footnotes = first_candidate['footnotes']
 
 
-def past_recipient(s: Student, list_of_students: list, verbose: bool = False, DEBUG: bool = False) -> bool:
+def past_recipient(s: Student, list_of_students: list, verbose: bool = False, DEBUG: bool = False,
+                   match_cache=None, events: diagnostics.Diagnostics = None) -> bool:
     """Validates if a college student is a past recipient of the award
 
     Parameters
@@ -192,6 +235,10 @@ def past_recipient(s: Student, list_of_students: list, verbose: bool = False, DE
         A member of the Student class
     list_of_students : list
         A list of all past recipients of the award
+    match_cache : MatchCache
+        A match_cache.MatchCache for list_of_students, to skip fuzzy matching names seen before
+    events : Diagnostics
+        Collects the warnings, they are printed when verbose if not given
 
     Returns
     -------
@@ -199,67 +246,18 @@ def past_recipient(s: Student, list_of_students: list, verbose: bool = False, DE
         True or False if the student is a past recipient or not
     """
     student_name = s.firstName + ' ' + s.lastName
-    compare_test, name, wratio = util.name_compare_list(student_name, list_of_students, 90)
+    compare_test, name, wratio = util.name_compare_list(student_name, list_of_students, 90, match_cache)
     if not compare_test:
         s.past_recipient = False
         s.validationError = True
-        if verbose:
+        if events is not None:
+            events.emit('not_past_recipient', diagnostics.Level.WARNING, s, closest=name, score=wratio)
+        elif verbose:
             print(s.firstName + ' ' + s.lastName + ': Student did not receive award last year')
     return compare_test
 
 
-def college_gpa(s: Student, verbose: bool = False, DEBUG: bool = False) -> None:
-    """Checks if a past recipients GPA meets the threshold
-
-    Parameters
-    ----------
-    s : Student
-        A member of the Student class
-
-    Returns
-    -------
-    """
-    if s.GPA_Value:
-        s.GPA_Value = float(s.GPA_Value)
-
-        if s.GPA_Value < cs.minimum_gpa:
-            s.GPA_C_Under = False
-            s.validationError = True
-            if verbose:
-                print(s.lastName, s.firstName, 'GPA is below 2.75. GPA is ' + str(s.GPA_Value))
-        elif s.GPA_Value < cs.warning_gpa:
-            s.GPA_C_Warn = False
-            s.validationError = True
-            if verbose:
-                print(s.lastName, s.firstName, 'GPA is below 2.9, consider warning. GPA is ' + str(s.GPA_Value))
-
-
-def college_school_major(s: Student, verbose: bool = False, DEBUG: bool = False) -> None:
-    """Validates if a college student has changed their major or school
-
-    Parameters
-    ----------
-    s : Student
-        A member of the Student class
-
-    Returns
-    -------
-    """
-    # TODO: Check that their major is still engineering even if they don't say they changed
-    if s.major_school_change and re.sub('[^A-Za-z0-9]+', '', s.major_school_change.strip().upper()) not in ['NO', 'NA']:
-        s.C_College_change = False
-        s.validationError = True
-        if verbose:
-            print(s.firstName + ' ' + s.lastName + ': Major or School Change, investigate: ' + s.major_school_change)
-    if s.major == 'Not listed' and s.NON_ENG_value:
-        s.C_Major_Warn = False
-        s.validationError = True
-        if verbose:
-            print(
-                s.firstName + ' ' + s.lastName + ': Other Major Listed, validate it is engineering: ' + s.NON_ENG_value)
-
-
-def accred_check(s: Student, verbose: bool = False, DEBUG: bool = False) -> None:
+def accred_check(s: Student, verbose: bool = False, DEBUG: bool = False, reference=None) -> None:
     """This function will determine if the applicant is going to an ABET accredited program. This requires that an
     extract from ABET's website in the "School_Data" folder. As an applicant can have multiple schools listed, this
     function iterates over all of them and checks if they are in the ABET list. If so it then compares the major the
@@ -275,6 +273,8 @@ def accred_check(s: Student, verbose: bool = False, DEBUG: bool = False) -> None
         The list of schools the applicant is accepted to from the free form field if the above is "Not Listed"
     major : str
         A string containing the majors the applicatn is applying for
+    reference : ReferenceData
+        The reference_data.ReferenceData, if given the ABET programs are looked up in it instead of reading the csv
 
     Returns
     -------
@@ -283,85 +283,59 @@ def accred_check(s: Student, verbose: bool = False, DEBUG: bool = False) -> None
 
     """
     # TODO: Implement Fuzzy Name for school and major matching
-    school_list = s.College.split(',')
-    other_school_list = s.Other_College.split(',')
-
-    major = s.major.upper()
-    major = major.strip()
-    major = major.replace(' AND ', ',')
-    major = major.replace(' ', '')
-    major = major.replace('ENGINEERING', '')
-    major_list = major.split(',')
-
-    # TODO: There has got to be a more efficient way to do this, probably a dict with a value being the majors in a list but for now it's not exactly slow
-    for school in school_list:
-        school = school.upper()
-        school = school.strip()
-        school = school.replace('THE ', '')
-        school = school.replace(' AT ', ' - ')
-        school = school.replace('-', '')
-        school = school.replace(' ', '')
-
-        with open('School_Data/ABET_Accredited_Schools.csv', 'r', encoding="utf-8-sig") as f:
-            d_reader = csv.DictReader(f)
-            for line in d_reader:
-                ABET_major = line[cs.abet_major]
-                ABET_major = ABET_major.upper()
-                ABET_major = ABET_major.strip()
-                ABET_major = ABET_major.replace(' AND ', ',')
-                ABET_major = ABET_major.replace(' ', '')
-                ABET_major = ABET_major.replace('ENGINEERING', '')
-
-                ABET_school = line[cs.abet_school_name]
-                ABET_school = ABET_school.upper()
-                ABET_school = ABET_school.strip()
-                ABET_school = ABET_school.replace('THE ', '')
-                ABET_school = ABET_school.replace(' AT ', ' - ')
-                ABET_school = ABET_school.replace('-', '')
-                ABET_school = ABET_school.replace(' ', '')
-                if school in ABET_school:
-                    # print(school, major_list)
-                    for option in major_list:
-                        if option == ABET_major or option == 'UNDECIDED' or option == '':
-                            return
+    major_list = normalize.program_name(s.major).split(',')
 
+    school_list = s.College.split(',')
     if s.Other_College is not None and len(s.Other_College) > 0:
-        for school in other_school_list:
-            school = school.upper()
-            school = school.strip()
-            school = school.replace('THE ', '')
-            school = school.replace(' AT ', ' - ')
-            school = school.replace('-', '')
-            school = school.replace(' ', '')
+        school_list += s.Other_College.split(',')
+
+    if reference is not None:
+        if reference.abet_accredited([normalize.university_name(school) for school in school_list], major_list):
+            return
+    else:
+        # TODO: There has got to be a more efficient way to do this, probably a dict with a value being the majors in a list but for now it's not exactly slow
+        for school in school_list:
+            school = normalize.university_name(school)
 
             with open('School_Data/ABET_Accredited_Schools.csv', 'r', encoding="utf-8-sig") as f:
                 d_reader = csv.DictReader(f)
                 for line in d_reader:
-                    ABET_major = line[cs.abet_major]
-                    ABET_major = ABET_major.upper()
-                    ABET_major = ABET_major.strip()
-                    ABET_major = ABET_major.replace(' AND ', ',')
-                    ABET_major = ABET_major.replace(' ', '')
-                    ABET_major = ABET_major.replace('ENGINEERING', '')
-
-                    ABET_school = line[cs.abet_school_name]
-                    ABET_school = ABET_school.upper()
-                    ABET_school = ABET_school.strip()
-                    ABET_school = ABET_school.replace('THE ', '')
-                    ABET_school = ABET_school.replace(' AT ', ' - ')
-                    ABET_school = ABET_school.replace('-', '')
-                    ABET_school = ABET_school.replace(' ', '')
+                    ABET_major = normalize.program_name(line[cs.abet_major])
+                    ABET_school = normalize.university_name(line[cs.abet_school_name])
                     if school in ABET_school:
+                        # print(school, major_list)
                         for option in major_list:
                             if option == ABET_major or option == 'UNDECIDED' or option == '':
                                 return
 
+    # A major which is not listed at an unaccredited program is the valid_major rule in constants.validation_rules
     s.accredited = False
 
-    if s.major == 'Not Listed':
-        s.valid_major = False  # TODO: This probably needs work
-        if verbose:
-            print('Potential non-engineering major, check: ' + s.NON_ENG_value)
+
+def accred_check_cohort(table, reference) -> np.ndarray:
+    """accred_check for every applicant in a CohortTable. The check only depends on the college, other college and
+    major, so it is run once per distinct combination of them rather than once per applicant
+
+    Parameters
+    ----------
+    table : CohortTable
+        The applicants
+    reference : ReferenceData
+        The reference_data.ReferenceData the ABET programs are looked up in
+
+    Returns
+    -------
+    accredited : np.ndarray
+        If each applicant's school and major combination is accredited
+    """
+    def accredited(college: str, other_college: str, major: str) -> bool:
+        school_list = college.split(',')
+        if other_college:
+            school_list += other_college.split(',')
+        return reference.abet_accredited([normalize.university_name(school) for school in school_list],
+                                         normalize.program_name(major).split(','))
+
+    return table.map_distinct(['College', 'Other_College', 'major'], accredited).astype(bool)
 
 
 def get_past_recipients(file: str, year: int, verbose: bool = False, DEBUG: bool = False) -> list:
@@ -473,17 +447,60 @@ def school_name_reduce(school_name: str, other_school: str, verbose: bool = Fals
     if school_name == 'My High School is Not Listed':
         school_name = other_school
 
-    school_name = school_name.replace(' High School', '')
-    school_name = school_name.replace(' Middle School', '')
-    school_name = school_name.replace(' Elementary School', '')
-    school_name = school_name.replace(' College Prep', '')
-    school_name = school_name.replace(' Academy', '')
-    school_name = school_name.replace(' School', '')
-    return school_name
+    return normalize.school_name(school_name)
+
+
+def failure_flags(student_list: list) -> np.ndarray:
+    """Collects the validation flags of every applicant into one column, see classes/ValidationFlags.py
+
+    Parameters
+    ----------
+    student_list : list
+        A list containing all the students as the student class
+
+    Returns
+    -------
+    flags : np.ndarray
+        The validation flags of each student, in the same order as student_list
+    """
+    return np.fromiter((s.validation_flags for s in student_list), dtype=np.uint32, count=len(student_list))
+
 
+def failure_report(flags: np.ndarray) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Counts the applicants failing each check, and each combination of checks that occurs
+
+    Parameters
+    ----------
+    flags : np.ndarray
+        The validation flags of each student, see failure_flags
 
-def list_failures(student_list: list, student_type: str, verbose: bool = False, DEBUG: bool = False):
+    Returns
+    -------
+    by_check : pd.DataFrame
+        The number of applicants failing each check, most failed first
+    by_combination : pd.DataFrame
+        The number of applicants failing exactly each combination of checks, most common first
     """
+    checks = list(ValidationFlags)
+    bits = np.array([check.value for check in checks], dtype=np.uint32)
+    failed = (flags[:, None] & bits) != 0
+
+    by_check = pd.DataFrame({'Check'     : [check.name for check in checks],
+                             'Applicants': failed.sum(axis=0)})
+    by_check = by_check[by_check['Applicants'] > 0].sort_values('Applicants', ascending=False, kind='stable')
+
+    combinations, counts = np.unique(flags[flags != 0], return_counts=True)
+    by_combination = pd.DataFrame({'Flags'     : combinations,
+                                   'Checks'    : [', '.join(check.name for check in checks if int(combination) & check)
+                                                  for combination in combinations],
+                                   'Applicants': counts})
+    by_combination = by_combination.sort_values('Applicants', ascending=False, kind='stable')
+
+    return by_check.reset_index(drop=True), by_combination.reset_index(drop=True)
+
+
+def list_failures(student_list: list, student_type: str, verbose: bool = False, DEBUG: bool = False) -> pd.DataFrame:
+    """Prints how many applicants failed each validation check, and the warnings of each failing applicant if verbose
 
     Parameters
     ----------
@@ -494,15 +511,27 @@ def list_failures(student_list: list, student_type: str, verbose: bool = False,
 
     Returns
     -------
-
+    by_combination : pd.DataFrame
+        The number of applicants failing exactly each combination of checks, see failure_report
     """
-    for s in student_list:
-        if s.address_type == 'Invalid Address':
-            print(
-                    'WARNING - Applicant has entered an invalid address:  ' + s.address1 + ' ' + s.address2 + ' ' + s.city + ' ' + s.state + ' ' + s.zip_code)
-        elif s.address_type != 'Residential':
-            print(
-                    'WARNING - Applicant has entered a non-residential address:  ' + s.ddress1 + ' ' + s.address2 + ' ' + s.city + ' ' + s.state + ' ' + s.zip_code)
+    flags = failure_flags(student_list)
+    by_check, by_combination = failure_report(flags)
+
+    print(f'{student_type}: {np.count_nonzero(flags)} of {len(flags)} applicants failed a validation check')
+    for check, count in zip(by_check['Check'], by_check['Applicants']):
+        print(f'    {count:5} - {messages[ValidationFlags[check]]}')
+
+    if verbose:
+        for i in np.flatnonzero(flags):
+            s = student_list[i]
+            for check in ValidationFlags:
+                if flags[i] & check:
+                    print(f'WARNING - {s.firstName} {s.lastName}: {messages[check]}')
+            if s.validation_flags & ValidationFlags.valid_address:
+                print('    ' + ' '.join([s.address1, s.address2, s.city, s.state, s.zip_code]))
+            for question, other, year, other_question, similarity in s.similar_answers:
+                print(f'    {question} - {similarity:.0%} the same as {other} ({year}) {other_question}')
+    return by_combination
 
 
 '''if ACT_SAT_Score == -1: